@@ -16,6 +16,10 @@ from fastapi.responses import StreamingResponse
 
 from core.model.model_manager import ModelManager, ModelInstanceType
 from core.database.database_factory import DatabaseFactory
+from core.rag.reranker.rerank_executor import RerankExecutor
+from core.rag.extractor.extract_executor import ExtractExecutor
+from core.rag.splitter.split_executor import SplitExecutor
+from core.rag.retriever.vector_index import VectorIndexManager
 from api.base_model import ResponseModel
 from config.config import get_config
 from logger import get_logger
@@ -50,6 +54,9 @@ async def lifespan(app: FastAPI):
         app.state.api_thread_pool = ThreadPoolExecutor(max_workers=api_executor_threads)
         logger.info(f'Succeed to init api thread pool with size({api_executor_threads}).')
 
+        # 后台预热内存向量索引
+        VectorIndexManager.warm_up(db)
+
         logger.info('Server started.')
         yield
     except Exception as e:
@@ -85,6 +92,21 @@ async def lifespan(app: FastAPI):
             app.state.api_thread_pool.shutdown(wait=True)
             logger.info('Succeed to shutdown api thread pool.')
 
+        # 关闭重排序执行器
+        logger.info('Waiting rerank executor shutdown ...')
+        RerankExecutor.shutdown()
+        logger.info('Succeed to shutdown rerank executor.')
+
+        # 关闭文档解析进程池
+        logger.info('Waiting extract executor shutdown ...')
+        ExtractExecutor.shutdown()
+        logger.info('Succeed to shutdown extract executor.')
+
+        # 关闭分段进程池
+        logger.info('Waiting split executor shutdown ...')
+        SplitExecutor.shutdown()
+        logger.info('Succeed to shutdown split executor.')
+
         # 从数据库断开连接
         if db:
             try:
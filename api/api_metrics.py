@@ -0,0 +1,20 @@
+from fastapi.responses import JSONResponse
+
+from api.api import app
+from core.rag.extractor.extract_cache import ExtractCache
+from core.rag.reranker.rerank_executor import RerankExecutor
+from core.rag.reranker.rerank_candidate import RerankCandidate
+from core.rag.reranker.rerank_cache import RerankCache
+from core.rag.retriever.retrieve_cache import RetrieveCache
+from core.rag.retriever.vector_index import VectorIndexManager
+
+@app.get('/metrics')
+async def metrics():
+    return JSONResponse(content={
+        "rerank_executor": RerankExecutor.get_metrics(),
+        "rerank_candidate": RerankCandidate.get_metrics(),
+        "rerank_cache": RerankCache.get_metrics(),
+        "retrieve_cache": RetrieveCache.get_metrics(),
+        "vector_index": VectorIndexManager.get_metrics(),
+        "extract_cache": ExtractCache.get_metrics(),
+    })
@@ -26,12 +26,14 @@ from core.rag.utils.rag_utils import (
     len_without_link, 
     list_to_pgvector_str, 
     get_text_hash, 
+    extract_keywords, 
     get_text_id, 
     generate_preview_chunks_from_documents,
 )
 from core.rag.splitter.splitter_entities import SplitType
 from api.api_rag.entities import ChunkStatus
 from core.rag.entities.document import Document
+from core.rag.retriever.retrieve_cache import RetrieveCache
 from config.config import get_config
 from logger import get_logger
 
@@ -105,6 +107,7 @@ async def handler(conn: Request, body: Dict = Body(...)):
         content_id = get_text_id(request.chunk_content)
         content_len = len_without_link(request.chunk_content)
         content_hash = get_text_hash(request.chunk_content)
+        keywords = extract_keywords(request.chunk_content)
 
         new_doc = Document(
             page_content=request.chunk_content,
@@ -114,6 +117,7 @@ async def handler(conn: Request, body: Dict = Body(...)):
                 "content_id": content_id,
                 "content_len": content_len,
                 "content_hash": content_hash,
+                "keywords": keywords,
             },
         )
 
@@ -214,6 +218,9 @@ async def handler(conn: Request, body: Dict = Body(...)):
             msg=f'{task_id}: Fail to excute sql transaction for:{type(e).__name__}: {str(e)}.'
         )
     
+    # 知识库数据已变更，使检索缓存失效
+    RetrieveCache.invalidate(request.knowledge_base_id)
+
     # 响应
     response = ApiRagResponseModel(
         code=1000, 
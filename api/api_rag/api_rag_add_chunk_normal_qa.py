@@ -26,12 +26,14 @@ from core.rag.utils.rag_utils import (
     len_without_link, 
     list_to_pgvector_str, 
     get_text_hash, 
+    extract_keywords, 
     get_text_id, 
     generate_preview_chunks_from_documents,
 )
 from core.rag.splitter.splitter_entities import SplitType
 from api.api_rag.entities import ChunkStatus
 from core.rag.entities.document import Document
+from core.rag.retriever.retrieve_cache import RetrieveCache
 from config.config import get_config
 from logger import get_logger
 
@@ -107,6 +109,7 @@ async def handler(conn: Request, body: Dict = Body(...)):
         content_id = get_text_id(request.chunk_question)
         content_len = len_without_link(request.chunk_question)
         content_hash = get_text_hash(request.chunk_question)
+        keywords = extract_keywords(request.chunk_question)
         answer_len = len_without_link(request.chunk_answer)
 
         new_doc = Document(
@@ -117,6 +120,7 @@ async def handler(conn: Request, body: Dict = Body(...)):
                 "content_id": content_id,
                 "content_len": content_len,
                 "content_hash": content_hash,
+                "keywords": keywords,
                 "answer": request.chunk_answer,
                 "answer_len": answer_len,
             },
@@ -221,6 +225,9 @@ async def handler(conn: Request, body: Dict = Body(...)):
             msg=f'{task_id}: Fail to excute sql transaction for:{type(e).__name__}: {str(e)}.'
         )
     
+    # 知识库数据已变更，使检索缓存失效
+    RetrieveCache.invalidate(request.knowledge_base_id)
+
     # 响应
     response = ApiRagResponseModel(
         code=1000, 
@@ -19,6 +19,7 @@ from core.rag.utils.sql_expression import (
     SQL_EXPRESSION_VECTOR_DELETE_CURD, 
     SQL_EXPRESSION_DOCUMENT_SELECT_CURD, 
 )
+from core.rag.retriever.retrieve_cache import RetrieveCache
 from config.config import get_config
 from logger import get_logger
 
@@ -70,7 +71,7 @@ async def handler(conn: Request, body: Dict = Body(...)):
             async with conn.transaction():
                 # 获取knowledge_base_document中的原记录
                 document_select_sql = SQL_EXPRESSION_DOCUMENT_SELECT_CURD.format(
-                    ','.join(['preview_chunks', 'word_count', ])
+                    ','.join(['preview_chunks', 'word_count', 'knowledge_base_id', ])
                 )
                 rows = await conn.fetch(document_select_sql, request.document_id)
                 if not rows or len(rows) > 1:
@@ -126,6 +127,9 @@ async def handler(conn: Request, body: Dict = Body(...)):
             msg=f'{task_id}: Fail to excute sql transaction for:{type(e).__name__}: {str(e)}.'
         )
 
+    # 知识库数据已变更，使检索缓存失效
+    RetrieveCache.invalidate(record['knowledge_base_id'])
+
     # 响应
     response = ApiRagResponseModel(
         code=1000, 
@@ -34,6 +34,7 @@ from core.rag.splitter.splitter_entities import SplitType
 from api.api_rag.entities import ChunkStatus
 from core.rag.entities.document import Document
 from core.rag.splitter.splitter_fulldoc import FulldocSplitter
+from core.rag.retriever.retrieve_cache import RetrieveCache
 from config.config import get_config
 from logger import get_logger
 
@@ -273,6 +274,9 @@ async def handler(conn: Request, body: Dict = Body(...)):
             msg=f'{task_id}: Fail to excute sql transaction for:{type(e).__name__}: {str(e)}.'
         )
 
+    # 知识库数据已变更，使检索缓存失效
+    RetrieveCache.invalidate(request.knowledge_base_id)
+
     # 响应
     response = ApiRagResponseModel(
         code=1000, 
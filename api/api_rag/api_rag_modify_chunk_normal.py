@@ -26,7 +26,9 @@ from core.rag.utils.rag_utils import (
     len_without_link, 
     list_to_pgvector_str, 
     get_text_hash, 
+    extract_keywords, 
 )
+from core.rag.retriever.retrieve_cache import RetrieveCache
 from config.config import get_config
 from logger import get_logger
 
@@ -95,6 +97,7 @@ async def handler(conn: Request, body: Dict = Body(...)):
         usage = outputs[0]['usage']
 
         content_hash = get_text_hash(request.chunk_content)
+        keywords = extract_keywords(request.chunk_content)
         new_character = len_without_link(request.chunk_content)
 
         logger.debug(f'{task_id} Vectorized.')
@@ -113,7 +116,7 @@ async def handler(conn: Request, body: Dict = Body(...)):
             async with conn.transaction():
                 # 获取knowledge_base_document中的原记录
                 document_select_sql = SQL_EXPRESSION_DOCUMENT_SELECT_CURD.format(
-                    ','.join(['preview_chunks', 'word_count', ])
+                    ','.join(['preview_chunks', 'word_count', 'knowledge_base_id', ])
                 )
                 rows = await conn.fetch(document_select_sql, request.document_id)
                 if not rows or len(rows) > 1:
@@ -165,6 +168,7 @@ async def handler(conn: Request, body: Dict = Body(...)):
                 metadata = chunk_record['metadata']
                 metadata['content_hash'] = content_hash
                 metadata['content_len'] = new_character
+                metadata['keywords'] = keywords
                 logger.debug(f'{task_id} new metadata:\n{json.dumps(metadata, ensure_ascii=False, indent=4)}')
 
                 # 修改表knowledge_base_document中对应记录的preview_chunks、word_count列
@@ -209,6 +213,9 @@ async def handler(conn: Request, body: Dict = Body(...)):
             msg=f'{task_id}: Fail to excute sql transaction for:{type(e).__name__}: {str(e)}.'
         )
 
+    # 知识库数据已变更，使检索缓存失效
+    RetrieveCache.invalidate(record['knowledge_base_id'])
+
     # 响应
     response = ApiRagResponseModel(
         code=1000, 
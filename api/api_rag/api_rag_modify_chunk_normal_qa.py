@@ -26,7 +26,9 @@ from core.rag.utils.rag_utils import (
     len_without_link, 
     list_to_pgvector_str, 
     get_text_hash, 
+    extract_keywords, 
 )
+from core.rag.retriever.retrieve_cache import RetrieveCache
 from config.config import get_config
 from logger import get_logger
 
@@ -96,6 +98,7 @@ async def handler(conn: Request, body: Dict = Body(...)):
         usage = outputs[0]['usage']
 
         content_hash = get_text_hash(request.chunk_question)
+        keywords = extract_keywords(request.chunk_question)
         new_context_content = f"Question: {request.chunk_question}\nAnswer: {request.chunk_answer}"
         new_character = len_without_link(request.chunk_question) + len_without_link(request.chunk_answer)
 
@@ -116,7 +119,7 @@ async def handler(conn: Request, body: Dict = Body(...)):
             async with conn.transaction():
                 # 获取knowledge_base_document中的原记录
                 document_select_sql = SQL_EXPRESSION_DOCUMENT_SELECT_CURD.format(
-                    ','.join(['preview_chunks', 'word_count', ])
+                    ','.join(['preview_chunks', 'word_count', 'knowledge_base_id', ])
                 )
                 rows = await conn.fetch(document_select_sql, request.document_id)
                 if not rows or len(rows) > 1:
@@ -171,6 +174,7 @@ async def handler(conn: Request, body: Dict = Body(...)):
                 metadata = chunk_record['metadata']
                 metadata['content_hash'] = content_hash
                 metadata['content_len'] = len_without_link(request.chunk_question)
+                metadata['keywords'] = keywords
                 metadata['answer'] = request.chunk_answer
                 metadata['answer_len'] = len_without_link(request.chunk_answer)
                 logger.debug(f'{task_id} new metadata:\n{json.dumps(metadata, ensure_ascii=False, indent=4)}')
@@ -217,6 +221,9 @@ async def handler(conn: Request, body: Dict = Body(...)):
             msg=f'{task_id}: Fail to excute sql transaction for:{type(e).__name__}: {str(e)}.'
         )
 
+    # 知识库数据已变更，使检索缓存失效
+    RetrieveCache.invalidate(record['knowledge_base_id'])
+
     # 响应
     response = ApiRagResponseModel(
         code=1000, 
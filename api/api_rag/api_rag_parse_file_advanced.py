@@ -2,14 +2,12 @@
     保存并处理：高级分段处理
 '''
 
-from typing import Dict, Optional
-from enum import Enum
+from typing import Dict
 import traceback
 from uuid import uuid4
 import asyncio
 import json
 from threading import Event
-import concurrent.futures
 from pathlib import Path
 
 from pydantic import Field
@@ -22,21 +20,17 @@ from core.rag.extractor.extract_processor import ExtractProcessor
 from core.rag.cleaner.clean_processor import CleanProcessor
 from core.rag.splitter.split_processor import SplitProcessor
 from core.rag.vectorizer.vectorize_processor import VectorizeProcessor
+from core.rag.vectorizer.incremental_vectorize_processor import IncrementalVectorizeProcessor
 from core.rag.utils.sql_operation import (
     update_documents_into_db, 
-    insert_vector_into_db, 
     modify_document_status_by_id, 
     delete_vector_by_document_id, 
 )
-from core.rag.utils.rag_utils import (
-    generate_preview_chunks_from_documents, 
-    generate_chunks_from_documents, 
-    list_to_pgvector_str, 
-    len_without_link, 
-)
+from core.rag.utils.rag_utils import generate_preview_chunks_from_documents
 from core.database.database_factory import DatabaseFactory
-from api.api_rag.entities import DocumentStatus, ChunkStatus
+from api.api_rag.entities import DocumentStatus
 from logger import get_logger
+from core.rag.retriever.retrieve_cache import RetrieveCache
 from config.config import get_config
 
 logger = get_logger('api')
@@ -46,9 +40,6 @@ class ApiRagRequestModel(RequestModel):
     model_instance_provider: str = Field(..., description='模型供应商')
     model_instance_config: Dict = Field(..., description='模型配置信息')
 
-async def gather_coros(coros):
-    return await asyncio.gather(*coros, return_exceptions=True)
-
 async def async_task(task_id: str, stop_event: Event, request: ApiRagRequestModel) -> None:
     logger.debug(f'{task_id} Start processing.')
 
@@ -82,19 +73,6 @@ async def async_task(task_id: str, stop_event: Event, request: ApiRagRequestMode
             app.state.rag_tasks_flag.pop(request.key_id, None)
         return
 
-    # 删除document下所有片段
-    try:
-        await delete_vector_by_document_id(db, request.key_id)
-        logger.debug(f'{task_id} Delete vectors.')
-    except asyncio.CancelledError:
-        logger.warning(f'{task_id} Task cancel.')
-        return
-    except Exception as e:
-        logger.error(f'{task_id} Fail to delete vectors for:\n{traceback.format_exc()}')
-        async with app.state.rag_tasks_mtx:
-            app.state.rag_tasks_flag.pop(request.key_id, None)
-        return
-
     documents = []
     split_type = None
     preview_chunks = None
@@ -112,7 +90,7 @@ async def async_task(task_id: str, stop_event: Event, request: ApiRagRequestMode
         document_path_prefix = get_config().get('dependent_info').get('knowledge_base').get('document_path_prefix')
         file_path = Path(document_path_prefix) / request.file_url
         file_id = str(uuid4())
-        documents = ExtractProcessor().extract(file_path=file_path, file_id=file_id)
+        documents = ExtractProcessor().extract(file_path=file_path, file_id=file_id, extract_profile=request.extract_profile)
         logger.debug(f'{task_id} Extracted.')
 
         # 清洗
@@ -146,87 +124,48 @@ async def async_task(task_id: str, stop_event: Event, request: ApiRagRequestMode
         process_failed_reason = f"{type(e).__name__}:{str(e)[:100]}"
 
     if process_status == DocumentStatus.SUCCESS.value:
-        # 向量化
+        # 向量化，与文档下已有的片段比对，仅向量化内容变化的片段，在同一事务中写入
         logger.debug(f'{task_id} Vectorizing...')
-        embedding_batch_size = get_config().get('server', {}).get('embedding_batch_size', 8)
-        failed_count = 0
-        for f_idx, father_document in enumerate(documents):
-            for i in range(0, len(father_document.children), embedding_batch_size):
-
-                batch_documents = father_document.children[i: i + embedding_batch_size]
-
-                coros = [VectorizeProcessor.vectorize(
-                    vectorizer, [document.page_content]
-                ) for document in batch_documents]
-
-                try:
-                    outputs = await gather_coros(coros)
-                except asyncio.CancelledError:
-                    logger.warning(f'{task_id} Task cancel.')
-                    return
-
-                values = []
-                for idx, output in enumerate(outputs):
-                    
-                    # 在metadata中添加title字段
-                    batch_documents[idx].metadata['title'] = name
-
-                    if isinstance(output, Exception):
-                        failed_count += 1
-
-                        batch_documents[idx].metadata['failed_reason'] = f"{type(output).__name__}:{str(output)[:100]}"
-
-                        values.append(
-                            (
-                                batch_documents[idx].metadata.get('content_id'),
-                                request.knowledge_base_id,
-                                request.key_id,
-                                batch_documents[idx].page_content,
-                                father_document.page_content,
-                                json.dumps(batch_documents[idx].metadata),
-                                None,
-                                None,
-                                ChunkStatus.FAILED.value,
-                                batch_documents[idx].metadata.get('content_hash'),
-                                split_type,
-                            )
-                        )
-                        logger.warning(f'{task_id} [{i + idx}] Vectorize failed for:\n{repr(output)}')
-                    else:
-                        values.append(
-                            (
-                                batch_documents[idx].metadata.get('content_id'),
-                                request.knowledge_base_id,
-                                request.key_id,
-                                batch_documents[idx].page_content,
-                                father_document.page_content,
-                                json.dumps(batch_documents[idx].metadata),
-                                list_to_pgvector_str(output[0]['vector']),
-                                json.dumps(output[0]['usage']),
-                                ChunkStatus.SUCCESS.value,
-                                batch_documents[idx].metadata.get('content_hash'),
-                                split_type,
-                            )
-                        )
-
-                # 入向量库
-                try:
-                    ids = await insert_vector_into_db(db, values)
-
-                    for id, idx in enumerate(range(i, i + len(batch_documents))):
-                        father_document.children[idx].metadata['primary_key'] = ids[id]['id']
-
-                    logger.debug(f'{task_id} document[{f_idx}][{i}-{i + len(batch_documents) - 1}] inserted into database.')
-                except asyncio.CancelledError:
-                    logger.warning(f'{task_id} Task cancel.')
-                    return
-                except Exception as e:
-                    logger.error(f'{task_id} document[{f_idx}][{i}-{i + len(batch_documents) - 1}] insert into database failed for:\n{traceback.format_exc()}')
-
-        child_chunks_num = sum(len(father_document.children) for father_document in documents)
-        if child_chunks_num > 0 and failed_count == child_chunks_num:
-            process_failed_reason = 'RuntimeError:All chunks failed when vectorize.'
+        try:
+            chunks = [
+                (child_document, father_document.page_content)
+                for father_document in documents
+                for child_document in father_document.children
+            ]
+            failed_count = await IncrementalVectorizeProcessor.vectorize(
+                db,
+                vectorizer,
+                task_id,
+                request.knowledge_base_id,
+                request.key_id,
+                split_type,
+                name,
+                chunks,
+            )
+            logger.debug(f'{task_id} Vectors written into database.')
+            RetrieveCache.invalidate(request.knowledge_base_id)
+
+            if len(chunks) > 0 and failed_count == len(chunks):
+                process_failed_reason = 'RuntimeError:All chunks failed when vectorize.'
+                process_status = DocumentStatus.FAILED.value
+        except asyncio.CancelledError:
+            logger.warning(f'{task_id} Task cancel.')
+            return
+        except Exception as e:
+            logger.error(f'{task_id} Fail to write vectors into database for:\n{traceback.format_exc()}')
+            process_failed_reason = f"{type(e).__name__}:{str(e)[:100]}"
             process_status = DocumentStatus.FAILED.value
+    else:
+        # 提取或分段失败，删除document下所有片段
+        try:
+            await delete_vector_by_document_id(db, request.key_id)
+            RetrieveCache.invalidate(request.knowledge_base_id)
+            logger.debug(f'{task_id} Delete vectors.')
+        except asyncio.CancelledError:
+            logger.warning(f'{task_id} Task cancel.')
+            return
+        except Exception:
+            logger.error(f'{task_id} Fail to delete vectors for:\n{traceback.format_exc()}')
 
     preview_chunks = []
 
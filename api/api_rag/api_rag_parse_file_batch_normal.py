@@ -0,0 +1,130 @@
+'''
+    保存并处理：批量普通分段处理
+    多个文件共享分段设置、向量化实例与向量化批次（各文件的片段凑满 embedding_batch_size 条后以一次请求向量化），
+    每个文件仍作为独立的任务登记，可通过 ParseFileStop 单独终止，文件处理完成时各自写入文档状态
+'''
+
+from typing import Dict, List, Optional
+import traceback
+import asyncio
+import json
+from threading import Event
+
+from pydantic import Field, BaseModel
+from fastapi import Request, Body
+
+from api.api import app, get_api_client_tag
+from api.api_rag.api_rag_parse_file_normal import ApiRagRequestModel as ParseRequestModel
+from api.api_rag.api_rag_parse_file_normal import async_task as parse_task
+from api.api_rag.api_rag_preview_chunk_normal import ApiRagResponseModel
+from core.rag.extractor.extractor_entities import ExtractProfile
+from core.rag.vectorizer.vectorizer_base import BaseVectorizer
+from core.rag.vectorizer.vectorize_processor import VectorizeProcessor
+from core.rag.vectorizer.embedding_batcher import EmbeddingBatcher
+from logger import get_logger
+from config.config import get_config
+
+logger = get_logger('api')
+
+_DEFAULT_PARSE_BATCH_CONCURRENCY = 4
+_DEFAULT_EMBEDDING_BATCH_SIZE = 8
+
+class ApiRagRequestModel(BaseModel):
+    class FileItem(BaseModel):
+        key_id: int = Field(..., description='知识库所在表的主键，对应java的文档id')
+        file_url: str = Field(..., description='文件url')
+
+    files: List[FileItem] = Field(..., min_length=1, description='待解析的文件')
+    chunk_setting: ParseRequestModel.ChunkSetting = Field(..., description='分段设置')
+    cleaner_setting: ParseRequestModel.CleanerSetting = Field(..., description='文本预处理规则')
+    qa_setting: ParseRequestModel.QaSetting = Field(..., description='Q&A分段设置')
+    extract_profile: ExtractProfile = Field(ExtractProfile.TEXT_IMAGE, description='提取方式，TEXT_IMAGE为提取文本与图片，TEXT为仅提取文本')
+    knowledge_base_id: int = Field(..., description='java内部知识库id')
+    model_instance_provider: str = Field(..., description='模型供应商')
+    model_instance_config: Dict = Field(..., description='模型配置信息')
+
+async def batch_task(
+    task_id: str,
+    stop_event: Event,
+    request: ParseRequestModel,
+    concurrency_semaphore: asyncio.Semaphore,
+    vectorizer: Optional[BaseVectorizer],
+    embedding_batcher: Optional[EmbeddingBatcher],
+) -> None:
+    # 等待中的任务可被 ParseFileStop 取消
+    async with concurrency_semaphore:
+        await parse_task(task_id, stop_event, request, vectorizer, embedding_batcher)
+
+@app.post(path='/Voicecomm/VoiceSageX/Rag/ParseFileBatchNormal', response_model=ApiRagResponseModel, response_model_exclude_none=False)
+async def handler(conn: Request, body: Dict = Body(...)):
+    tag, task_id = get_api_client_tag(conn)
+    logger.debug(f'{task_id} {tag}')
+
+    # 格式校验
+    try:
+        logger.debug(f'{task_id} Request body:\n{json.dumps(body, indent=4, ensure_ascii=False)}')
+        request = ApiRagRequestModel.model_validate(body)
+        settings = request.model_dump(exclude={'files'})
+        requests = [
+            ParseRequestModel.model_validate({**settings, 'key_id': item.key_id, 'file_url': item.file_url})
+            for item in request.files
+        ]
+        key_ids = [item.key_id for item in request.files]
+        if len(set(key_ids)) != len(key_ids):
+            raise ValueError('Duplicate key_id in files.')
+    except Exception as e:
+        logger.error(f'{task_id} Fail to validate pydantic instance for:\n{traceback.format_exc()}')
+        return ApiRagResponseModel(
+            code=2000,
+            msg=f'{task_id}: The request body field is incorrect for:{type(e).__name__}: {str(e)}.'
+        )
+
+    # 共享的向量化实例，创建失败时由各文件的任务分别创建并记录失败原因
+    try:
+        vectorizer = VectorizeProcessor().get_vectorizer(**settings)
+    except Exception:
+        logger.warning(f'{task_id} Fail to get vectorizer for:\n{traceback.format_exc()}')
+        vectorizer = None
+
+    server_config = get_config().get('server', {})
+    parse_batch_concurrency = max(server_config.get('parse_batch_concurrency', _DEFAULT_PARSE_BATCH_CONCURRENCY), 1)
+    concurrency_semaphore = asyncio.Semaphore(parse_batch_concurrency)
+    # 同时发送的向量化请求数与同时处理的文件数一致；向量化实例创建失败时各文件的任务分别创建，不共享批次
+    embedding_batcher = EmbeddingBatcher(
+        vectorizer,
+        server_config.get('embedding_batch_size', _DEFAULT_EMBEDDING_BATCH_SIZE),
+        parse_batch_concurrency,
+    ) if vectorizer is not None else None
+
+    # 创建异步任务，每个文件独立登记
+    try:
+        async with app.state.rag_tasks_mtx:
+            running_key_ids = [key_id for key_id in key_ids if key_id in app.state.rag_tasks_flag]
+            if running_key_ids:
+                raise ValueError(f'Documents {running_key_ids} are running.')
+            for document_request in requests:
+                stop_event = Event()
+                future = asyncio.create_task(batch_task(
+                    f'{task_id}[{document_request.key_id}]',
+                    stop_event,
+                    document_request,
+                    concurrency_semaphore,
+                    vectorizer,
+                    embedding_batcher,
+                ))
+                app.state.rag_tasks_flag[document_request.key_id] = (future, stop_event)
+    except Exception as e:
+        logger.error(f'{task_id} Fail to create async task for:\n{traceback.format_exc()}')
+        return ApiRagResponseModel(
+            code=2000,
+            msg=f'{task_id}: Fail to create async task for:{type(e).__name__}: {str(e)}.'
+        )
+
+    logger.debug(f'{task_id} Succeed to create {len(requests)} async tasks.')
+
+    # 返回响应
+    return ApiRagResponseModel(
+        code=1000,
+        msg=f'{task_id} Success.',
+        data={'key_ids': key_ids},
+    )
@@ -3,13 +3,11 @@
 '''
 
 from typing import Dict, Optional
-from enum import Enum
 import traceback
 from uuid import uuid4
 import asyncio
 import json
 from threading import Event
-import concurrent.futures
 from pathlib import Path
 
 from pydantic import Field
@@ -23,21 +21,19 @@ from core.rag.cleaner.clean_processor import CleanProcessor
 from core.rag.splitter.split_processor import SplitProcessor
 from core.rag.splitter.splitter_entities import SplitType
 from core.rag.vectorizer.vectorize_processor import VectorizeProcessor
+from core.rag.vectorizer.vectorizer_base import BaseVectorizer
+from core.rag.vectorizer.incremental_vectorize_processor import IncrementalVectorizeProcessor
+from core.rag.vectorizer.embedding_batcher import EmbeddingBatcher
 from core.rag.utils.sql_operation import (
     update_documents_into_db, 
-    insert_vector_into_db,
     modify_document_status_by_id,
     delete_vector_by_document_id, 
 )
-from core.rag.utils.rag_utils import (
-    generate_preview_chunks_from_documents, 
-    generate_chunks_from_documents, 
-    list_to_pgvector_str, 
-    len_without_link, 
-)
+from core.rag.utils.rag_utils import generate_preview_chunks_from_documents
 from core.database.database_factory import DatabaseFactory
-from api.api_rag.entities import DocumentStatus, ChunkStatus
+from api.api_rag.entities import DocumentStatus
 from logger import get_logger
+from core.rag.retriever.retrieve_cache import RetrieveCache
 from config.config import get_config
 
 logger = get_logger('api')
@@ -47,10 +43,17 @@ class ApiRagRequestModel(RequestModel):
     model_instance_provider: str = Field(..., description='模型供应商')
     model_instance_config: Dict = Field(..., description='模型配置信息')
 
-async def gather_coros(coros):
-    return await asyncio.gather(*coros, return_exceptions=True)
-
-async def async_task(task_id: str, stop_event: Event, request: ApiRagRequestModel) -> None:
+async def async_task(
+    task_id: str, 
+    stop_event: Event, 
+    request: ApiRagRequestModel, 
+    vectorizer: Optional[BaseVectorizer] = None, 
+    embedding_batcher: Optional[EmbeddingBatcher] = None, 
+) -> None:
+    '''
+        vectorizer: 批量解析时共享的向量化实例，为空时按请求创建
+        embedding_batcher: 批量解析时共享的向量化批次，多个文档的片段共同填满批次，以一次请求向量化
+    '''
     logger.debug(f'{task_id} Start processing.')
 
     # 获取数据库实例
@@ -83,19 +86,6 @@ async def async_task(task_id: str, stop_event: Event, request: ApiRagRequestMode
             app.state.rag_tasks_flag.pop(request.key_id, None)
         return
 
-    # 删除document下所有片段
-    try:
-        await delete_vector_by_document_id(db, request.key_id)
-        logger.debug(f'{task_id} Delete vectors.')
-    except asyncio.CancelledError:
-        logger.warning(f'{task_id} Task cancel.')
-        return
-    except Exception as e:
-        logger.error(f'{task_id} Fail to delete vectors for:\n{traceback.format_exc()}')
-        async with app.state.rag_tasks_mtx:
-            app.state.rag_tasks_flag.pop(request.key_id, None)
-        return
-
     documents = []
     split_type = None
     preview_chunks = None
@@ -106,29 +96,40 @@ async def async_task(task_id: str, stop_event: Event, request: ApiRagRequestMode
 
     try:
         # 获取向量化实例
-        vectorizer = VectorizeProcessor().get_vectorizer(**request.model_dump())
+        if vectorizer is None:
+            vectorizer = VectorizeProcessor().get_vectorizer(**request.model_dump())
         logger.debug(f'{task_id} Got vectorizer.')
 
-        # 提取
+        # 提取，在线程池中执行，不阻塞事件循环
+        # 按批提取、清洗与分段（CSV、Excel按行流式读取），普通分段的各提取结果相互独立，逐批分段与整体分段的结果一致；
+        # Q&A分段以全部片段判断是否全部生成失败，提取结果汇总后再分段
         document_path_prefix = get_config().get('dependent_info').get('knowledge_base').get('document_path_prefix')
         file_path = Path(document_path_prefix) / request.file_url
         file_id = str(uuid4())
-        documents = ExtractProcessor().extract(
-            file_path=file_path, 
-            file_id=file_id
-        )
-        logger.debug(f'{task_id} Extracted.')
-
-        # 清洗
-        for document in documents:
-            document.page_content = CleanProcessor.clean(
-                document.page_content, 
-                **(request.cleaner_setting.model_dump())
-            )
-        logger.debug(f'{task_id} Cleaned.')
-
-        # 分段
-        split_type, documents = await SplitProcessor.split(documents, task_id=task_id, stop_event=stop_event, **request.model_dump())
+        loop = asyncio.get_running_loop()
+        batches = ExtractProcessor.iter_extract(file_path, file_id, request.extract_profile)
+        extracted = []
+        documents = []
+        while (batch := await loop.run_in_executor(app.state.api_thread_pool, next, batches, None)) is not None:
+            logger.debug(f'{task_id} Extracted {len(batch)} documents.')
+
+            # 清洗
+            for document in batch:
+                document.page_content = CleanProcessor.clean(
+                    document.page_content, 
+                    **(request.cleaner_setting.model_dump())
+                )
+
+            if request.qa_setting.enable:
+                extracted.extend(batch)
+                continue
+
+            # 分段
+            split_type, chunks = await SplitProcessor.split(batch, task_id=task_id, stop_event=stop_event, **request.model_dump())
+            documents.extend(chunks)
+
+        if request.qa_setting.enable:
+            split_type, documents = await SplitProcessor.split(extracted, task_id=task_id, stop_event=stop_event, **request.model_dump())
         logger.debug(f'{task_id} Splitted - {len(documents)} chunks.')
 
         # 为document添加序号
@@ -154,93 +155,52 @@ async def async_task(task_id: str, stop_event: Event, request: ApiRagRequestMode
         process_failed_reason = f"{type(e).__name__}:{str(e)[:100]}"
 
     if process_status == DocumentStatus.SUCCESS.value:
-        # 向量化
+        # 向量化，与文档下已有的片段比对，仅向量化内容变化的片段，在同一事务中写入
         logger.debug(f'{task_id} Vectorizing...')
-        embedding_batch_size = get_config().get('server', {}).get('embedding_batch_size', 8)
-        failed_count = 0
-        for i in range(0, len(documents), embedding_batch_size):
-
-            batch_documents = documents[i: i + embedding_batch_size]
-
-            coros = [VectorizeProcessor.vectorize(
-                vectorizer, [document.page_content]
-            ) for document in batch_documents]
-
-            try:
-                outputs = await gather_coros(coros)
-            except asyncio.CancelledError:
-                logger.warning(f'{task_id} Task cancel.')
-                return
-
-            values = []
-            for idx, output in enumerate(outputs):
-                
-                # 在metadata中添加title字段
-                batch_documents[idx].metadata['title'] = name
-
-                if isinstance(output, Exception):
-                    failed_count += 1
-
-                    batch_documents[idx].metadata['failed_reason'] = f"{type(output).__name__}:{str(output)[:100]}"
-
-                    values.append(
-                        (
-                            batch_documents[idx].metadata.get('content_id'),
-                            request.knowledge_base_id,
-                            request.key_id,
-                            batch_documents[idx].page_content,
-                            (
-                                batch_documents[idx].page_content if split_type == SplitType.NORMAL.value 
-                                else f'Question: {batch_documents[idx].page_content}\nAnswer: {batch_documents[idx].metadata.get("answer")}'
-                            ),
-                            json.dumps(batch_documents[idx].metadata),
-                            None,
-                            None,
-                            ChunkStatus.FAILED.value,
-                            batch_documents[idx].metadata.get('content_hash'),
-                            split_type,
-                        )
-                    )
-                    logger.warning(f'{task_id} [{i + idx}] Vectorize failed for:\n{repr(output)}')
-                else:
-                    # 成功
-                    values.append(
-                        (
-                            batch_documents[idx].metadata.get('content_id'),
-                            request.knowledge_base_id,
-                            request.key_id,
-                            batch_documents[idx].page_content,
-                            (
-                                batch_documents[idx].page_content if split_type == SplitType.NORMAL.value 
-                                else f'Question: {batch_documents[idx].page_content}\nAnswer: {batch_documents[idx].metadata.get("answer")}'
-                            ),
-                            json.dumps(batch_documents[idx].metadata),
-                            list_to_pgvector_str(output[0]['vector']),
-                            json.dumps(output[0]['usage']),
-                            ChunkStatus.SUCCESS.value,
-                            batch_documents[idx].metadata.get('content_hash'),
-                            split_type,
-                        )
-                    )
-                    logger.debug(f'{task_id} [{i + idx}] Vectorize Done.')
-
-            # 入向量库
-            try:
-                ids = await insert_vector_into_db(db, values)
-
-                for id, idx in enumerate(range(i, i + len(batch_documents))):
-                    documents[idx].metadata['primary_key'] = ids[id]['id']
-
-                logger.debug(f'{task_id} document[{i}-{i + len(batch_documents) - 1}] inserted into database.')
-            except asyncio.CancelledError:
-                logger.warning(f'{task_id} Task cancel.')
-                return
-            except Exception:
-                logger.error(f'{task_id} document[{i}-{i + len(batch_documents) - 1}] insert into database failed for:\n{traceback.format_exc()}')
-        
-        if len(documents) > 0 and failed_count == len(documents):
-            process_failed_reason = 'RuntimeError:All chunks failed when vectorize.'
+        try:
+            chunks = [
+                (
+                    document,
+                    document.page_content if split_type == SplitType.NORMAL.value
+                    else f'Question: {document.page_content}\nAnswer: {document.metadata.get("answer")}',
+                )
+                for document in documents
+            ]
+            failed_count = await IncrementalVectorizeProcessor.vectorize(
+                db,
+                vectorizer,
+                task_id,
+                request.knowledge_base_id,
+                request.key_id,
+                split_type,
+                name,
+                chunks,
+                embedding_batcher,
+            )
+            logger.debug(f'{task_id} Vectors written into database.')
+            RetrieveCache.invalidate(request.knowledge_base_id)
+
+            if len(chunks) > 0 and failed_count == len(chunks):
+                process_failed_reason = 'RuntimeError:All chunks failed when vectorize.'
+                process_status = DocumentStatus.FAILED.value
+        except asyncio.CancelledError:
+            logger.warning(f'{task_id} Task cancel.')
+            return
+        except Exception as e:
+            logger.error(f'{task_id} Fail to write vectors into database for:\n{traceback.format_exc()}')
+            process_failed_reason = f"{type(e).__name__}:{str(e)[:100]}"
             process_status = DocumentStatus.FAILED.value
+    else:
+        # 提取或分段失败，删除document下所有片段
+        try:
+            await delete_vector_by_document_id(db, request.key_id)
+            RetrieveCache.invalidate(request.knowledge_base_id)
+            logger.debug(f'{task_id} Delete vectors.')
+        except asyncio.CancelledError:
+            logger.warning(f'{task_id} Task cancel.')
+            return
+        except Exception:
+            logger.error(f'{task_id} Fail to delete vectors for:\n{traceback.format_exc()}')
 
     try:
         preview_chunks = generate_preview_chunks_from_documents(split_type, documents, False)
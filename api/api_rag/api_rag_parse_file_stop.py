@@ -16,6 +16,7 @@ from core.rag.utils.sql_operation import (
 from core.database.database_factory import DatabaseFactory
 from api.api import app, get_api_client_tag
 from logger import get_logger
+from core.rag.retriever.retrieve_cache import RetrieveCache
 from config.config import get_config
 
 logger = get_logger('api')
@@ -72,7 +73,9 @@ async def handler(conn: Request, body: Dict = Body(...)):
     # 异步任务：删除document下所有片段
     async def async_task():
         try:
-            await delete_vector_by_document_id(db, request.key_id)
+            knowledge_base_ids = await delete_vector_by_document_id(db, request.key_id)
+            for knowledge_base_id in knowledge_base_ids:
+                RetrieveCache.invalidate(knowledge_base_id)
             logger.debug(f'{task_id} Delete vectors.')
         except Exception as e:
             logger.error(f'{task_id} Fail to delete vectors for:\n{traceback.format_exc()}')
@@ -13,6 +13,7 @@ from fastapi import Request, Body
 
 from api.api import app, get_api_client_tag
 from core.rag.extractor.extract_processor import ExtractProcessor
+from core.rag.extractor.extractor_entities import ExtractProfile
 from core.rag.cleaner.clean_processor import CleanProcessor
 from core.rag.splitter.split_processor import SplitProcessor
 from core.rag.utils.rag_utils import generate_preview_chunks_from_documents
@@ -40,6 +41,7 @@ class ApiRagRequestModel(BaseModel):
     fatherchunk_setting: FatherChunkSetting = Field(..., description='父段设置')
     sonchunk_setting: SonChunkSetting = Field(..., description='子段设置')
     cleaner_setting: CleanerSetting = Field(..., description='文本预处理规则')
+    extract_profile: ExtractProfile = Field(ExtractProfile.TEXT_IMAGE, description='提取方式，TEXT_IMAGE为提取文本与图片，TEXT为仅提取文本')
 
 class ApiRagResponseModel(BaseModel):
     code: int = Field(..., description='状态码，成功为1000，失败为2000')
@@ -68,7 +70,7 @@ async def handler(conn: Request, body: Dict = Body(...)):
     try:
         document_path_prefix = get_config().get('dependent_info').get('knowledge_base').get('document_path_prefix')
         file_path = Path(document_path_prefix) / request.file_url
-        documents = ExtractProcessor().extract(file_path=file_path, file_id=file_id)
+        documents = ExtractProcessor().extract(file_path=file_path, file_id=file_id, extract_profile=request.extract_profile)
     except Exception as e:
         logger.error(f'{task_id} Fail to extract file:\n{traceback.format_exc()}')
         return ApiRagResponseModel(
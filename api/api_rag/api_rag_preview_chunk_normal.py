@@ -13,6 +13,7 @@ from fastapi import Request, Body
 
 from api.api import app, get_api_client_tag
 from core.rag.extractor.extract_processor import ExtractProcessor
+from core.rag.extractor.extractor_entities import ExtractProfile
 from core.rag.cleaner.clean_processor import CleanProcessor
 from core.rag.splitter.split_processor import SplitProcessor
 from core.rag.splitter.splitter_entities import SplitType
@@ -43,6 +44,7 @@ class ApiRagRequestModel(BaseModel):
     chunk_setting: ChunkSetting = Field(..., description='分段设置')
     cleaner_setting: CleanerSetting = Field(..., description='文本预处理规则')
     qa_setting: QaSetting = Field(..., description='Q&A分段设置')
+    extract_profile: ExtractProfile = Field(ExtractProfile.TEXT_IMAGE, description='提取方式，TEXT_IMAGE为提取文本与图片，TEXT为仅提取文本')
 
 class ApiRagResponseModel(BaseModel):
     code: int = Field(..., description='状态码，成功为1000，失败为2000')
@@ -71,7 +73,7 @@ async def handler(conn: Request, body: Dict = Body(...)):
     try:
         document_path_prefix = get_config().get('dependent_info').get('knowledge_base').get('document_path_prefix')
         file_path = Path(document_path_prefix) / request.file_url
-        documents = ExtractProcessor().extract(file_path=file_path, file_id=file_id)
+        documents = ExtractProcessor().extract(file_path=file_path, file_id=file_id, extract_profile=request.extract_profile)
     except Exception as e:
         logger.error(f'{task_id} Fail to extract file:\n{traceback.format_exc()}')
         return ApiRagResponseModel(
@@ -2,7 +2,7 @@
     知识库设置：修改Embedding模型后的重建向量
 '''
 
-from typing import Dict, Optional
+from typing import Dict, Optional, List, Literal
 import traceback
 import json
 import asyncio
@@ -17,10 +17,12 @@ from core.rag.utils.sql_operation import (
     select_vector_from_db, 
     update_vector_into_db,
     modify_document_status_by_knowledge_base_id,
+    set_quantized_vector_indexes,
 )
 from core.rag.utils.rag_utils import list_to_pgvector_str
 from core.model.model_entities import TokenUsage
 from api.api_rag.entities import DocumentStatus, ChunkStatus
+from core.rag.retriever.retrieve_cache import RetrieveCache
 from config.config import get_config
 from logger import get_logger
 
@@ -30,6 +32,7 @@ class ApiRagRequestModel(BaseModel):
     knowledge_base_id: int = Field(..., description='java内部知识库id')
     model_instance_provider: str = Field(..., description='模型供应商')
     model_instance_config: Dict = Field(..., description='模型配置信息')
+    vector_index_precisions: List[Literal['halfvec', 'bit']] = Field(default_factory=list, description='重建后为知识库建立的低精度向量索引')
 
 class ApiRagResponseModel(BaseModel):
     code: int = Field(..., description='状态码，成功为1000，失败为2000')
@@ -81,10 +84,21 @@ async def handler(conn: Request, body: Dict = Body(...)):
             msg=f'{task_id}: Fail to modify document status for:{type(e).__name__}: {str(e)}.'
         )
 
+    # 删除低精度向量索引，其表达式中的维度固定，新模型的向量维度可能不同
+    try:
+        await set_quantized_vector_indexes(db, request.knowledge_base_id, [])
+    except Exception as e:
+        logger.error(f'{task_id} Fail to drop quantized vector indexes for:\n{traceback.format_exc()}')
+        return ApiRagResponseModel(
+            code=2000,
+            msg=f'{task_id}: Fail to drop quantized vector indexes for:{type(e).__name__}: {str(e)}.'
+        )
+
     # 取出记录
     try:
         # records [(content_id, retrieve_content)]
         records = await select_vector_from_db(db, request.knowledge_base_id)
+        RetrieveCache.invalidate(request.knowledge_base_id)
         logger.debug(f'{task_id} Select {len(records)} from database.')
         # logger.debug(f'{task_id} Records:\n{records}')
     except Exception as e:
@@ -144,6 +158,7 @@ async def handler(conn: Request, body: Dict = Body(...)):
             if update_tuples:
                 try:
                     await update_vector_into_db(db, update_tuples)
+                    RetrieveCache.invalidate(request.knowledge_base_id)
                     logger.debug(f'{task_id} Updated records[{i}-{i+len(batch_records)-1}] into database.')
                 except Exception as e:
                     logger.error(f'{task_id} Fail to update records[{i}-{i+len(batch_records)-1}] into database for:\n{traceback.format_exc()}')
@@ -167,6 +182,14 @@ async def handler(conn: Request, body: Dict = Body(...)):
     else:
         logger.warning(f'{task_id} Cannot find any records in knowledge_base by id[{request.knowledge_base_id}].')
 
+    # 按新的向量维度建立低精度向量索引
+    if request.vector_index_precisions:
+        try:
+            await set_quantized_vector_indexes(db, request.knowledge_base_id, request.vector_index_precisions)
+            logger.debug(f'{task_id} Created vector indexes: {request.vector_index_precisions}.')
+        except Exception as e:
+            logger.error(f'{task_id} Fail to create quantized vector indexes for:\n{traceback.format_exc()}')
+
     # 修改文档库中当前知识库id下的文档状态为SUCCESS
     try:
         await modify_document_status_by_knowledge_base_id(
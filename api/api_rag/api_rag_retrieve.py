@@ -72,6 +72,7 @@ async def handler(conn: Request, body: Dict = Body(...)):
     for document in documents:
         metadata = copy.deepcopy(document.metadata)
         metadata.pop('context_content')
+        metadata.pop('keywords', None)
 
         # 当是父子分段时，修改子段metadata的idx为f_idx
         if 'f_idx' in metadata:
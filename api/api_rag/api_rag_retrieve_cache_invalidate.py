@@ -0,0 +1,52 @@
+'''
+    知识库检索缓存失效
+
+    本服务之外修改知识库数据后（如控制台启用/禁用/删除文档、归档文档）调用，
+    递增知识库版本号，清除该知识库的检索结果缓存，内存向量索引在下次检索时重新加载
+'''
+
+from typing import Dict, List
+import json
+import traceback
+
+from pydantic import BaseModel, Field
+from fastapi import Request, Body
+
+from api.api import app, get_api_client_tag
+from core.rag.retriever.retrieve_cache import RetrieveCache
+from logger import get_logger
+
+logger = get_logger('api')
+
+class ApiRagRequestModel(BaseModel):
+    knowledge_base_ids: List[int] = Field(..., description='数据发生变更的java内部知识库id')
+
+class ApiRagResponseModel(BaseModel):
+    code: int = Field(..., description='状态码，成功为1000，失败为2000')
+    msg: str = Field(..., description='状态信息')
+
+@app.post(path='/Voicecomm/VoiceSageX/Rag/RetrieveCacheInvalidate', response_model=ApiRagResponseModel, response_model_exclude_none=False)
+async def handler(conn: Request, body: Dict = Body(...)):
+    tag, task_id = get_api_client_tag(conn)
+    logger.debug(f'{task_id} {tag}')
+
+    # 格式校验
+    try:
+        logger.debug(f'{task_id} Request body:\n{json.dumps(body, indent=4, ensure_ascii=False)}')
+        request = ApiRagRequestModel.model_validate(body)
+    except Exception as e:
+        logger.error(f'{task_id} Fail to validate pydantic instance for:\n{traceback.format_exc()}')
+        return ApiRagResponseModel(
+            code=2000,
+            msg=f'{task_id}: The request body field is incorrect for:{type(e).__name__}: {str(e)}.'
+        )
+
+    for knowledge_base_id in request.knowledge_base_ids:
+        RetrieveCache.invalidate(knowledge_base_id)
+
+    logger.debug(f'{task_id} Done.')
+
+    return ApiRagResponseModel(
+        code=1000,
+        msg=f'{task_id} Success.',
+    )
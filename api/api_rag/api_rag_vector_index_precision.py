@@ -0,0 +1,82 @@
+'''
+    知识库设置：低精度向量索引
+
+    为知识库建立 halfvec / bit 低精度向量索引，并删除未指定精度的索引
+    检索配置 vector_precision 为 halfvec / bit 时使用对应的索引召回候选，再以原始精度重新计算得分
+    建立索引耗时与知识库大小相关，在后台任务中执行，接口提交任务后即返回；同一知识库同时只执行一个任务
+'''
+
+from typing import Dict, List, Literal
+import json
+import traceback
+import asyncio
+
+from pydantic import BaseModel, Field
+from fastapi import Request, Body
+
+from api.api import app, get_api_client_tag
+from core.database.database_factory import DatabaseFactory
+from core.rag.utils.sql_operation import set_quantized_vector_indexes
+from config.config import get_config
+from logger import get_logger
+
+logger = get_logger('api')
+
+class ApiRagRequestModel(BaseModel):
+    knowledge_base_id: int = Field(..., description='java内部知识库id')
+    vector_index_precisions: List[Literal['halfvec', 'bit']] = Field(..., description='需要建立的低精度向量索引，为空时删除所有低精度索引')
+
+class ApiRagResponseModel(BaseModel):
+    code: int = Field(..., description='状态码，成功为1000，失败为2000')
+    msg: str = Field(..., description='状态信息')
+
+# 执行中的建立索引任务：knowledge_base_id -> Task
+_index_tasks: Dict[int, asyncio.Task] = {}
+
+async def async_task(task_id: str, db, request: ApiRagRequestModel):
+    try:
+        await set_quantized_vector_indexes(db, request.knowledge_base_id, request.vector_index_precisions)
+        logger.info(f'{task_id} Set vector indexes {request.vector_index_precisions} of knowledge base [{request.knowledge_base_id}].')
+    except asyncio.CancelledError:
+        logger.warning(f'{task_id} Task cancel.')
+    except Exception:
+        logger.error(f'{task_id} Fail to set vector indexes for:\n{traceback.format_exc()}')
+
+@app.post(path='/Voicecomm/VoiceSageX/Rag/VectorIndexPrecision', response_model=ApiRagResponseModel, response_model_exclude_none=False)
+async def handler(conn: Request, body: Dict = Body(...)):
+    tag, task_id = get_api_client_tag(conn)
+    logger.debug(f'{task_id} {tag}')
+
+    # 格式校验
+    try:
+        logger.debug(f'{task_id} Request body:\n{json.dumps(body, indent=4, ensure_ascii=False)}')
+        request = ApiRagRequestModel.model_validate(body)
+    except Exception as e:
+        logger.error(f'{task_id} Fail to validate pydantic instance for:\n{traceback.format_exc()}')
+        return ApiRagResponseModel(
+            code=2000,
+            msg=f'{task_id}: The request body field is incorrect for:{type(e).__name__}: {str(e)}.'
+        )
+
+    # 异步任务：建立/删除索引
+    try:
+        if request.knowledge_base_id in _index_tasks:
+            raise ValueError(f'Vector indexes of knowledge base {request.knowledge_base_id} are being set.')
+        database_info = get_config()['dependent_info']['database']
+        db = DatabaseFactory.get_database(database_info['type'])
+        future = asyncio.create_task(async_task(task_id, db, request))
+        _index_tasks[request.knowledge_base_id] = future
+        future.add_done_callback(lambda _: _index_tasks.pop(request.knowledge_base_id, None))
+    except Exception as e:
+        logger.error(f'{task_id} Fail to submit task for:\n{traceback.format_exc()}')
+        return ApiRagResponseModel(
+            code=2000,
+            msg=f'{task_id}: Fail to submit task for:{type(e).__name__}: {str(e)}.'
+        )
+
+    logger.debug(f'{task_id} Submit task.')
+
+    return ApiRagResponseModel(
+        code=1000,
+        msg=f'{task_id} Success.',
+    )
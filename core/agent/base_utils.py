@@ -219,47 +219,49 @@ def usage_to_output(usage: UsageMetadata) -> Dict:
     }
 
 
+def _char_tokens(c: str) -> float:
+    # 中文 / CJK
+    if "\u4e00" <= c <= "\u9fff" or "\u3400" <= c <= "\u4dbf" or "\uf900" <= c <= "\ufaff":
+        return 1.5
+    # ASCII 英文 / 数字 / 标点
+    elif c.isascii():
+        return 0.25
+    # Emoji / 其他符号
+    elif unicodedata.category(c).startswith("So") or unicodedata.category(c).startswith("Sk"):
+        return 1.5
+    else:
+        # 其他 Unicode 字符（如希腊字母、拉丁扩展等）
+        return 1
+
+def estimate_text_tokens(text: str) -> int:
+    '''
+    粗略估算文本的tokens数
+    '''
+    if not text:
+        return 0
+    return max(1, int(sum(_char_tokens(c) for c in text)))
+
 def estimate_tokens(messages: Sequence[BaseMessage]) -> int:
     '''
     粗略估算消息的tokens数
     '''
     total_tokens = 0
 
-    def _text_tokens(text: str) -> int:
-        if not text:
-            return 0
-
-        tokens = 0.0
-        for c in text:
-            # 中文 / CJK
-            if "\u4e00" <= c <= "\u9fff" or "\u3400" <= c <= "\u4dbf" or "\uf900" <= c <= "\ufaff":
-                tokens += 1.5
-            # ASCII 英文 / 数字 / 标点
-            elif c.isascii():
-                tokens += 0.25
-            # Emoji / 其他符号
-            elif unicodedata.category(c).startswith("So") or unicodedata.category(c).startswith("Sk"):
-                tokens += 1.5
-            else:
-                # 其他 Unicode 字符（如希腊字母、拉丁扩展等）
-                tokens += 1
-        return max(1, int(tokens))
-        
     for msg in messages:
         total_tokens += 6   # 每条 message 的基础开销
         if isinstance(msg, HumanMessage):
-            total_tokens += _text_tokens(msg.content)
+            total_tokens += estimate_text_tokens(msg.content)
         elif isinstance(msg, AIMessage):
-            total_tokens += _text_tokens(msg.content)
+            total_tokens += estimate_text_tokens(msg.content)
             for tc in getattr(msg, "tool_calls", []) or []:
-                total_tokens += _text_tokens(tc["name"])
+                total_tokens += estimate_text_tokens(tc["name"])
                 if tc["args"]:
                     args_str = json.dumps(tc["args"], ensure_ascii=False)
-                    total_tokens += _text_tokens(args_str)
+                    total_tokens += estimate_text_tokens(args_str)
         elif isinstance(msg, ToolMessage):
-            total_tokens += _text_tokens(msg.content)
+            total_tokens += estimate_text_tokens(msg.content)
             if msg.name:
-                total_tokens += _text_tokens(msg.name)
+                total_tokens += estimate_text_tokens(msg.name)
         else:
             pass
 
@@ -17,6 +17,7 @@ class PostgresDatabase(BaseDatabase):
         port: int = 5432,
         min_size: int = 1,
         max_size: int = 10,
+        statement_cache_size: int = 100,
         **kwargs
     ):
         self._pool = await asyncpg.create_pool(
@@ -27,6 +28,8 @@ class PostgresDatabase(BaseDatabase):
             port=port,
             min_size=min_size,
             max_size=max_size,
+            # 每个连接缓存的预编译语句数，检索SQL参数化后同一结构的查询可复用执行计划
+            statement_cache_size=statement_cache_size,
         )
 
     async def disconnect(self):
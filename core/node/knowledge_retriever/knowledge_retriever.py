@@ -33,17 +33,27 @@ async def aknowledge_retrieve(
     }
 
     for retrieve_config in knowledge_base_list:
+        # WEIGHT召回且知识库与召回使用同一Embedding模型时，直接复用库中已存储的向量
+        reuse_vector = (
+            is_recall
+            and knowledge_recall_config is not None
+            and knowledge_recall_config.rerank_type == 'WEIGHT'
+            and RetrieveProcessor.is_same_embedding_model(retrieve_config, knowledge_recall_config)
+        )
+
         retrieve_documents, retrieve_usage = await RetrieveProcessor.retrieve(
             query=query,
             retrieve_config=retrieve_config,
             is_metadata_filter=is_metadata_filter,
             metadata_mode=metadata_mode,
             metadata_info=metadata_info,
+            need_vector=reuse_vector,
         )
 
-        # 将所有的document的向量置None，再召回时重新生成，避免后续处理时，维度不一
-        for doc in retrieve_documents:
-            doc.vector = None
+        # Embedding模型不一致时，将document的向量置None，在召回时重新生成，避免后续处理时，维度不一
+        if not reuse_vector:
+            for doc in retrieve_documents:
+                doc.vector = None
 
         documents_list.append(retrieve_documents)
         usage = add_usage_dict(usage, retrieve_usage)
@@ -61,6 +71,7 @@ async def aknowledge_retrieve(
     for document in recall_documents:
         metadata = copy.deepcopy(document.metadata)
         metadata.pop('context_content')
+        metadata.pop('keywords', None)
 
         item = {
             "content": document.metadata.get('context_content', ''),
@@ -0,0 +1,200 @@
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+import zlib
+
+from config.config import get_config
+from core.rag.entities.document import Document
+from core.rag.extractor.image_store import ImageStore
+from logger import get_logger
+
+logger = get_logger('rag')
+
+_DEFAULT_CACHE_DIR = ''
+_DEFAULT_CACHE_MAX_MB = 1024
+# 提取器输出格式变化时递增，使旧的缓存失效
+_CACHE_FORMAT_VERSION = 1
+_CACHE_SUFFIX = '.json.z'
+_HASH_CHUNK_SIZE = 1 << 20
+
+class ExtractCache:
+    '''
+        文档提取结果的磁盘缓存，缓存键为 (文件内容哈希, 提取器类型, 提取选项)
+        预览分段后再解析同一文件、以不同分段设置重新解析时，跳过提取
+        - 缓存文件为 zlib 压缩的 json，写入时先写临时文件再替换，读取时更新修改时间
+        - 缓存总大小在首次写入时统计一次，之后随写入、淘汰累计；超出上限时重新扫描目录，按修改时间淘汰最久未使用的缓存文件
+        - 结果中的图片链接与来源路径以缓存时的文件为准，命中其他文件（内容相同）时替换为当前文件的；
+          命中时将图片从 ImageStore 的内容存储链接到当前文件的图片目录，图片内容已不存在时视为未命中
+        配置：
+            server.extract_cache_dir: 缓存目录，为空时关闭缓存
+            server.extract_cache_max_mb: 缓存总大小上限（MB）
+    '''
+    _lock = threading.Lock()
+    # 缓存目录当前的总大小，为None时需扫描目录统计
+    _total_bytes: Optional[int] = None
+    _total_dir: Optional[Path] = None
+
+    _metrics = {
+        'hits': 0,
+        'misses': 0,
+        'evictions': 0,
+        'errors': 0,
+    }
+
+    @classmethod
+    def _get_cache_dir(cls) -> Optional[Path]:
+        cache_dir = get_config().get('server', {}).get('extract_cache_dir', _DEFAULT_CACHE_DIR)
+        return Path(cache_dir) if cache_dir else None
+
+    @classmethod
+    def _get_max_bytes(cls) -> int:
+        return get_config().get('server', {}).get('extract_cache_max_mb', _DEFAULT_CACHE_MAX_MB) * 1024 * 1024
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        return cls._get_cache_dir() is not None
+
+    @staticmethod
+    def hash_file(file_path: str) -> str:
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            while chunk := f.read(_HASH_CHUNK_SIZE):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    @classmethod
+    def make_key(cls, file_path: str, extractor_type: str, options: Dict) -> str:
+        raw = json.dumps(
+            [_CACHE_FORMAT_VERSION, cls.hash_file(file_path), extractor_type, options],
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def get(cls, key: str, file_path: str) -> Optional[List[Document]]:
+        path = cls._get_cache_dir() / key[:2] / f'{key}{_CACHE_SUFFIX}'
+        try:
+            with open(path, 'rb') as f:
+                entry = json.loads(zlib.decompress(f.read()))
+            # 修改时间作为最近使用时间
+            os.utime(path)
+        except FileNotFoundError:
+            cls._metrics['misses'] += 1
+            return None
+        except Exception:
+            logger.warning(f'Fail to read extract cache {path}, ignored.')
+            cls._metrics['errors'] += 1
+            cls._metrics['misses'] += 1
+            return None
+
+        documents = [
+            Document(page_content=page_content, metadata=metadata)
+            for page_content, metadata in entry['documents']
+        ]
+
+        if entry['images']:
+            settings = ImageStore.get_settings(Path(file_path).stem)
+            if not ImageStore(**settings).restore(entry['images']):
+                cls._metrics['misses'] += 1
+                return None
+            if settings['url_prefix'] != entry['url_prefix']:
+                for document in documents:
+                    document.page_content = document.page_content.replace(f'{entry["url_prefix"]}/', f'{settings["url_prefix"]}/')
+
+        if entry['file_path'] != file_path:
+            for document in documents:
+                for k, v in document.metadata.items():
+                    if v == entry['file_path']:
+                        document.metadata[k] = file_path
+
+        cls._metrics['hits'] += 1
+        return documents
+
+    @classmethod
+    def put(cls, key: str, file_path: str, documents: List[Document]):
+        cache_dir = cls._get_cache_dir()
+        url_prefix = ImageStore.get_settings(Path(file_path).stem)['url_prefix']
+        image_pattern = re.compile(re.escape(f'{url_prefix}/') + r'([0-9a-f]{32}\.\w+)\)')
+        images = sorted({name for document in documents for name in image_pattern.findall(document.page_content)})
+
+        entry = {
+            'file_path': file_path,
+            'url_prefix': url_prefix,
+            'images': images,
+            'documents': [[document.page_content, document.metadata] for document in documents],
+        }
+        data = zlib.compress(json.dumps(entry, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        # 超出缓存上限的结果不缓存，避免淘汰其他全部缓存
+        if len(data) > cls._get_max_bytes():
+            return
+
+        path = cache_dir / key[:2] / f'{key}{_CACHE_SUFFIX}'
+        tmp_path = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.tmp')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            try:
+                replaced_size = path.stat().st_size
+            except FileNotFoundError:
+                replaced_size = 0
+            os.replace(tmp_path, path)
+        except Exception:
+            logger.warning(f'Fail to write extract cache {path}, ignored.')
+            cls._metrics['errors'] += 1
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        with cls._lock:
+            if cls._total_bytes is None or cls._total_dir != cache_dir:
+                cls._total_bytes = cls._scan(cache_dir)[1]
+                cls._total_dir = cache_dir
+            else:
+                cls._total_bytes += len(data) - replaced_size
+
+            if cls._total_bytes > cls._get_max_bytes():
+                cls._evict(cache_dir)
+
+    @staticmethod
+    def _scan(cache_dir: Path) -> Tuple[List[Tuple[float, int, Path]], int]:
+        entries = []
+        total = 0
+        for path in cache_dir.glob(f'*/*{_CACHE_SUFFIX}'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        return entries, total
+
+    @classmethod
+    def _evict(cls, cache_dir: Path):
+        '''
+            持有 _lock 时调用；重新扫描目录（同时校正其他进程写入、外部删除造成的累计误差），淘汰最久未使用的缓存
+        '''
+        max_bytes = cls._get_max_bytes()
+        entries, total = cls._scan(cache_dir)
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            cls._metrics['evictions'] += 1
+
+        cls._total_bytes = total
+
+    @classmethod
+    def get_metrics(cls) -> Dict:
+        metrics = dict(cls._metrics)
+        lookups = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = metrics['hits'] / lookups if lookups else 0.
+        return metrics
@@ -0,0 +1,45 @@
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import threading
+
+from config.config import get_config
+from logger import get_logger
+
+logger = get_logger('rag')
+
+_DEFAULT_EXECUTOR_WORKERS = 4
+
+class ExtractExecutor:
+    '''
+        文档解析中可按页分片并行部分（如大PDF）的进程池，首次使用时创建
+        配置 server.extract_executor_workers 为进程数，为0或1时不使用进程池
+        提交的函数及其参数需可被pickle
+    '''
+    _executor: Optional[ProcessPoolExecutor] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_workers(cls) -> int:
+        return get_config().get('server', {}).get('extract_executor_workers', _DEFAULT_EXECUTOR_WORKERS)
+
+    @classmethod
+    def get_executor(cls) -> ProcessPoolExecutor:
+        if cls._executor is None:
+            with cls._lock:
+                if cls._executor is None:
+                    executor_workers = cls.get_workers()
+                    # 服务进程中已有多个线程，使用spawn避免fork带来的锁状态问题
+                    cls._executor = ProcessPoolExecutor(
+                        max_workers=executor_workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                    )
+                    logger.info(f'Init extract executor with size({executor_workers}).')
+        return cls._executor
+
+    @classmethod
+    def shutdown(cls):
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=True)
+                cls._executor = None
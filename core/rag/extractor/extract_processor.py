@@ -1,42 +1,114 @@
 from pathlib import Path
-from typing import Optional, List
+from typing import Dict, Iterator, Optional, List
 from uuid import uuid4
 
 from config.config import get_config
 from core.rag.entities.document import Document
 from core.rag.extractor.extractor_base import BaseExtractor
+from core.rag.extractor.extract_cache import ExtractCache
+from core.rag.extractor.extractor_entities import ExtractProfile
 from core.rag.extractor.structured.excel_extractor import ExcelExtractor
-from core.rag.extractor.structured.pdf_extractor import PdfExtractor
+from core.rag.extractor.structured.pdf_extractor import PdfExtractor, _DEFAULT_TEXT_BACKEND
 from core.rag.extractor.structured.markdown_extractor import MarkdownExtractor
 from core.rag.extractor.structured.html_extractor import HtmlExtractor
 from core.rag.extractor.structured.word_extractor import WordExtractor
-from core.rag.extractor.structured.csv_extractor import CSVExtractor
+from core.rag.extractor.structured.csv_extractor import CSVExtractor, _DEFAULT_CHUNK_ROWS
 from core.rag.extractor.structured.text_extractor import TextExtractor
 
 class ExtractProcessor:
 
     @classmethod
-    def extract(cls, file_path: Path, file_id: str) -> List[Document]:
-        file_extension = file_path.suffix.lower()
-        file_path = str(file_path)
-        extractor: Optional[BaseExtractor] = None
+    def _get_extractor(cls, file_path: str, file_id: str, extract_images: bool) -> BaseExtractor:
+        file_extension = Path(file_path).suffix.lower()
 
         if file_extension in ['.xlsx']:
-            extractor = ExcelExtractor(file_path)
+            return ExcelExtractor(file_path)
         elif file_extension in ['.md', '.mdx', '.markdown']:
-            extractor = MarkdownExtractor(file_path, autodetect_encoding=True)
+            return MarkdownExtractor(file_path, autodetect_encoding=True)
         elif file_extension in ['.htm', '.html']:
-            extractor = HtmlExtractor(file_path)
+            return HtmlExtractor(file_path)
         elif file_extension in ['.pdf']:
-            extractor = PdfExtractor(file_path, file_id=file_id)
+            return PdfExtractor(file_path, file_id=file_id, extract_images=extract_images)
         elif file_extension in ['.docx']:
-            extractor = WordExtractor(file_path, file_id=file_id)
+            return WordExtractor(file_path, file_id=file_id, extract_images=extract_images)
         elif file_extension in ['.csv']:
-            extractor = CSVExtractor(file_path, autodetect_encoding=True)
+            return CSVExtractor(file_path, autodetect_encoding=True)
         elif file_extension in ['.txt']:
-            extractor = TextExtractor(file_path, autodetect_encoding=True)
+            return TextExtractor(file_path, autodetect_encoding=True)
         else:
             raise RuntimeError(f'Unsupported file extension: {file_extension}')
 
+    @classmethod
+    def _get_cache_key(cls, extractor: BaseExtractor, file_path: str, extract_images: bool) -> Optional[str]:
+        if not ExtractCache.is_enabled():
+            return None
+        return ExtractCache.make_key(file_path, type(extractor).__name__, cls._get_options(extractor, extract_images))
+
+    @classmethod
+    def extract(cls, file_path: Path, file_id: str, extract_profile: ExtractProfile = ExtractProfile.TEXT_IMAGE) -> List[Document]:
+        '''
+            extract_profile 为 TEXT 时，PDF、Word跳过图片提取
+            开启提取缓存（server.extract_cache_dir）时，内容相同的文件以相同方式提取过则直接使用缓存结果
+        '''
+        extract_images = extract_profile != ExtractProfile.TEXT
+        file_path = str(file_path)
+        extractor = cls._get_extractor(file_path, file_id, extract_images)
+
+        cache_key = cls._get_cache_key(extractor, file_path, extract_images)
+        if cache_key is not None:
+            documents = ExtractCache.get(cache_key, file_path)
+            if documents is not None:
+                return documents
+
         documents = extractor.extract()
+
+        if cache_key is not None:
+            ExtractCache.put(cache_key, file_path, documents)
         return documents
+
+    @classmethod
+    def iter_extract(cls, file_path: Path, file_id: str, extract_profile: ExtractProfile = ExtractProfile.TEXT_IMAGE) -> Iterator[List[Document]]:
+        '''
+            按批返回提取结果，至少返回一批（可能为空）
+            CSV、Excel未命中提取缓存时通过 lazy_load 流式读取，每批 server.csv_chunk_rows 行，调用方逐批处理时内存不随文件大小增长；
+            流式读取的结果不写入提取缓存，且CSV已返回部分行后出现解码错误时直接抛出异常
+            其他类型与 extract 一致，整体作为一批返回
+        '''
+        extract_images = extract_profile != ExtractProfile.TEXT
+        file_path = str(file_path)
+        extractor = cls._get_extractor(file_path, file_id, extract_images)
+
+        if not isinstance(extractor, (CSVExtractor, ExcelExtractor)):
+            yield cls.extract(file_path, file_id, extract_profile)
+            return
+
+        cache_key = cls._get_cache_key(extractor, file_path, extract_images)
+        if cache_key is not None:
+            documents = ExtractCache.get(cache_key, file_path)
+            if documents is not None:
+                yield documents
+                return
+
+        batch_rows = max(get_config().get('server', {}).get('csv_chunk_rows', _DEFAULT_CHUNK_ROWS), 1)
+        batch = []
+        yielded = False
+        for document in extractor.lazy_load():
+            batch.append(document)
+            if len(batch) >= batch_rows:
+                yield batch
+                yielded = True
+                batch = []
+        if batch or not yielded:
+            yield batch
+
+    @staticmethod
+    def _get_options(extractor: BaseExtractor, extract_images: bool) -> Dict:
+        '''
+            影响提取结果的选项，作为提取缓存键的一部分
+        '''
+        options = {}
+        if isinstance(extractor, (PdfExtractor, WordExtractor)):
+            options['extract_images'] = extract_images
+        if isinstance(extractor, PdfExtractor) and not extract_images:
+            options['pdf_text_backend'] = get_config().get('server', {}).get('pdf_text_backend', _DEFAULT_TEXT_BACKEND)
+        return options
@@ -0,0 +1,7 @@
+from enum import StrEnum
+
+class ExtractProfile(StrEnum):
+    TEXT_IMAGE = "TEXT_IMAGE"
+    '''提取文本与图片，图片保存后以markdown链接插入文本'''
+    TEXT = "TEXT"
+    '''仅提取文本，跳过图片提取与保存，PDF使用最快的文本后端'''
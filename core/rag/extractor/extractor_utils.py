@@ -1,6 +1,8 @@
 import concurrent.futures
+from collections import OrderedDict
 from pathlib import Path
-from typing import NamedTuple, Optional, cast
+from typing import NamedTuple, Optional, Tuple, cast
+import hashlib
 import os
 
 class FileEncoding(NamedTuple):
@@ -41,6 +43,58 @@ def detect_file_encodings(file_path: str, timeout: int = 5) -> list[FileEncoding
         raise RuntimeError(f"Could not detect encoding for {file_path}")
     return [FileEncoding(**enc) for enc in encodings if enc["encoding"] is not None]
 
+# 编码检测时，分别从文件头、中、尾读取的字节数
+_ENCODING_SAMPLE_SIZE = 32 * 1024
+_ENCODING_CACHE_MAX_ENTRIES = 1024
+_encoding_cache: "OrderedDict[str, list[FileEncoding]]" = OrderedDict()
+
+
+def _read_encoding_sample(file_path: str) -> Tuple[str, bytes]:
+    """Read bounded samples from the head, middle and tail of the file, returns (fingerprint, sample)."""
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        if size <= _ENCODING_SAMPLE_SIZE * 3:
+            sample = f.read()
+        else:
+            parts = []
+            for offset in (0, (size - _ENCODING_SAMPLE_SIZE) // 2, size - _ENCODING_SAMPLE_SIZE):
+                f.seek(offset)
+                parts.append(f.read(_ENCODING_SAMPLE_SIZE))
+            sample = b"".join(parts)
+    fingerprint = hashlib.sha256(str(size).encode() + b":" + sample).hexdigest()
+    return fingerprint, sample
+
+
+def detect_file_encodings_sampled(file_path: str) -> list[FileEncoding]:
+    """Detect the file encoding from a bounded byte sample.
+
+    Unlike `detect_file_encodings`, memory and time do not grow with the file size.
+    Results are cached by a fingerprint of the file size and the sample, so re-parsing the
+    same file skips detection. A pure ASCII sample is reported as utf-8, since non-ASCII
+    bytes may appear outside the sample.
+    """
+    import chardet
+
+    fingerprint, sample = _read_encoding_sample(file_path)
+    if fingerprint in _encoding_cache:
+        _encoding_cache.move_to_end(fingerprint)
+        return _encoding_cache[fingerprint]
+
+    encodings = []
+    for enc in chardet.detect_all(sample):
+        if enc["encoding"] is None:
+            continue
+        name = "utf-8" if enc["encoding"].lower() == "ascii" else enc["encoding"]
+        if all(encoding.encoding != name for encoding in encodings):
+            encodings.append(FileEncoding(name, enc["confidence"], enc.get("language")))
+    if not encodings:
+        raise RuntimeError(f"Could not detect encoding for {file_path}")
+
+    _encoding_cache[fingerprint] = encodings
+    while len(_encoding_cache) > _ENCODING_CACHE_MAX_ENTRIES:
+        _encoding_cache.popitem(last=False)
+    return encodings
+
 _CONTENT_MAX_LENGTH = 15 * 1024 * 1024
 
 def get_content_from_url(url: str, retries: int = 3, backoff: int = 2, timeout: int = 5, timeout_connect: int = 5, timeout_read: int = 5, timeout_write: int = 5, **kwargs):
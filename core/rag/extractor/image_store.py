@@ -0,0 +1,150 @@
+from typing import Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+
+from config.config import get_config
+from logger import get_logger
+
+logger = get_logger('rag')
+
+_DEFAULT_WRITER_THREADS = 4
+_DEFAULT_WRITER_MAX_PENDING = 64
+# 图片内容存储目录，位于 pic_save_path_prefix 下，按哈希前两位分目录
+_OBJECT_DIR_NAME = '.objects'
+
+class ImageStore:
+    '''
+        文档解析时提取图片的存储，图片以内容哈希命名
+        - 同一文件内相同内容的图片只写入一次，返回相同的链接
+        - 图片内容写入 {pic_save_path_prefix}/.objects/ 下，文件目录中的图片为其硬链接，
+          不同文件（同一知识库或跨知识库）中的相同图片只占用一份磁盘空间，且删除某个文件的图片目录不影响其他文件
+        - 写入由后台线程执行，待写入的图片数达到上限时 put 阻塞，解析结束时需调用 flush 等待写入完成
+        在子进程中使用时，通过 get_settings 在主进程中获取参数后传入
+    '''
+
+    def __init__(
+        self,
+        save_dir: str,
+        url_prefix: str,
+        object_dir: str,
+        writer_threads: int = _DEFAULT_WRITER_THREADS,
+        max_pending: int = _DEFAULT_WRITER_MAX_PENDING,
+    ):
+        self.save_dir = Path(save_dir)
+        self.url_prefix = url_prefix
+        self.object_dir = Path(object_dir)
+        self.writer_threads = max(writer_threads, 1)
+
+        self._names: Dict[str, str] = {}
+        self._futures: List[Future] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = threading.BoundedSemaphore(max(max_pending, 1))
+
+    @staticmethod
+    def get_settings(file_path_id: str) -> Dict:
+        knowledge_base_config = get_config().get('dependent_info').get('knowledge_base')
+        server_config = get_config().get('server', {})
+        file_url = knowledge_base_config.get('file_url').rstrip('/')
+        pic_url_prefix = knowledge_base_config.get('pic_url_prefix').rstrip('/')
+        pic_save_path_prefix = Path(knowledge_base_config.get('pic_save_path_prefix'))
+        return {
+            'save_dir': str(pic_save_path_prefix / file_path_id),
+            'url_prefix': f'{file_url}{pic_url_prefix}/{file_path_id}',
+            'object_dir': str(pic_save_path_prefix / _OBJECT_DIR_NAME),
+            'writer_threads': server_config.get('image_writer_threads', _DEFAULT_WRITER_THREADS),
+            'max_pending': server_config.get('image_writer_max_pending', _DEFAULT_WRITER_MAX_PENDING),
+        }
+
+    def put(self, content: bytes, ext: str) -> str:
+        '''
+            保存图片，返回markdown图片链接
+        '''
+        digest = hashlib.sha256(content).hexdigest()
+        ext = ext.lstrip('.')
+        key = f'{digest}.{ext}'
+
+        if key not in self._names:
+            name = f'{digest[:32]}.{ext}'
+            self._names[key] = name
+
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.writer_threads, thread_name_prefix='image_writer')
+            self._pending.acquire()
+            try:
+                future = self._executor.submit(self._write, content, digest, name)
+            except Exception:
+                self._pending.release()
+                raise
+            future.add_done_callback(lambda _: self._pending.release())
+            self._futures.append(future)
+
+        return f'![image]({self.url_prefix}/{self._names[key]})'
+
+    def _write(self, content: bytes, digest: str, name: str):
+        path = self.save_dir / name
+        if path.exists():
+            return
+
+        object_path = self.object_dir / digest[:2] / name
+        try:
+            if not object_path.exists():
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = object_path.with_name(f'.{name}.{uuid.uuid4().hex}.tmp')
+                with open(tmp_path, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp_path, object_path)
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.link(object_path, path)
+        except FileExistsError:
+            pass
+        except OSError:
+            # 不支持硬链接（如跨文件系统）时，直接写入文件目录
+            logger.debug(f'Fail to link image {object_path} to {path}, write directly.')
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+
+    def restore(self, names: List[str]) -> bool:
+        '''
+            按图片名将已写入的图片内容链接到文件目录（如复用缓存的提取结果时），
+            图片内容不存在时返回False
+        '''
+        for name in names:
+            path = self.save_dir / name
+            if path.exists():
+                continue
+            object_path = self.object_dir / name[:2] / name
+            if not object_path.exists():
+                return False
+            path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(object_path, path)
+            except FileExistsError:
+                pass
+            except OSError:
+                logger.debug(f'Fail to link image {object_path} to {path}, copy directly.')
+                shutil.copyfile(object_path, path)
+        return True
+
+    @property
+    def count(self) -> int:
+        return len(self._names)
+
+    def flush(self):
+        '''
+            等待所有图片写入完成，写入失败时抛出异常
+        '''
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._futures = []
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -1,18 +1,27 @@
 """Abstract interface for document loader implementations."""
 
 import csv
+from collections.abc import Iterator
 from typing import Optional
 
 import pandas as pd
 
+from config.config import get_config
 from core.rag.extractor.extractor_base import BaseExtractor
-from core.rag.extractor.extractor_utils import detect_file_encodings
+from core.rag.extractor.extractor_utils import detect_file_encodings_sampled
 from core.rag.entities.document import Document
 
+_DEFAULT_CHUNK_ROWS = 10000
+# 采样检测的编码均失败时，依次尝试的编码
+_FALLBACK_ENCODINGS = ["utf-8", "gb18030"]
+
 
 class CSVExtractor(BaseExtractor):
     """Load CSV files.
 
+    Rows are read in chunks of `server.csv_chunk_rows`, memory does not grow with the file size.
+    All columns are read as strings, so a value is rendered as written in the file regardless of
+    the types inferred in other chunks.
 
     Args:
         file_path: Path to the file to load.
@@ -35,44 +44,73 @@ class CSVExtractor(BaseExtractor):
 
     def extract(self) -> list[Document]:
         """Load data into document objects."""
-        docs = []
-        try:
-            with open(self._file_path, newline="", encoding=self._encoding) as csvfile:
-                docs = self._read_from_file(csvfile)
-        except UnicodeDecodeError as e:
-            if self._autodetect_encoding:
-                detected_encodings = detect_file_encodings(self._file_path)
-                for encoding in detected_encodings:
-                    try:
-                        with open(self._file_path, newline="", encoding=encoding.encoding) as csvfile:
-                            docs = self._read_from_file(csvfile)
-                        break
-                    except UnicodeDecodeError:
-                        continue
-            else:
-                raise RuntimeError(f"Error loading {self._file_path}") from e
-
-        return docs
-
-    def _read_from_file(self, csvfile) -> list[Document]:
-        docs = []
-        try:
-            # load csv file into pandas dataframe
-            df = pd.read_csv(csvfile, on_bad_lines="skip", **self.csv_args)
-
-            # check source column exists
-            if self.source_column and self.source_column not in df.columns:
-                raise ValueError(f"Source column '{self.source_column}' not found in CSV file.")
-
-            # create document objects
-
-            for i, row in df.iterrows():
-                content = ";".join(f"{col.strip()}: {str(row[col]).strip()}" for col in df.columns)
-                source = row[self.source_column] if self.source_column else ""
-                metadata = {"source": self._file_path, "row": i}
-                doc = Document(page_content=content, metadata=metadata)
-                docs.append(doc)
-        except csv.Error as e:
-            raise e
-
-        return docs
+        error = None
+        for encoding in self._iter_encodings():
+            try:
+                return list(self._read_from_file(encoding))
+            except UnicodeDecodeError as e:
+                error = e
+        raise RuntimeError(f"Error loading {self._file_path}") from error
+
+    def lazy_load(self) -> Iterator[Document]:
+        """Lazily load rows as documents.
+
+        The next candidate encoding is tried only while no row has been yielded. Rows already
+        yielded cannot be taken back, so a decode error later in the file is raised instead of
+        retried, use `extract` when retrying is required.
+        """
+        error = None
+        for encoding in self._iter_encodings():
+            yielded = False
+            try:
+                for document in self._read_from_file(encoding):
+                    yielded = True
+                    yield document
+                return
+            except UnicodeDecodeError as e:
+                if yielded:
+                    raise
+                error = e
+        raise RuntimeError(f"Error loading {self._file_path}") from error
+
+    def _iter_encodings(self) -> Iterator[Optional[str]]:
+        """Candidate encodings in order of preference.
+
+        The configured encoding is tried first, the sampled detection only runs when it fails
+        and `autodetect_encoding` is set.
+        """
+        yield self._encoding
+        if not self._autodetect_encoding:
+            return
+
+        tried = {self._encoding}
+        detected = [encoding.encoding for encoding in detect_file_encodings_sampled(self._file_path)]
+        for encoding in detected + _FALLBACK_ENCODINGS:
+            if encoding not in tried:
+                tried.add(encoding)
+                yield encoding
+
+    def _read_from_file(self, encoding: Optional[str]) -> Iterator[Document]:
+        chunk_rows = get_config().get("server", {}).get("csv_chunk_rows", _DEFAULT_CHUNK_ROWS)
+        with open(self._file_path, newline="", encoding=encoding) as csvfile:
+            try:
+                # load csv file in chunks, the index of each chunk continues from the previous one
+                reader = pd.read_csv(
+                    csvfile, on_bad_lines="skip", dtype=str, chunksize=chunk_rows, **self.csv_args
+                )
+                with reader:
+                    columns = None
+                    for df in reader:
+                        if columns is None:
+                            # check source column exists
+                            if self.source_column and self.source_column not in df.columns:
+                                raise ValueError(f"Source column '{self.source_column}' not found in CSV file.")
+                            columns = [col.strip() for col in df.columns]
+
+                        # create document objects
+                        for i, *values in df.itertuples(index=True, name=None):
+                            content = ";".join(f"{col}: {str(value).strip()}" for col, value in zip(columns, values))
+                            metadata = {"source": self._file_path, "row": i}
+                            yield Document(page_content=content, metadata=metadata)
+            except csv.Error as e:
+                raise e
@@ -1,14 +1,99 @@
 """Abstract interface for document loader implementations."""
 
 import os
-from typing import Optional, cast
+import posixpath
+import zipfile
+from collections.abc import Iterator
+from typing import Dict, Optional, Tuple
+from xml.etree import ElementTree
 
 import pandas as pd
 from openpyxl import load_workbook  # type: ignore
+from openpyxl.utils.cell import range_boundaries
 
 from core.rag.extractor.extractor_base import BaseExtractor
 from core.rag.entities.document import Document
 
+_NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_PACKAGE_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+
+def _read_rels(archive: zipfile.ZipFile, part_path: str) -> Dict[str, Tuple[str, str]]:
+    """Read the relationships of a part, returns {Id: (Target, TargetMode)}."""
+    rels_path = posixpath.join(posixpath.dirname(part_path), "_rels", posixpath.basename(part_path) + ".rels")
+    if rels_path not in archive.namelist():
+        return {}
+    root = ElementTree.fromstring(archive.read(rels_path))
+    return {
+        rel.get("Id"): (rel.get("Target"), rel.get("TargetMode", ""))
+        for rel in root.iter(f"{{{_NS_PACKAGE_REL}}}Relationship")
+    }
+
+
+def _resolve_part(base_path: str, target: str) -> str:
+    if target.startswith("/"):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_path), target))
+
+
+def _contains(archive: zipfile.ZipFile, part_path: str, keyword: bytes, chunk_size: int = 1 << 20) -> bool:
+    """Search raw bytes of a part, much faster than parsing the xml."""
+    tail = b""
+    with archive.open(part_path) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return False
+            if keyword in tail + chunk[:len(keyword)] or keyword in chunk:
+                return True
+            tail = chunk[-len(keyword):]
+
+
+def load_xlsx_hyperlinks(file_path: str) -> Dict[str, Dict[Tuple[int, int], str]]:
+    """Build {sheet_name: {(row, column): target}} from the xlsx package.
+
+    openpyxl does not read hyperlinks in read-only mode, the <hyperlinks> element of each sheet
+    is parsed incrementally instead, ranges are expanded to every cell as openpyxl does.
+    """
+    hyperlinks: Dict[str, Dict[Tuple[int, int], str]] = {}
+    with zipfile.ZipFile(file_path) as archive:
+        workbook_path = "xl/workbook.xml"
+        workbook_rels = _read_rels(archive, workbook_path)
+        workbook = ElementTree.fromstring(archive.read(workbook_path))
+
+        for sheet in workbook.iter(f"{{{_NS_MAIN}}}sheet"):
+            rel = workbook_rels.get(sheet.get(f"{{{_NS_REL}}}id"))
+            if rel is None:
+                continue
+            sheet_path = _resolve_part(workbook_path, rel[0])
+            # 大多数工作表没有超链接，无需解析
+            if sheet_path not in archive.namelist() or not _contains(archive, sheet_path, b"hyperlinks"):
+                continue
+
+            sheet_rels = None
+            sheet_hyperlinks: Dict[Tuple[int, int], str] = {}
+            with archive.open(sheet_path) as f:
+                for _, element in ElementTree.iterparse(f):
+                    if element.tag == f"{{{_NS_MAIN}}}hyperlink" and element.get("ref"):
+                        target = element.get("location")
+                        rel_id = element.get(f"{{{_NS_REL}}}id")
+                        if rel_id:
+                            if sheet_rels is None:
+                                sheet_rels = _read_rels(archive, sheet_path)
+                            target = sheet_rels.get(rel_id, (target, ""))[0]
+                        min_col, min_row, max_col, max_row = range_boundaries(element.get("ref"))
+                        for row in range(min_row, max_row + 1):
+                            for col in range(min_col, max_col + 1):
+                                sheet_hyperlinks[(row, col)] = target
+                    elif element.tag == f"{{{_NS_MAIN}}}row":
+                        # 单元格数据无需保留
+                        element.clear()
+
+            if sheet_hyperlinks:
+                hyperlinks[sheet.get("name")] = sheet_hyperlinks
+    return hyperlinks
+
 
 class ExcelExtractor(BaseExtractor):
     """Load Excel files.
@@ -26,37 +111,14 @@ class ExcelExtractor(BaseExtractor):
 
     def extract(self) -> list[Document]:
         """Load from Excel file in xls or xlsx format using Pandas and openpyxl."""
-        documents = []
+        return list(self.lazy_load())
+
+    def lazy_load(self) -> Iterator[Document]:
+        """Lazily load rows as documents, one document per non-empty row."""
         file_extension = os.path.splitext(self._file_path)[-1].lower()
 
         if file_extension == ".xlsx":
-            wb = load_workbook(self._file_path, data_only=True)
-            for sheet_name in wb.sheetnames:
-                sheet = wb[sheet_name]
-                data = sheet.values
-                try:
-                    cols = next(data)
-                except StopIteration:
-                    continue
-                df = pd.DataFrame(data, columns=cols)
-
-                df.dropna(how="all", inplace=True)
-
-                for index, row in df.iterrows():
-                    page_content = []
-                    for col_index, (k, v) in enumerate(row.items()):
-                        if pd.notna(v):
-                            cell = sheet.cell(
-                                row=cast(int, index) + 2, column=col_index + 1
-                            )  # +2 to account for header and 1-based index
-                            if cell.hyperlink:
-                                value = f"[{v}]({cell.hyperlink.target})"
-                                page_content.append(f'"{k}":"{value}"')
-                            else:
-                                page_content.append(f'"{k}":"{v}"')
-                    documents.append(
-                        Document(page_content=";".join(page_content), metadata={"source": self._file_path})
-                    )
+            yield from self._load_xlsx()
 
         elif file_extension == ".xls":
             excel_file = pd.ExcelFile(self._file_path, engine="xlrd")
@@ -69,10 +131,43 @@ class ExcelExtractor(BaseExtractor):
                     for k, v in row.items():
                         if pd.notna(v):
                             page_content.append(f'"{k}":"{v}"')
-                    documents.append(
-                        Document(page_content=";".join(page_content), metadata={"source": self._file_path})
-                    )
+                    yield Document(page_content=";".join(page_content), metadata={"source": self._file_path})
         else:
             raise ValueError(f"Unsupported file extension: {file_extension}")
 
-        return documents
+    def _load_xlsx(self) -> Iterator[Document]:
+        """Stream rows in read-only mode, each row is read once and hyperlinks come from a prebuilt map."""
+        hyperlinks = load_xlsx_hyperlinks(self._file_path)
+
+        wb = load_workbook(self._file_path, read_only=True, data_only=True)
+        try:
+            for sheet_name in wb.sheetnames:
+                sheet = wb[sheet_name]
+                # 部分文件记录的表格范围有误，按实际数据读取
+                sheet.reset_dimensions()
+                sheet_hyperlinks = hyperlinks.get(sheet_name, {})
+
+                rows = sheet.iter_rows(values_only=True)
+                try:
+                    cols = next(rows)
+                except StopIteration:
+                    continue
+
+                # 表头所在行为第1行，数据从第2行开始
+                for row_index, row in enumerate(rows, start=2):
+                    page_content = []
+                    for col_index, v in enumerate(row):
+                        if v is None or (isinstance(v, float) and v != v):
+                            continue
+                        k = cols[col_index] if col_index < len(cols) else None
+                        target = sheet_hyperlinks.get((row_index, col_index + 1))
+                        if target is not None:
+                            page_content.append(f'"{k}":"[{v}]({target})"')
+                        else:
+                            page_content.append(f'"{k}":"{v}"')
+
+                    # 跳过空行
+                    if page_content:
+                        yield Document(page_content=";".join(page_content), metadata={"source": self._file_path})
+        finally:
+            wb.close()
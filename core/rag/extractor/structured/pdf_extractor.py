@@ -1,18 +1,24 @@
 """Abstract interface for document loader implementations."""
 
 from collections.abc import Iterator
-from typing import Optional, cast
+from typing import Dict, List, Optional, Tuple
 import os
 from pathlib import Path
-import uuid
 
 from core.rag.entities.blob import Blob
 from core.rag.extractor.extractor_base import BaseExtractor
 from core.rag.entities.document import Document
-from core.rag.extractor.extractor_utils import save_image
+from core.rag.extractor.image_store import ImageStore
+from core.rag.extractor.extract_executor import ExtractExecutor
 from config.config import get_config
 # from extensions.ext_storage import storage
 
+_DEFAULT_PARALLEL_MIN_PAGES = 50
+_DEFAULT_TEXT_BACKEND = 'pdfium'
+PDF_TEXT_BACKENDS = ('pdfium', 'pymupdf')
+_SHARDS_PER_WORKER = 4
+_MIN_SHARD_PAGES = 8
+
 
 class PdfExtractor(BaseExtractor):
     """Load pdf files.
@@ -20,13 +26,15 @@ class PdfExtractor(BaseExtractor):
 
     Args:
         file_path: Path to the file to load.
+        extract_images: Whether to extract images. If False, only text is extracted by `server.pdf_text_backend`.
     """
 
-    def __init__(self, file_path: str, file_id: str, file_cache_key: Optional[str] = None):
+    def __init__(self, file_path: str, file_id: str, file_cache_key: Optional[str] = None, extract_images: bool = True):
         """Initialize with file path."""
         self._file_path = file_path
         self._file_id = file_id
         self._file_cache_key = file_cache_key
+        self._extract_images = extract_images
         self.file_path_id = os.path.splitext(os.path.basename(self._file_path))[0]
 
         self.file_url = get_config().get('dependent_info').get('knowledge_base').get('file_url')
@@ -37,28 +45,12 @@ class PdfExtractor(BaseExtractor):
         if self.pic_url_prefix.endswith('/'):
             self.pic_url_prefix = self.pic_url_prefix[:-1]
         self.pic_save_path_prefix = Path(self.pic_save_path_prefix) / self.file_path_id
-        os.makedirs(self.pic_save_path_prefix, exist_ok=True)
+        if self._extract_images:
+            os.makedirs(self.pic_save_path_prefix, exist_ok=True)
 
     def extract(self) -> list[Document]:
-        # plaintext_file_exists = False
-        # if self._file_cache_key:
-        #     try:
-        #         text = cast(bytes, storage.load(self._file_cache_key)).decode("utf-8")
-        #         plaintext_file_exists = True
-        #         return [Document(page_content=text)]
-        #     except FileNotFoundError:
-        #         pass
-        documents = list(self._load())
-        # text_list = []
-        # for document in documents:
-        #     text_list.append(document.page_content)
-        # text = "\n\n".join(text_list)
-
-        # # save plaintext file for caching
-        # if not plaintext_file_exists and self._file_cache_key:
-        #     storage.save(self._file_cache_key, text.encode("utf-8"))
-
-        return documents
+        # 提取结果缓存见 ExtractCache，由 ExtractProcessor 按文件内容哈希统一处理
+        return self._load()
 
     def load(
         self,
@@ -76,7 +68,7 @@ class PdfExtractor(BaseExtractor):
             try:
                 for page_number, page in enumerate(pdf_reader):
                     text_page = page.get_textpage()
-                    content = text_page.get_text_range()
+                    content = text_page.get_text_range().replace("\r\n", "\n")
                     text_page.close()
                     page.close()
                     metadata = {"source": blob.source, "page": page_number}
@@ -85,34 +77,80 @@ class PdfExtractor(BaseExtractor):
                 pdf_reader.close()
 
     def _load(self,) -> list[Document]:
+        # 仅提取文本时，使用配置的文本后端（pdfium 较 pymupdf 更快，可通过 extract_benchmark 对比）
+        if not self._extract_images:
+            text_backend = get_config().get('server', {}).get('pdf_text_backend', _DEFAULT_TEXT_BACKEND)
+            if text_backend not in PDF_TEXT_BACKENDS:
+                raise ValueError(f'Unsupported pdf text backend: {text_backend}')
+            if text_backend == 'pdfium':
+                return [
+                    Document(page_content=document.page_content, metadata={'source': self._file_path, 'page': document.metadata['page']})
+                    for document in self.load()
+                ]
+
         import fitz
-        doc = fitz.open(self._file_path)
-        results = []
-        
-        for page_index in range(len(doc)):
+        with fitz.open(self._file_path) as doc:
+            page_count = len(doc)
+
+        # 页数较少时单进程解析，否则按页分片到进程池，每个分片在子进程中独立打开文档，结果按页码合并
+        workers = ExtractExecutor.get_workers()
+        min_pages = get_config().get('server', {}).get('pdf_parallel_min_pages', _DEFAULT_PARALLEL_MIN_PAGES)
+        args = (self._file_path, ImageStore.get_settings(self.file_path_id) if self._extract_images else None)
+        if workers <= 1 or page_count < min_pages:
+            pages = _extract_pages(*args, 0, page_count)
+        else:
+            # 分片数多于进程数，平衡各页解析耗时的差异
+            shard_size = max(-(-page_count // (workers * _SHARDS_PER_WORKER)), _MIN_SHARD_PAGES)
+            starts = list(range(0, page_count, shard_size))
+            executor = ExtractExecutor.get_executor()
+            futures = [
+                executor.submit(_extract_pages, *args, start, min(start + shard_size, page_count))
+                for start in starts
+            ]
+            pages = [page for future in futures for page in future.result()]
+
+        return [
+            Document(page_content=page_markdown, metadata={'source': self._file_path, 'page': page_index})
+            for page_index, page_markdown in pages
+        ]
+
+def _extract_pages(
+    file_path: str,
+    image_store_settings: Optional[Dict],
+    start: int,
+    end: int,
+) -> List[Tuple[int, str]]:
+    '''
+        解析 [start, end) 页，返回 (页码, 页面markdown)
+        image_store_settings 为None时不提取图片
+        可在子进程中执行，参数均可被pickle
+    '''
+    import fitz
+    image_store = ImageStore(**image_store_settings) if image_store_settings is not None else None
+    # 同一图像对象（如每页重复的logo）只提取一次
+    xref_markdowns: Dict[int, str] = {}
+    results = []
+
+    with fitz.open(file_path) as doc:
+        for page_index in range(start, end):
             page = doc[page_index]
             text_blocks = page.get_text("blocks")  # (x0, y0, x1, y1, "text", block_no, ...)
             text_blocks.sort(key=lambda b: b[1])   # 按 y 坐标排序，模拟阅读顺序
 
             # 抽取图像
             image_markdowns = []
-            image_infos = page.get_images(full=True)
+            image_infos = page.get_images(full=True) if image_store is not None else []
             for img_idx, img in enumerate(image_infos):
                 xref = img[0]
-                # 提取图像数据
-                base_image = doc.extract_image(xref)
-                image_bytes = base_image["image"]
-                image_ext = base_image["ext"]
-                image_id = str(uuid.uuid4())
-                image_pure_name = image_id + '.' + image_ext
-                image_path = self.pic_save_path_prefix / image_pure_name
-                save_image(str(image_path), image_bytes)
+                if xref not in xref_markdowns:
+                    # 提取图像数据，按内容哈希保存
+                    base_image = doc.extract_image(xref)
+                    xref_markdowns[xref] = image_store.put(base_image["image"], base_image["ext"])
 
                 # 查找图像 bbox 位置
                 y_position = img[7][5] if isinstance(img[7], (list, tuple)) and len(img[7]) >= 6 else 0
 
-                markdown = f"![image]({self.file_url}{self.pic_url_prefix}/{self.file_path_id}/{image_pure_name})"
-                image_markdowns.append((y_position, markdown))
+                image_markdowns.append((y_position, xref_markdowns[xref]))
 
             # 合并文本和图像
             combined = []
@@ -132,7 +170,8 @@ class PdfExtractor(BaseExtractor):
                 combined.append(image_markdowns[img_idx][1])
                 img_idx += 1
 
-            page_markdown = "".join(combined)
-            result = Document(page_content=page_markdown, metadata={'source': self._file_path, 'page': page_index})
-            results.append(result)
-        return results
\ No newline at end of file
+            results.append((page_index, "".join(combined)))
+
+    if image_store is not None:
+        image_store.flush()
+    return results
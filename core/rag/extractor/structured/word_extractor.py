@@ -19,7 +19,8 @@ from docx import Document as DocxDocument
 # from core.helper import ssrf_proxy
 from core.rag.extractor.extractor_base import BaseExtractor
 from core.rag.entities.document import Document
-from core.rag.extractor.extractor_utils import get_content_from_url, save_image
+from core.rag.extractor.extractor_utils import get_content_from_url
+from core.rag.extractor.image_store import ImageStore
 from config.config import get_config
 from logger import get_logger
 # from extensions.ext_database import db
@@ -37,9 +38,10 @@ class WordExtractor(BaseExtractor):
         file_path: Path to the file to load.
     """
 
-    def __init__(self, file_path: str, file_id: str):
+    def __init__(self, file_path: str, file_id: str, extract_images: bool = True):
         """Initialize with file path."""
         
+        self.extract_images = extract_images
         self.file_path_id = os.path.splitext(os.path.basename(file_path))[0]
 
         self.file_url = get_config().get('dependent_info').get('knowledge_base').get('file_url')
@@ -50,7 +52,8 @@ class WordExtractor(BaseExtractor):
         if self.pic_url_prefix.endswith('/'):
             self.pic_url_prefix = self.pic_url_prefix[:-1]
         self.pic_save_path_prefix = Path(self.pic_save_path_prefix) / self.file_path_id
-        os.makedirs(self.pic_save_path_prefix, exist_ok=True)
+        if self.extract_images:
+            os.makedirs(self.pic_save_path_prefix, exist_ok=True)
 
         self.file_path = file_path
         self.file_id = file_id
@@ -97,6 +100,8 @@ class WordExtractor(BaseExtractor):
         # os.makedirs(image_folder, exist_ok=True)
         image_count = 0
         image_map = {}
+        # 图片按内容哈希保存，相同图片只写入一次
+        image_store = ImageStore(**ImageStore.get_settings(self.file_path_id))
 
         for rel in doc.part.rels.values():
             if "image" in rel.target_ref:
@@ -116,10 +121,7 @@ class WordExtractor(BaseExtractor):
                         # file_key = "image_files/" + self.tenant_id + "/" + file_uuid + "." + image_ext
                         # mime_type, _ = mimetypes.guess_type(file_key)
 
-                        image_id = str(uuid.uuid4())
-                        file_pure_name = image_id + '.' + image_ext
-                        file_key = self.pic_save_path_prefix / file_pure_name
-                        save_image(str(file_key), response.content)
+                        image_link = image_store.put(response.content, image_ext)
 
                         # storage.save(file_key, response.content)
                     else:
@@ -133,10 +135,7 @@ class WordExtractor(BaseExtractor):
                     # file_key = "image_files/" + self.tenant_id + "/" + file_uuid + "." + image_ext
                     # mime_type, _ = mimetypes.guess_type(file_key)
 
-                    image_id = str(uuid.uuid4())
-                    file_pure_name = image_id + '.' + image_ext
-                    file_key = self.pic_save_path_prefix / file_pure_name
-                    save_image(str(file_key), rel.target_part.blob)
+                    image_link = image_store.put(rel.target_part.blob, image_ext)
 
                     # storage.save(file_key, rel.target_part.blob)
                 # # save file to db
@@ -162,8 +161,9 @@ class WordExtractor(BaseExtractor):
                 
 
                 # image_map[rel.target_part] = f"![image]({dify_config.FILES_URL}/files/{upload_file.id}/file-preview)"
-                image_map[rel.target_part] = f"![image]({self.file_url}{self.pic_url_prefix}/{self.file_path_id}/{file_pure_name})"
+                image_map[rel.target_part] = image_link
 
+        image_store.flush()
         return image_map
 
     def _table_to_markdown(self, table, image_map):
@@ -268,7 +268,8 @@ class WordExtractor(BaseExtractor):
         content = []
 
         # 从文档中提取图片，涉及文件上传，图片替换为内部超链接
-        image_map = self._extract_images_from_docx(doc, image_folder)
+        # 仅提取文本时跳过，图片不出现在文本中
+        image_map = self._extract_images_from_docx(doc, image_folder) if self.extract_images else {}
 
         hyperlinks_url = None
         url_pattern = re.compile(r"(http://[^\s+]+//|https://[^\s+]+)\"")
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List, Dict, Optional, Literal
+from typing import List, Dict, Optional, Literal, Any
 
 from pydantic import BaseModel, Field, model_validator
 
@@ -75,3 +75,18 @@ class MetadataManualModel(BaseModel):
             raise ValueError("In manual mode, the operator must be filled in.")
         return self
 
+
+class MetadataCondition(BaseModel):
+    '''
+        元数据过滤条件
+        template中以 {0}、{1} ... 表示参数占位，与params一一对应；
+        拼接到检索SQL时再转换为 $n，使同一结构的过滤条件生成相同的SQL，可复用预编译语句
+    '''
+    template: str = Field(..., description='过滤条件模板')
+    params: List[Any] = Field(default_factory=list, description='过滤条件参数')
+
+    def to_sql(self, param_offset: int) -> str:
+        '''
+            param_offset: 检索SQL中已占用的参数个数，过滤条件参数从 $(param_offset + 1) 开始
+        '''
+        return self.template.format(*[f'${param_offset + i + 1}' for i in range(len(self.params))])
@@ -1,9 +1,10 @@
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from core.rag.metadata.entities import (
     MetadataMode, 
     MetadataAutomaticModel, 
     MetadataManualModel, 
+    MetadataCondition, 
 )
 from core.generator.metadata_filter_generator.metadata_filter_generator import (
     agenerate_metadata_filter
@@ -21,7 +22,10 @@ class MetadataProcessor:
         metadata_mode: str,
         metadata_info: Any,
         **kwargs
-    ) -> Tuple[str, Dict]:
+    ) -> Tuple[Optional[MetadataCondition], Dict]:
+        '''
+            将元数据过滤信息转换为检索SQL的过滤条件，无过滤条件时返回None
+        '''
         usage = {
             "prompt_tokens": 0,
             "completion_tokens": 0,
@@ -58,12 +62,14 @@ class MetadataProcessor:
                 usage = metadata_filter['usage']
 
             conditions = []
+            params = []
             for item in metadata_filter['data']['metadata_filter']:
                 condition = MetadataProcessor.get_condition(
                     metadata_name=item['metadata_name'],
                     metadata_type=item['metadata_type'],
                     operator_name=item['operator_name'],
                     operator_value=item['operator_value'],
+                    params=params,
                 )
                 
                 if condition:
@@ -72,26 +78,28 @@ class MetadataProcessor:
             metadata_info = MetadataManualModel.model_validate(metadata_info)
 
             conditions = []
+            params = []
             for item in metadata_info.metadatas:
                 condition = MetadataProcessor.get_condition(
                     metadata_name=item.metadata_name,
                     metadata_type=item.metadata_type,
                     operator_name=item.operator_name,
                     operator_value=item.operator_value,
+                    params=params,
                 )
 
                 if condition:
                     conditions.append(condition)
         else:
-            return "", usage
+            return None, usage
 
         if not conditions:
-            return "", usage
+            return None, usage
         elif len(conditions) == 1:
-            return conditions[0], usage
+            return MetadataCondition(template=conditions[0], params=params), usage
         else:
             symbol = f' {metadata_info.logical_operator} '
-            return f'({symbol.join(conditions)})', usage
+            return MetadataCondition(template=f'({symbol.join(conditions)})', params=params), usage
 
     @classmethod
     def get_condition(
@@ -100,69 +108,76 @@ class MetadataProcessor:
         metadata_type: str, 
         operator_name: str, 
         operator_value: str,
+        params: List[Any],
         table_name: str = 'knowledge_base_document_metadata'
     ) -> str:
+        '''
+            生成单个元数据过滤条件，参数值追加到params中，条件中以 {n} 表示第n个参数
+            不支持的条件返回空字符串，此时params不变
+        '''
+        values = [metadata_name]
+        def placeholder(value: Any) -> str:
+            values.append(value)
+            return f'{{{len(params) + len(values) - 1}}}'
+
+        name_placeholder = f'{{{len(params)}}}'
+
         expression = ''
-        if metadata_type == 'string':
-            if operator_name == '=' or operator_name == 'is':
-                expression = f"m.value = '{operator_value}'"
-            elif operator_name == '!=':
-                expression = f"m.value != '{operator_value}'"
-            elif operator_name == 'contains':
-                expression = f"m.value LIKE '%{operator_value}%'"
-            elif operator_name == 'not contain':
-                expression = f"m.value NOT LIKE '%{operator_value}%'"
-            elif operator_name == 'starts with':
-                expression = f"m.value LIKE '{operator_value}%'"
-            elif operator_name == 'ends with':
-                expression = f"m.value LIKE '%{operator_value}'"
-            elif operator_name == 'is null':
-                expression = "m.value IS NULL"
-            elif operator_name == 'is not null':
-                expression = "m.value IS NOT NULL"
-            else:
-                return ''
-        elif metadata_type == 'number':
-            if operator_name == '=':
-                expression = f"m.value::float = {operator_value}"
-            elif operator_name == '!=':
-                expression = f"m.value::float != {operator_value}"
-            elif operator_name == '>':
-                expression = f"m.value::float > {operator_value}"
-            elif operator_name == '<':
-                expression = f"m.value::float < {operator_value}"
-            elif operator_name == '>=':
-                expression = f"m.value::float >= {operator_value}"
-            elif operator_name == '<=':
-                expression = f"m.value::float <= {operator_value}"
-            elif operator_name == 'is null':
-                expression = "m.value IS NULL"
-            elif operator_name == 'is not null':
-                expression = "m.value IS NOT NULL"
+        try:
+            if metadata_type == 'string':
+                if operator_name == '=' or operator_name == 'is':
+                    expression = f"m.value = {placeholder(operator_value)}"
+                elif operator_name == '!=':
+                    expression = f"m.value != {placeholder(operator_value)}"
+                elif operator_name == 'contains':
+                    expression = f"m.value LIKE {placeholder(f'%{operator_value}%')}"
+                elif operator_name == 'not contain':
+                    expression = f"m.value NOT LIKE {placeholder(f'%{operator_value}%')}"
+                elif operator_name == 'starts with':
+                    expression = f"m.value LIKE {placeholder(f'{operator_value}%')}"
+                elif operator_name == 'ends with':
+                    expression = f"m.value LIKE {placeholder(f'%{operator_value}')}"
+                elif operator_name == 'is null':
+                    expression = "m.value IS NULL"
+                elif operator_name == 'is not null':
+                    expression = "m.value IS NOT NULL"
+                else:
+                    return ''
+            elif metadata_type == 'number':
+                if operator_name in ('=', '!=', '>', '<', '>=', '<='):
+                    expression = f"m.value::float {operator_name} {placeholder(float(operator_value))}::float"
+                elif operator_name == 'is null':
+                    expression = "m.value IS NULL"
+                elif operator_name == 'is not null':
+                    expression = "m.value IS NOT NULL"
+                else:
+                    return ''
+            elif metadata_type == 'time':
+                if operator_name in ('=', '>', '<'):
+                    expression = (
+                        f"m.value::timestamp {operator_name} "
+                        f"TO_CHAR(TO_TIMESTAMP({placeholder(int(operator_value)/1000.0)}::float), 'YYYY-MM-DD HH24:MI')::timestamp"
+                    )
+                elif operator_name == 'is null':
+                    expression = "m.value IS NULL"
+                elif operator_name == 'is not null':
+                    expression = "m.value IS NOT NULL"
+                else:
+                    return ''
             else:
                 return ''
-        elif metadata_type == 'time':
-            if operator_name == '=':
-                expression = f"m.value::timestamp = TO_CHAR(TO_TIMESTAMP({int(operator_value)/1000.0}), 'YYYY-MM-DD HH24:MI')::timestamp"
-            elif operator_name == '>':
-                expression = f"m.value::timestamp > TO_CHAR(TO_TIMESTAMP({int(operator_value)/1000.0}), 'YYYY-MM-DD HH24:MI')::timestamp"
-            elif operator_name == '<':
-                expression = f"m.value::timestamp < TO_CHAR(TO_TIMESTAMP({int(operator_value)/1000.0}), 'YYYY-MM-DD HH24:MI')::timestamp"
-            elif operator_name == 'is null':
-                expression = "m.value IS NULL"
-            elif operator_name == 'is not null':
-                expression = "m.value IS NOT NULL"
-            else:
-                return ''
-        else:
+        except (TypeError, ValueError):
+            logger.warning(f'Ignore metadata condition: {metadata_name} {operator_name} {operator_value}, invalid value for type {metadata_type}.')
             return ''
+
+        params.extend(values)
         
         return (
             f"EXISTS (\n"
             f"SELECT 1\n"
             f"FROM {table_name} as m\n"
             f"WHERE m.document_id = d.id\n"
-            f"  AND m.name = '{metadata_name}'\n"
+            f"  AND m.name = {name_placeholder}\n"
             f"  AND {expression}\n"
             ")"
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,111 @@
+'''
+    WEIGHT重排序基准：在生成的候选上对比关键词得分（TF-IDF余弦）与语义得分（向量余弦）的向量化实现与逐文档实现的耗时
+
+    命令行：
+        python -m core.rag.reranker.rerank_benchmark [-n 100 500 2000] [-k 60] [-d 1024] [-r 5]
+
+    每个候选 k 个关键词（从共享词表中随机抽取）、d 维向量；
+    逐文档实现与向量化之前的 WeightReranker 一致，同时校验两者得分一致
+'''
+
+from typing import Callable, Dict, List, Set
+from collections import Counter
+import argparse
+import json
+import math
+import random
+import time
+
+import numpy as np
+
+from core.rag.reranker.reranker_weight import WeightReranker
+
+_VOCABULARY_SIZE = 5000
+_QUERY_KEYWORDS = 8
+
+def _reference_keyword_scores(query_keywords: Set[str], documents_keywords_list: List[Set[str]]) -> List[float]:
+    '''
+        逐关键词统计文档频率，以字典计算余弦
+    '''
+    documents_keywords: Set[str] = set()
+    for document_keywords in documents_keywords_list:
+        documents_keywords.update(document_keywords)
+
+    documents_len = len(documents_keywords_list)
+    idf: Dict[str, float] = {}
+    for keyword in documents_keywords:
+        freq = sum(1 for document_keywords in documents_keywords_list if keyword in document_keywords)
+        idf[keyword] = math.log((1 + documents_len) / (1 + freq)) + 1
+
+    query_tfidf = {keyword: tf * idf.get(keyword, 0) for keyword, tf in Counter(query_keywords).items()}
+
+    similarities = []
+    for document_keywords in documents_keywords_list:
+        document_tfidf = {keyword: tf * idf.get(keyword, 0) for keyword, tf in Counter(document_keywords).items()}
+        numerator = sum(query_tfidf[x] * document_tfidf[x] for x in set(query_tfidf) & set(document_tfidf))
+        denominator = math.sqrt(sum(v ** 2 for v in query_tfidf.values())) * math.sqrt(sum(v ** 2 for v in document_tfidf.values()))
+        similarities.append(numerator / denominator if denominator else 0.)
+    return similarities
+
+def _reference_cosine_scores(query_vector: List[float], documents_vector: List[List[float]]) -> List[float]:
+    '''
+        逐文档构建数组计算余弦
+    '''
+    scores = []
+    for document_vector in documents_vector:
+        vec1 = np.array(query_vector)
+        vec2 = np.array(document_vector)
+        scores.append(float(np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))))
+    return scores
+
+def _best_time(func: Callable, repeat: int, *args) -> float:
+    elapsed = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func(*args)
+        elapsed.append(time.perf_counter() - start_time)
+    return min(elapsed)
+
+def benchmark_rerank(sizes: List[int], keywords: int = 60, dimension: int = 1024, repeat: int = 5, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed)
+    vocabulary = [f'keyword{i}' for i in range(_VOCABULARY_SIZE)]
+
+    results = []
+    for size in sizes:
+        query_keywords = set(rng.sample(vocabulary, _QUERY_KEYWORDS))
+        documents_keywords_list = [set(rng.sample(vocabulary, keywords)) for _ in range(size)]
+        query_vector = [rng.uniform(-1, 1) for _ in range(dimension)]
+        documents_vector = [[rng.uniform(-1, 1) for _ in range(dimension)] for _ in range(size)]
+
+        keyword_close = np.allclose(
+            WeightReranker._tfidf_cosine_scores(query_keywords, documents_keywords_list),
+            _reference_keyword_scores(query_keywords, documents_keywords_list),
+        )
+        semantic_close = np.allclose(
+            WeightReranker._cosine_scores(query_vector, documents_vector),
+            _reference_cosine_scores(query_vector, documents_vector),
+            atol=1e-5,
+        )
+
+        results.append({
+            'documents': size,
+            'keyword_reference_ms': _best_time(_reference_keyword_scores, repeat, query_keywords, documents_keywords_list) * 1000,
+            'keyword_ms': _best_time(WeightReranker._tfidf_cosine_scores, repeat, query_keywords, documents_keywords_list) * 1000,
+            'semantic_reference_ms': _best_time(_reference_cosine_scores, repeat, query_vector, documents_vector) * 1000,
+            'semantic_ms': _best_time(WeightReranker._cosine_scores, repeat, query_vector, documents_vector) * 1000,
+            'scores_match': bool(keyword_close and semantic_close),
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark WEIGHT rerank keyword and semantic scoring.')
+    parser.add_argument('-n', '--sizes', type=int, nargs='+', default=[100, 500, 2000], help='Numbers of candidate documents.')
+    parser.add_argument('-k', '--keywords', type=int, default=60, help='Keywords per candidate.')
+    parser.add_argument('-d', '--dimension', type=int, default=1024, help='Vector dimension.')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Runs per case, the fastest is reported.')
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark_rerank(args.sizes, args.keywords, args.dimension, args.repeat), indent=4))
+
+if __name__ == '__main__':
+    main()
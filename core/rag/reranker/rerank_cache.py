@@ -0,0 +1,79 @@
+from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import time
+
+from config.config import get_config
+
+_DEFAULT_CACHE_TTL = 300
+_DEFAULT_CACHE_MAX_ENTRIES = 10000
+
+class RerankCache:
+    '''
+        Rerank模型得分缓存，缓存键为 (模型, query, 送入模型的片段文本哈希)
+        同一query在短时间内重复检索（如多轮对话、多知识库召回）时，已计算过的片段不再请求模型
+        配置：
+            server.rerank_cache_ttl: 缓存有效期，单位秒，为0时关闭缓存
+            server.rerank_cache_max_entries: 缓存条目上限，超出时淘汰最久未使用的条目
+    '''
+    _entries: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+
+    _metrics = {
+        'hits': 0,
+        'misses': 0,
+        'evictions': 0,
+        'expirations': 0,
+    }
+
+    @classmethod
+    def _get_settings(cls) -> Tuple[float, int]:
+        server_config = get_config().get('server', {})
+        ttl = server_config.get('rerank_cache_ttl', _DEFAULT_CACHE_TTL)
+        max_entries = server_config.get('rerank_cache_max_entries', _DEFAULT_CACHE_MAX_ENTRIES)
+        return ttl, max_entries
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        ttl, max_entries = cls._get_settings()
+        return ttl > 0 and max_entries > 0
+
+    @staticmethod
+    def make_key(model_key: str, query: str, text: str) -> str:
+        raw = '\x00'.join((model_key, query, hashlib.sha256(text.encode('utf-8')).hexdigest()))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def get(cls, key: str) -> Optional[float]:
+        entry = cls._entries.get(key)
+        if entry is None:
+            cls._metrics['misses'] += 1
+            return None
+
+        expire_time, score = entry
+        if expire_time < time.monotonic():
+            cls._entries.pop(key, None)
+            cls._metrics['expirations'] += 1
+            cls._metrics['misses'] += 1
+            return None
+
+        cls._entries.move_to_end(key)
+        cls._metrics['hits'] += 1
+        return score
+
+    @classmethod
+    def put(cls, key: str, score: float):
+        ttl, max_entries = cls._get_settings()
+        cls._entries[key] = (time.monotonic() + ttl, score)
+        cls._entries.move_to_end(key)
+
+        while len(cls._entries) > max_entries:
+            cls._entries.popitem(last=False)
+            cls._metrics['evictions'] += 1
+
+    @classmethod
+    def get_metrics(cls) -> Dict:
+        metrics = dict(cls._metrics)
+        lookups = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = metrics['hits'] / lookups if lookups else 0.
+        metrics['entries'] = len(cls._entries)
+        return metrics
@@ -0,0 +1,99 @@
+from typing import Dict, List
+
+from config.config import get_config
+from core.rag.entities.document import Document
+from logger import get_logger
+
+logger = get_logger('rag')
+
+_DEFAULT_CANDIDATE_MULTIPLIER = 3
+_DEFAULT_CANDIDATE_MIN = 10
+_DEFAULT_CANDIDATE_MAX = 30
+_DEFAULT_CANDIDATE_SCORE_GAP = 0.5
+# 提升深度统计的分桶数，第n桶表示重排序前位于 [(n-1)*top_k, n*top_k) 的片段，最后一桶包含更深的位置
+_DEPTH_BUCKETS = 4
+
+class RerankCandidate:
+    '''
+        开启rerank时的候选数量与候选截断
+        候选数量：top_k * multiplier，并限制在 [min, max] 之间（不小于top_k）
+        提前截断：候选按检索得分降序排列，保留前top_k条后，
+            相邻候选的得分差超过最高得分的 score_gap 倍时，认为其后均为无关片段，不再送入rerank
+        统计：记录rerank后的结果在rerank前的位置（提升深度），用于评估候选数量是否合适，
+            若极少有结果来自第2桶之后，可减小 multiplier
+        配置：
+            server.rerank_candidate_multiplier: 候选数量相对top_k的倍数
+            server.rerank_candidate_min: 候选数量下限
+            server.rerank_candidate_max: 候选数量上限
+            server.rerank_candidate_score_gap: 提前截断的得分差比例，为0时不截断
+    '''
+    _metrics = {
+        'queries': 0,
+        'candidates': 0,
+        'early_stops': 0,
+        'early_stopped_candidates': 0,
+        'results': 0,
+        'promoted_queries': 0,
+        'promotion_depth_max': 0,
+        'promotion_depth': [0] * _DEPTH_BUCKETS,
+    }
+
+    @classmethod
+    def get_limit(cls, top_k: int) -> int:
+        server_config = get_config().get('server', {})
+        multiplier = server_config.get('rerank_candidate_multiplier', _DEFAULT_CANDIDATE_MULTIPLIER)
+        min_limit = server_config.get('rerank_candidate_min', _DEFAULT_CANDIDATE_MIN)
+        max_limit = server_config.get('rerank_candidate_max', _DEFAULT_CANDIDATE_MAX)
+        limit = min(max(int(top_k * multiplier), min_limit), max_limit)
+        return max(limit, top_k)
+
+    @classmethod
+    def truncate(cls, documents: List[Document], top_k: int) -> List[Document]:
+        '''
+            documents: 按检索得分降序排列的候选
+        '''
+        score_gap = get_config().get('server', {}).get('rerank_candidate_score_gap', _DEFAULT_CANDIDATE_SCORE_GAP)
+        if not score_gap or len(documents) <= top_k:
+            return documents
+
+        top_score = documents[0].metadata.get('score', 0.)
+        if top_score <= 0:
+            return documents
+
+        max_gap = top_score * score_gap
+        for i in range(top_k, len(documents)):
+            if documents[i - 1].metadata.get('score', 0.) - documents[i].metadata.get('score', 0.) > max_gap:
+                cls._metrics['early_stops'] += 1
+                cls._metrics['early_stopped_candidates'] += len(documents) - i
+                logger.debug(f'Rerank candidates early stopped at {i}/{len(documents)}.')
+                return documents[:i]
+        return documents
+
+    @classmethod
+    def record(cls, candidates: List[Document], rerank_documents: List[Document], top_k: int):
+        '''
+            rerank会复用候选中的Document对象，据此得到rerank结果在rerank前的位置
+        '''
+        positions = {id(document): i for i, document in enumerate(candidates)}
+        depths = [positions[id(document)] for document in rerank_documents if id(document) in positions]
+
+        cls._metrics['queries'] += 1
+        cls._metrics['candidates'] += len(candidates)
+        cls._metrics['results'] += len(depths)
+        if any(depth >= top_k for depth in depths):
+            cls._metrics['promoted_queries'] += 1
+        for depth in depths:
+            cls._metrics['promotion_depth'][min(depth // top_k, _DEPTH_BUCKETS - 1)] += 1
+            cls._metrics['promotion_depth_max'] = max(cls._metrics['promotion_depth_max'], depth)
+
+    @classmethod
+    def get_metrics(cls) -> Dict:
+        metrics = dict(cls._metrics)
+        metrics['promotion_depth'] = {
+            f'{bucket + 1}x' if bucket < _DEPTH_BUCKETS - 1 else f'{bucket + 1}x+': count
+            for bucket, count in enumerate(cls._metrics['promotion_depth'])
+        }
+        queries = metrics['queries']
+        metrics['candidates_avg'] = metrics['candidates'] / queries if queries else 0.
+        metrics['promoted_query_rate'] = metrics['promoted_queries'] / queries if queries else 0.
+        return metrics
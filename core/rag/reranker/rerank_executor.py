@@ -0,0 +1,115 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+import threading
+import asyncio
+import time
+
+from config.config import get_config
+from logger import get_logger
+
+logger = get_logger('rag')
+
+_DEFAULT_EXECUTOR_TYPE = 'thread'
+_DEFAULT_EXECUTOR_WORKERS = 4
+# 排队时间超过该值时告警，单位秒
+_QUEUE_TIME_WARNING = 0.5
+
+def _timed_call(func: Callable, *args) -> Tuple[float, float, Any]:
+    '''
+        在线程/进程池中执行，返回开始时间、结束时间与执行结果
+        time.monotonic 在同一主机的进程间可比较
+    '''
+    start_time = time.monotonic()
+    result = func(*args)
+    return start_time, time.monotonic(), result
+
+class RerankExecutor:
+    '''
+        重排序中CPU密集部分（WEIGHT的分词、得分计算，Rerank模型输入的截断与缓存键计算）的执行器，避免阻塞事件循环
+        根据配置 server.rerank_executor_type 选择线程池(thread)或进程池(process)
+        进程池模式下，func及其参数需可被pickle
+    '''
+    _executor: Optional[Executor] = None
+    _lock = threading.Lock()
+
+    _metrics = {
+        'submitted': 0,
+        'completed': 0,
+        'failed': 0,
+        'pending': 0,
+        'queue_time_total': 0.,
+        'queue_time_max': 0.,
+        'run_time_total': 0.,
+        'run_time_max': 0.,
+    }
+
+    @classmethod
+    def get_executor(cls) -> Executor:
+        if cls._executor is None:
+            with cls._lock:
+                if cls._executor is None:
+                    server_config = get_config().get('server', {})
+                    executor_type = server_config.get('rerank_executor_type', _DEFAULT_EXECUTOR_TYPE)
+                    executor_workers = server_config.get('rerank_executor_workers', _DEFAULT_EXECUTOR_WORKERS)
+
+                    if executor_type == 'thread':
+                        cls._executor = ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix='rerank')
+                    elif executor_type == 'process':
+                        # 服务进程中已有多个线程，使用spawn避免fork带来的锁状态问题
+                        cls._executor = ProcessPoolExecutor(
+                            max_workers=executor_workers,
+                            mp_context=multiprocessing.get_context('spawn'),
+                        )
+                    else:
+                        raise ValueError(f'Unsupported rerank executor type: {executor_type}')
+
+                    logger.info(f'Init rerank executor: {executor_type} with size({executor_workers}).')
+        return cls._executor
+
+    @classmethod
+    async def run(cls, func: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+
+        submit_time = time.monotonic()
+        cls._metrics['submitted'] += 1
+        cls._metrics['pending'] += 1
+        try:
+            start_time, end_time, result = await loop.run_in_executor(
+                cls.get_executor(), _timed_call, func, *args
+            )
+        except Exception:
+            cls._metrics['failed'] += 1
+            raise
+        finally:
+            cls._metrics['pending'] -= 1
+
+        queue_time = max(start_time - submit_time, 0.)
+        run_time = end_time - start_time
+        cls._metrics['completed'] += 1
+        cls._metrics['queue_time_total'] += queue_time
+        cls._metrics['queue_time_max'] = max(cls._metrics['queue_time_max'], queue_time)
+        cls._metrics['run_time_total'] += run_time
+        cls._metrics['run_time_max'] = max(cls._metrics['run_time_max'], run_time)
+
+        if queue_time > _QUEUE_TIME_WARNING:
+            logger.warning(f'Rerank executor is busy, [{func.__qualname__}] queued for {queue_time:.3f}s.')
+        else:
+            logger.debug(f'Rerank executor [{func.__qualname__}] queue time: {queue_time:.3f}s, run time: {run_time:.3f}s.')
+
+        return result
+
+    @classmethod
+    def get_metrics(cls) -> Dict:
+        metrics = dict(cls._metrics)
+        completed = metrics['completed']
+        metrics['queue_time_avg'] = metrics['queue_time_total'] / completed if completed else 0.
+        metrics['run_time_avg'] = metrics['run_time_total'] / completed if completed else 0.
+        return metrics
+
+    @classmethod
+    def shutdown(cls):
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=True)
+                cls._executor = None
@@ -4,6 +4,7 @@ from core.rag.reranker.reranker_base import BaseReranker
 from core.rag.reranker.reranker_model import ModelReranker
 from core.rag.reranker.reranker_weight import WeightReranker
 from core.rag.entities.document import Document
+from core.rag.utils.rag_utils import collapse_documents_by_parent
 
 _reranker_map = {
     'MODEL': ModelReranker,
@@ -27,11 +28,15 @@ class RerankProcessor:
         top_k: int, 
         score_threshold: Optional[float] = None
     ) -> Tuple[List[Document], Dict]:
+        '''
+            同一父段的多个子段共享相同的上下文，重排序后按父段合并（保留得分最高的子段），再截取top_k，
+            使返回的每条结果对应不同的上下文
+        '''
         rerank_documents, usage = await reranker.rerank(
             query=query,
             documents=documents,
-            top_k=top_k,
+            top_k=len(documents),
             score_threshold=score_threshold
         )
 
-        return rerank_documents, usage
\ No newline at end of file
+        return collapse_documents_by_parent(rerank_documents)[:top_k], usage
\ No newline at end of file
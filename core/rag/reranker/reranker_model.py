@@ -1,13 +1,28 @@
 from typing import List, Optional, Dict, Tuple
+import asyncio
 
+from config.config import get_config
 from core.model.model_manager import ModelManager, ModelInstanceType
 from core.rag.reranker.reranker_base import BaseReranker
+from core.rag.reranker.rerank_cache import RerankCache
+from core.rag.reranker.rerank_executor import RerankExecutor
 from core.rag.entities.document import Document
+from core.agent.base_utils import estimate_text_tokens
+from core.rag.utils.rag_utils import add_usage_dict, truncate_text_by_tokens
+
+_DEFAULT_RERANK_MAX_TOKENS = 512
+_DEFAULT_RERANK_BATCH_SIZE = 16
+# query与片段拼接时的特殊token等开销
+_RERANK_TOKEN_OVERHEAD = 8
+# 截断后片段至少保留的tokens数
+_RERANK_MIN_DOCUMENT_TOKENS = 64
 
 class ModelReranker(BaseReranker):
     def __init__(self, model_instance_provider: str, model_instance_config: Dict, **kwargs):
         '''
             此处使用的是Rerank模型
+            片段按模型的最大输入tokens数（模型配置 context_length，未设置时为 server.rerank_max_tokens）截断，
+            候选按 server.rerank_batch_size 分批并发请求后合并得分
         '''
         self.model_rerank = ModelManager.get_model_instance(
             model_instance_provider,
@@ -15,11 +30,20 @@ class ModelReranker(BaseReranker):
             **model_instance_config
         )
 
+        server_config = get_config().get('server', {})
+        self.max_tokens = model_instance_config.get('context_length') or server_config.get('rerank_max_tokens', _DEFAULT_RERANK_MAX_TOKENS)
+        self.batch_size = max(server_config.get('rerank_batch_size', _DEFAULT_RERANK_BATCH_SIZE), 1)
+        self.model_key = '\x00'.join((
+            model_instance_provider,
+            str(model_instance_config.get('model_name', '')),
+            str(model_instance_config.get('base_url', '')),
+        ))
+
     async def rerank(
-        self, 
-        query: str, 
-        documents: List[Document], 
-        top_k: int, 
+        self,
+        query: str,
+        documents: List[Document],
+        top_k: int,
         score_threshold: Optional[float] = None
     ) -> Tuple[List[Document], Dict]:
         # documents 去重
@@ -31,23 +55,73 @@ class ModelReranker(BaseReranker):
                 unique_documents.append(document)
         documents = unique_documents
 
-        rerank_results = await self.model_rerank.ainvoke_rerank(
-            query=query,
-            documents=[document.page_content for document in documents],
-            top_k=top_k,
-            return_documents=False
+        # 按模型最大输入截断片段、计算缓存键，交由重排序执行器，避免阻塞事件循环
+        is_cache_enabled = RerankCache.is_enabled()
+        texts, cache_keys = await RerankExecutor.run(
+            ModelReranker._prepare_texts,
+            query,
+            [document.page_content for document in documents],
+            self.max_tokens,
+            self.model_key if is_cache_enabled else None,
         )
 
-        rerank_documents = []
-        for result in rerank_results.results:
-            idx = result.index
-            score = result.score
+        # 命中缓存的片段不再请求模型
+        scores: List[Optional[float]] = [None] * len(documents)
+        if is_cache_enabled:
+            scores = [RerankCache.get(cache_key) for cache_key in cache_keys]
+
+        # 未命中的片段分批并发请求，合并得分
+        indices = [idx for idx, score in enumerate(scores) if score is None]
+        batches = [indices[i:i + self.batch_size] for i in range(0, len(indices), self.batch_size)]
+        batch_results = await asyncio.gather(*[
+            self.model_rerank.ainvoke_rerank(
+                query=query,
+                documents=[texts[idx] for idx in batch],
+                top_k=len(batch),
+                return_documents=False
+            )
+            for batch in batches
+        ])
+
+        usage = {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+        }
+        for batch, rerank_results in zip(batches, batch_results):
+            for result in rerank_results.results:
+                idx = batch[result.index]
+                scores[idx] = result.score
+                if is_cache_enabled:
+                    RerankCache.put(cache_keys[idx], result.score)
+            usage = add_usage_dict(usage, rerank_results.usage.to_dict())
+
+        ranked = sorted(
+            ((idx, score) for idx, score in enumerate(scores) if score is not None),
+            key=lambda x: x[1],
+            reverse=True,
+        )
 
+        rerank_documents = []
+        for idx, score in ranked[:top_k]:
             if score_threshold and score < score_threshold:
                 continue
 
             if documents[idx].metadata is not None:
                 documents[idx].metadata['score'] = score
                 rerank_documents.append(documents[idx])
-        
-        return rerank_documents, rerank_results.usage.to_dict()
\ No newline at end of file
+
+        return rerank_documents, usage
+
+    @staticmethod
+    def _prepare_texts(query: str, contents: List[str], max_tokens: int, model_key: Optional[str]) -> Tuple[List[str], List[str]]:
+        '''
+            按模型最大输入截断片段，model_key 不为空时同时计算各片段的缓存键
+        '''
+        document_max_tokens = max(
+            max_tokens - estimate_text_tokens(query) - _RERANK_TOKEN_OVERHEAD,
+            _RERANK_MIN_DOCUMENT_TOKENS,
+        )
+        texts = [truncate_text_by_tokens(content, document_max_tokens) for content in contents]
+        cache_keys = [RerankCache.make_key(model_key, query, text) for text in texts] if model_key is not None else []
+        return texts, cache_keys
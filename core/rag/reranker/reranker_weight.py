@@ -1,15 +1,14 @@
 from typing import List, Optional, Dict, Set, Tuple
 from collections import Counter
-import re
-import math
+import asyncio
 
-import jieba.analyse
 import numpy as np
 
 from core.rag.reranker.reranker_base import BaseReranker
+from core.rag.reranker.rerank_executor import RerankExecutor
 from core.rag.entities.document import Document
 from core.rag.vectorizer.vectorize_processor import VectorizeProcessor
-from core.rag.data.jieba_stopwords import STOPWORDS
+from core.rag.utils.rag_utils import extract_keywords
 
 class WeightReranker(BaseReranker):
     def __init__(self, weight: float, model_instance_provider: str, model_instance_config: Dict, **kwargs):
@@ -37,20 +36,28 @@ class WeightReranker(BaseReranker):
                 unique_documents.append(document)
         documents = unique_documents
 
-        # 计算语义得分
-        semantics_scores = [0.] * len(documents)
-        usage = {
-            "prompt_tokens": 0,
-            "completion_tokens": 0,
-            "total_tokens": 0,
-        }
+        # 计算语义得分，Embedding请求与关键词得分计算并发进行
+        semantics_task = None
         if self.semantics_weight > 0:
-            semantics_scores, usage = await self._calculate_semantics_scores(query, documents)
-
-        # 计算关键词得分
-        keyword_scores = [0.] * len(documents)
-        if self.keyword_weight > 0:
-            keyword_scores = self._calculate_keyword_scores(query, documents)
+            semantics_task = asyncio.create_task(self._calculate_semantics_scores(query, documents))
+
+        try:
+            # 计算关键词得分
+            keyword_scores = [0.] * len(documents)
+            if self.keyword_weight > 0:
+                keyword_scores = await self._calculate_keyword_scores(query, documents)
+
+            semantics_scores = [0.] * len(documents)
+            usage = {
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "total_tokens": 0,
+            }
+            if semantics_task is not None:
+                semantics_scores, usage = await semantics_task
+        finally:
+            if semantics_task is not None and not semantics_task.done():
+                semantics_task.cancel()
 
         # 根据语义权重，计算总得分，并进行阈值筛选
         rerank_documents = []
@@ -74,109 +81,128 @@ class WeightReranker(BaseReranker):
         '''
             向量余弦相似度
         '''
-        # 计算query的向量
-        query_vectorize_result = await VectorizeProcessor.vectorize(self.vectorizer, [query])
+        # 计算query的向量，同时仅为缺少向量的document重新生成向量（如Embedding模型与知识库不一致），缺少的向量一次批量生成
+        missing_indexes = [idx for idx, document in enumerate(documents) if not document.vector]
+        coros = [VectorizeProcessor.vectorize(self.vectorizer, [query])]
+        if missing_indexes:
+            coros.append(VectorizeProcessor.vectorize(
+                self.vectorizer, [documents[idx].page_content for idx in missing_indexes]
+            ))
+        vectorize_results = await asyncio.gather(*coros)
+        query_vectorize_result = vectorize_results[0]
         query_vector = query_vectorize_result[0]["vector"]
 
-        if documents and any(doc.vector is None for doc in documents):
-            contents = [document.page_content for document in documents]
-            contents_vector = await VectorizeProcessor.vectorize(self.vectorizer, contents)
+        if not documents:
+            return [], query_vectorize_result[0]["usage"]
 
-        # 计算与各document的余弦相似度
-        scores: List[float] = []
-        for idx, document in enumerate(documents):
-            vec1 = np.array(query_vector)
-            vec2 = np.array(document.vector if document.vector else contents_vector[idx]["vector"])
+        missing_vectors = {}
+        if missing_indexes:
+            missing_vectors = {
+                idx: result["vector"]
+                for idx, result in zip(missing_indexes, vectorize_results[1])
+            }
 
-            # 两向量的点积 除以 两向量模长的乘积
+        documents_vector = [
+            document.vector if document.vector else missing_vectors[idx]
+            for idx, document in enumerate(documents)
+        ]
 
-            # calculate dot product
-            dot_product = np.dot(vec1, vec2)
+        # 余弦相似度计算交由重排序执行器，避免阻塞事件循环
+        scores = await RerankExecutor.run(WeightReranker._cosine_scores, query_vector, documents_vector)
+        return scores, query_vectorize_result[0]["usage"]
 
-            # calculate norm
-            norm_vec1 = np.linalg.norm(vec1)
-            norm_vec2 = np.linalg.norm(vec2)
+    @staticmethod
+    def _cosine_scores(query_vector: List[float], documents_vector: List[List[float]]) -> List[float]:
+        '''
+            query向量与documents向量的余弦相似度
+            将全部document的向量堆叠为float32矩阵(n, dim)，一次矩阵-向量乘积完成计算
+        '''
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        documents_vector = np.asarray(documents_vector, dtype=np.float32)
 
-            # calculate cosine similarity
-            cosine_sim = dot_product / (norm_vec1 * norm_vec2)
-            scores.append(cosine_sim)
-        
-        return scores, query_vectorize_result[0]["usage"]
+        # 两向量的点积 除以 两向量模长的乘积
+        dot_products = documents_vector @ query_vector
+        norms = np.linalg.norm(documents_vector, axis=1) * np.linalg.norm(query_vector)
+
+        scores = np.divide(dot_products, norms, out=np.zeros_like(dot_products), where=norms > 0)
+        return scores.tolist()
 
-    def _calculate_keyword_scores(self, query: str, documents: List[Document]) -> List[float]:
+    async def _calculate_keyword_scores(self, query: str, documents: List[Document]) -> List[float]:
         '''
-            BM25
+            TF-IDF 余弦相似度
         '''
+        # 优先使用分段时预先计算并存储在metadata中的关键词，缺失时再对内容分词
+        documents_keywords: List[Optional[List[str]]] = []
+        documents_contents: List[Optional[str]] = []
+        for document in documents:
+            keywords = document.metadata.get('keywords') if document.metadata is not None else []
+            documents_keywords.append(keywords)
+            documents_contents.append(document.page_content if keywords is None else None)
+
+        # 分词与得分计算交由重排序执行器，避免阻塞事件循环
+        return await RerankExecutor.run(
+            WeightReranker._keyword_scores, query, documents_keywords, documents_contents
+        )
+
+    @staticmethod
+    def _keyword_scores(
+        query: str, 
+        documents_keywords: List[Optional[List[str]]], 
+        documents_contents: List[Optional[str]],
+    ) -> List[float]:
         # 提取query的关键词
-        query_keywords: Set[str] = self._extract_keywords(query)
+        query_keywords: Set[str] = set(extract_keywords(query))
 
         # 提取documents的关键词
-        documents_keywords_list: List[Set[str]] = []        # 每个文档的关键词
-        documents_keywords: Set[str] = set()                # 全部文档的关键词
-        for document in documents:
-            document_keywords = self._extract_keywords(document.page_content)
-            if document.metadata is not None:
-                # document.metadata['keywords'] = document_keywords
-                documents_keywords_list.append(document_keywords)
-                documents_keywords.update(document_keywords)
-            else:
-                documents_keywords_list.append([])
-        
-        # 计算query中关键词的词频 TF
-        query_keywords_tf = Counter(query_keywords)
-
-        # 计算documents中关键词的逆文档频率 IDF
-        documents_keywords_idf: Dict[str, float] = {}       # 全部文档的关键词的IDF
-        documents_len = len(documents)
-        for keyword in documents_keywords:
-            # 计算在documents中有多少篇document包含了关键词keyword
-            freq = sum(1 for document_keywords in documents_keywords_list if keyword in document_keywords)
-            documents_keywords_idf[keyword] = math.log((1 + documents_len) / (1 + freq)) + 1
-
-        # 计算query中关键词的 TF-IDF
-        query_keywords_tfidf: Dict[str, float] = {}
-        for query_keyword, tf in query_keywords_tf.items():
-            idf = documents_keywords_idf.get(query_keyword, 0)
-            query_keywords_tfidf[query_keyword] = tf * idf
-
-        # 分别计算每个document中关键词的 TF-IDF
-        documents_keywords_tfidf: List[Dict[str, float]] = []   # 每个文档的关键词的IDF
-        for document_keywords in documents_keywords_list:
-            document_keywords_tf = Counter(document_keywords)
-            document_keywords_tfidf = {}
-            for document_keyword, tf in document_keywords_tf.items():
-                idf = documents_keywords_idf.get(document_keyword, 0)
-                document_keywords_tfidf[document_keyword] = tf * idf
-            documents_keywords_tfidf.append(document_keywords_tfidf)
-
-        # 计算query与每个document的相似度
-        def cosine_similarity(vec1, vec2) -> float:
-            intersection = set(vec1.keys()) & set(vec2.keys())
-            numerator = sum(vec1[x] * vec2[x] for x in intersection)
-
-            sum1 = sum(vec1[x] ** 2 for x in vec1)
-            sum2 = sum(vec2[x] ** 2 for x in vec2)
-            denominator = math.sqrt(sum1) * math.sqrt(sum2)
-
-            return float(numerator) / denominator if denominator else 0.0
-
-        similarities: List[float] = []
-        for document_keywords_tfidf in documents_keywords_tfidf:
-            similarity = cosine_similarity(query_keywords_tfidf, document_keywords_tfidf)
-            similarities.append(similarity)
-        
-        return similarities
-
-    def _extract_keywords(self, text: str) -> Set[str]:
-        keywords = jieba.analyse.extract_tags(sentence=text, topK=None, withWeight=False)
-        keywords = set(keywords)
+        documents_keywords_list: List[Set[str]] = [
+            set(keywords) if keywords is not None else set(extract_keywords(content))
+            for keywords, content in zip(documents_keywords, documents_contents)
+        ]
 
-        results = set()
-        for keyword in keywords:
-            results.add(keyword)
-            # 拆分英文、数字等子串
-            sub_keywords = re.findall(r'\w+', keyword)
-            if len(sub_keywords) > 1:
-                results.update({sub_keyword for sub_keyword in sub_keywords if sub_keyword not in STOPWORDS})
+        return WeightReranker._tfidf_cosine_scores(query_keywords, documents_keywords_list)
 
-        return results
\ No newline at end of file
+    @staticmethod
+    def _tfidf_cosine_scores(query_keywords: Set[str], documents_keywords_list: List[Set[str]]) -> List[float]:
+        '''
+            一次遍历构建稀疏的 文档-词项 矩阵（COO形式：行为文档，列为关键词），
+            再以向量化方式计算IDF、TF-IDF及query与每个document的余弦相似度
+        '''
+        documents_len = len(documents_keywords_list)
+        if documents_len == 0:
+            return []
+
+        vocabulary: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        for row, document_keywords in enumerate(documents_keywords_list):
+            for keyword in document_keywords:
+                rows.append(row)
+                cols.append(vocabulary.setdefault(keyword, len(vocabulary)))
+
+        if not vocabulary:
+            return [0.] * documents_len
+
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+
+        # 计算documents中关键词的逆文档频率 IDF，关键词集合内无重复，列计数即文档频率
+        document_freq = np.bincount(cols, minlength=len(vocabulary))
+        idf = np.log((1 + documents_len) / (1 + document_freq)) + 1
+
+        # 计算query中关键词的 TF-IDF，未出现在documents中的关键词IDF为0
+        query_tfidf = np.zeros(len(vocabulary), dtype=np.float64)
+        for keyword, tf in Counter(query_keywords).items():
+            col = vocabulary.get(keyword)
+            if col is not None:
+                query_tfidf[col] = tf * idf[col]
+
+        # documents中关键词的 TF 均为1，TF-IDF即IDF
+        entries_tfidf = idf[cols]
+
+        # 稀疏矩阵-向量乘积，得到点积与各document的模长
+        numerators = np.bincount(rows, weights=entries_tfidf * query_tfidf[cols], minlength=documents_len)
+        documents_norm = np.sqrt(np.bincount(rows, weights=entries_tfidf ** 2, minlength=documents_len))
+        denominators = documents_norm * np.linalg.norm(query_tfidf)
+
+        similarities = np.divide(numerators, denominators, out=np.zeros(documents_len), where=denominators > 0)
+        return similarities.tolist()
@@ -0,0 +1,124 @@
+from typing import List, Tuple
+import re
+
+from config.config import get_config
+from core.rag.entities.document import Document
+from core.agent.base_utils import estimate_text_tokens
+from core.rag.utils.rag_utils import extract_keywords, truncate_text_by_tokens
+from logger import get_logger
+
+logger = get_logger('rag')
+
+_DEFAULT_CONTEXT_MAX_TOKENS = 3000
+_DEFAULT_CONTEXT_TRIM = True
+# 剩余预算小于该值时不再截取片段
+_MIN_TRIM_TOKENS = 64
+_CONTEXT_SEPARATOR = ' '
+_TRIM_ELLIPSIS = '……'
+# 句子切分：中英文句末标点、换行
+_SENTENCE_PATTERN = re.compile(r'[^。！？!?；;\n]*(?:[。！？!?；;\n]+|$)')
+
+class ContextAssembler:
+    '''
+        知识库检索工具返回内容的组装
+        按得分降序依次放入片段上下文，总tokens数（估算）不超过 server.retrieve_context_max_tokens；
+        放不下的片段，在 server.retrieve_context_trim 开启时按句切分，优先保留包含query关键词的句子
+        配置：
+            server.retrieve_context_max_tokens: 单次工具调用返回内容的tokens上限，为0时不限制
+            server.retrieve_context_trim: 是否截取放不下的片段中与query相关的句子
+    '''
+
+    @classmethod
+    def _get_settings(cls) -> Tuple[int, bool]:
+        server_config = get_config().get('server', {})
+        max_tokens = server_config.get('retrieve_context_max_tokens', _DEFAULT_CONTEXT_MAX_TOKENS)
+        trim = server_config.get('retrieve_context_trim', _DEFAULT_CONTEXT_TRIM)
+        return max_tokens, trim
+
+    @staticmethod
+    def split_sentences(text: str) -> List[str]:
+        return [sentence for sentence in _SENTENCE_PATTERN.findall(text) if sentence.strip()]
+
+    @classmethod
+    def trim(cls, text: str, keywords: List[str], max_tokens: int) -> str:
+        '''
+            按句截取文本：包含关键词越多的句子越优先，同等情况下靠前的句子优先，
+            选中的句子按原顺序拼接，不连续处以省略号连接
+        '''
+        sentences = cls.split_sentences(text)
+        sentence_tokens = [estimate_text_tokens(sentence) for sentence in sentences]
+        hits = [sum(1 for keyword in keywords if keyword in sentence) for sentence in sentences]
+
+        selected = []
+        tokens = 0
+        for i in sorted(range(len(sentences)), key=lambda i: (-hits[i], i)):
+            if tokens + sentence_tokens[i] > max_tokens:
+                continue
+            selected.append(i)
+            tokens += sentence_tokens[i]
+
+        # 逐句估算的取整误差与省略号会使总数略超预算，按优先级从低到高移除句子
+        while selected:
+            result = cls._join_sentences(sentences, selected)
+            if estimate_text_tokens(result) <= max_tokens:
+                return result
+            selected.pop()
+
+        # 单句即超出预算时，直接截断
+        return truncate_text_by_tokens(text, max_tokens).strip()
+
+    @staticmethod
+    def _join_sentences(sentences: List[str], selected: List[int]) -> str:
+        parts = []
+        last = -1
+        for i in sorted(selected):
+            if parts and i != last + 1:
+                parts.append(_TRIM_ELLIPSIS)
+            parts.append(sentences[i])
+            last = i
+        return ''.join(parts).strip()
+
+    @classmethod
+    def assemble(cls, query: str, documents: List[Document]) -> str:
+        contexts = []
+        for document in sorted(documents, key=lambda x: x.metadata.get('score', 0.) if x.metadata else 0., reverse=True):
+            context = document.metadata.get('context_content', '') if document.metadata else ''
+            if context and context not in contexts:
+                contexts.append(context)
+
+        max_tokens, is_trim = cls._get_settings()
+        if not max_tokens:
+            return _CONTEXT_SEPARATOR.join(contexts)
+
+        keywords = None
+        results = []
+        remaining = max_tokens
+        separator_tokens = estimate_text_tokens(_CONTEXT_SEPARATOR)
+        for context in contexts:
+            # 非首个片段需计入分隔符
+            budget = remaining - separator_tokens if results else remaining
+            tokens = estimate_text_tokens(context)
+            if tokens <= budget:
+                results.append(context)
+                remaining = budget - tokens
+                continue
+
+            if not is_trim or budget < _MIN_TRIM_TOKENS:
+                continue
+
+            if keywords is None:
+                keywords = extract_keywords(query)
+            trimmed = cls.trim(context, keywords, budget)
+            if trimmed:
+                results.append(trimmed)
+                remaining = budget - estimate_text_tokens(trimmed)
+
+        # 逐段估算的取整误差会使拼接结果略超预算，以拼接结果为准截断最后一个片段的末尾
+        output = _CONTEXT_SEPARATOR.join(results)
+        tokens = estimate_text_tokens(output)
+        if tokens > max_tokens:
+            output = truncate_text_by_tokens(output, max_tokens).strip()
+            tokens = estimate_text_tokens(output)
+
+        logger.debug(f'Assembled {len(results)}/{len(contexts)} contexts with {tokens}/{max_tokens} tokens.')
+        return output
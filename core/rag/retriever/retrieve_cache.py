@@ -0,0 +1,164 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import sys
+import time
+
+from config.config import get_config
+from core.rag.entities.document import Document
+from logger import get_logger
+
+logger = get_logger('rag')
+
+_DEFAULT_CACHE_MAX_MB = 64
+_DEFAULT_CACHE_TTL = 10
+# 单个片段除正文外的估算开销（metadata、对象头等），单位字节
+_DOCUMENT_OVERHEAD = 1024
+
+class RetrieveCache:
+    '''
+        知识库检索结果缓存
+        每个知识库维护一个版本号，写入路径（解析、增删改片段、重建向量）在数据变更后调用 invalidate 递增版本号，
+        缓存项记录写入时的版本号，与当前版本号不一致即失效；
+        检索开始前读取版本号，检索期间发生写入时，写回的缓存项版本号已过期，不会被命中；
+        本服务之外的数据变更（如控制台启用/禁用/删除文档）由调用方通过 RetrieveCacheInvalidate 接口触发 invalidate
+        配置：
+            server.retrieve_cache_max_mb: 缓存内存上限（估算值），为0时关闭缓存
+            server.retrieve_cache_ttl: 缓存有效期，单位秒，仅用于兜底未调用失效接口的变更
+    '''
+    _entries: 'OrderedDict[str, Tuple[int, int, float, List[Document], int]]' = OrderedDict()
+    _knowledge_base_keys: Dict[int, Set[str]] = {}
+    _versions: Dict[int, int] = {}
+    _size = 0
+
+    _metrics = {
+        'hits': 0,
+        'misses': 0,
+        'evictions': 0,
+        'expirations': 0,
+        'invalidations': 0,
+    }
+
+    @classmethod
+    def _get_settings(cls) -> Tuple[int, float]:
+        server_config = get_config().get('server', {})
+        max_bytes = server_config.get('retrieve_cache_max_mb', _DEFAULT_CACHE_MAX_MB) * 1024 * 1024
+        ttl = server_config.get('retrieve_cache_ttl', _DEFAULT_CACHE_TTL)
+        return max_bytes, ttl
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        max_bytes, _ = cls._get_settings()
+        return max_bytes > 0
+
+    @staticmethod
+    def make_key(knowledge_base_id: int, *args: Any) -> str:
+        '''
+            由知识库id、检索配置、规范化后的query、元数据过滤信息等生成缓存键
+        '''
+        raw = json.dumps([knowledge_base_id, *args], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        # 仅合并空白字符，全文检索区分大小写，不做大小写转换
+        return ' '.join(query.split())
+
+    @classmethod
+    def get_version(cls, knowledge_base_id: int) -> int:
+        return cls._versions.get(knowledge_base_id, 0)
+
+    @classmethod
+    def invalidate(cls, knowledge_base_id: int):
+        '''
+            知识库数据变更后调用，递增版本号并清除该知识库的缓存项
+        '''
+        cls._versions[knowledge_base_id] = cls.get_version(knowledge_base_id) + 1
+        cls._metrics['invalidations'] += 1
+
+        for key in cls._knowledge_base_keys.pop(knowledge_base_id, set()):
+            cls._remove(key)
+
+    @classmethod
+    def get(cls, knowledge_base_id: int, key: str) -> Optional[List[Document]]:
+        entry = cls._entries.get(key)
+        if entry is None:
+            cls._metrics['misses'] += 1
+            return None
+
+        version, _, expire_time, documents, _ = entry
+        if version != cls.get_version(knowledge_base_id):
+            cls._discard(knowledge_base_id, key)
+            cls._metrics['misses'] += 1
+            return None
+        if expire_time < time.monotonic():
+            cls._discard(knowledge_base_id, key)
+            cls._metrics['expirations'] += 1
+            cls._metrics['misses'] += 1
+            return None
+
+        cls._entries.move_to_end(key)
+        cls._metrics['hits'] += 1
+        # 调用方会修改返回的document，返回副本
+        return [document.model_copy(deep=True) for document in documents]
+
+    @classmethod
+    def put(cls, knowledge_base_id: int, key: str, version: int, documents: List[Document]):
+        '''
+            version: 检索开始前通过 get_version 获取的版本号
+        '''
+        if version != cls.get_version(knowledge_base_id):
+            return
+
+        max_bytes, ttl = cls._get_settings()
+        size = sum(
+            sys.getsizeof(document.page_content)
+            + sys.getsizeof(document.metadata.get('context_content', '') or '')
+            + 8 * len(document.vector or [])
+            + _DOCUMENT_OVERHEAD
+            for document in documents
+        )
+        if size > max_bytes:
+            return
+
+        cls._discard(knowledge_base_id, key)
+        cls._entries[key] = (
+            version,
+            knowledge_base_id,
+            time.monotonic() + ttl,
+            [document.model_copy(deep=True) for document in documents],
+            size,
+        )
+        cls._knowledge_base_keys.setdefault(knowledge_base_id, set()).add(key)
+        cls._size += size
+
+        # 超出内存上限时，淘汰最久未使用的缓存项
+        while cls._size > max_bytes and cls._entries:
+            oldest_key, (_, oldest_knowledge_base_id, _, _, _) = next(iter(cls._entries.items()))
+            cls._discard(oldest_knowledge_base_id, oldest_key)
+            cls._metrics['evictions'] += 1
+
+    @classmethod
+    def _discard(cls, knowledge_base_id: int, key: str):
+        keys = cls._knowledge_base_keys.get(knowledge_base_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                cls._knowledge_base_keys.pop(knowledge_base_id, None)
+        cls._remove(key)
+
+    @classmethod
+    def _remove(cls, key: str):
+        entry = cls._entries.pop(key, None)
+        if entry is not None:
+            cls._size -= entry[-1]
+
+    @classmethod
+    def get_metrics(cls) -> Dict:
+        metrics = dict(cls._metrics)
+        lookups = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = metrics['hits'] / lookups if lookups else 0.
+        metrics['entries'] = len(cls._entries)
+        metrics['size_bytes'] = cls._size
+        return metrics
@@ -10,6 +10,8 @@ from core.rag.retriever.retriever_base import BaseRetriever
 from core.rag.retriever.retriever_vector import VectorRetriever
 from core.rag.retriever.retriever_fulltext import FulltextRetriever
 from core.rag.retriever.retriever_hybrid import HybridRetriever
+from core.rag.retriever.retrieve_cache import RetrieveCache
+from core.rag.retriever.context_assembler import ContextAssembler
 from core.rag.reranker.rerank_processor import RerankProcessor
 from core.rag.entities.document import Document
 from core.rag.utils.rag_utils import add_usage_dict, short_unique_id
@@ -109,7 +111,8 @@ class RetrieveProcessor:
                     logger.debug(f"[KB Debug] Retrieved {len(documents)} documents: {json.dumps(debug_docs, ensure_ascii=False)}")
                 except Exception:
                     logger.debug("[KB Debug] Failed to build debug docs payload.")
-                res = ' '.join([document.metadata.get('context_content', '') for document in documents])
+                # 按tokens预算组装返回内容，避免长片段撑大每轮推理的prompt
+                res = ContextAssembler.assemble(query, documents)
                 return res if res else 'No relevant information found in the knowledge base for this query. Please use your own knowledge to answer the user\'s question.'
             except Exception as e:
                 logger.error(f'Failed to call [{tool_name}] for {traceback.format_exc()}')
@@ -125,10 +128,35 @@ class RetrieveProcessor:
         is_metadata_filter: bool = False,
         metadata_mode: Optional[str] = None,
         metadata_info: Optional[Any] = None,
+        need_vector: bool = False,
     ) -> Tuple[List[Document], Dict]:
     
         retriever_type = retrieve_config.knowledge_base_retrieve_type
         retriever_config = retrieve_config.knowledge_base_retrieve_config
+
+        # 查询缓存，命中时不再调用模型，用量为0
+        is_cache_enabled = RetrieveCache.is_enabled()
+        if is_cache_enabled:
+            cache_key = RetrieveCache.make_key(
+                retrieve_config.knowledge_base_id,
+                retriever_type,
+                retriever_config,
+                RetrieveCache.normalize_query(query),
+                is_metadata_filter,
+                metadata_mode,
+                metadata_info,
+                need_vector,
+            )
+            cache_version = RetrieveCache.get_version(retrieve_config.knowledge_base_id)
+            documents = RetrieveCache.get(retrieve_config.knowledge_base_id, cache_key)
+            if documents is not None:
+                logger.debug(f'Retrieve cache hit, knowledge base [{retrieve_config.knowledge_base_id}].')
+                return documents, {
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "total_tokens": 0,
+                }
+
         retriever: BaseRetriever = _retriever_map[retriever_type](**retriever_config)
         
         documents, usage = await retriever.retrieve(
@@ -139,10 +167,37 @@ class RetrieveProcessor:
             is_metadata_filter=is_metadata_filter,
             metadata_mode=metadata_mode,
             metadata_info=metadata_info,
+            need_vector=need_vector,
         )
 
+        if is_cache_enabled:
+            RetrieveCache.put(retrieve_config.knowledge_base_id, cache_key, cache_version, documents)
+
         return documents, usage
 
+    @staticmethod
+    def is_same_embedding_model(retrieve_config: RetrieveConfig, recall_config: Optional[RecallConfig]) -> bool:
+        '''
+            知识库检索使用的Embedding模型与召回使用的Embedding模型是否一致
+            一致时，召回可直接复用知识库中已存储的向量
+        '''
+        if recall_config is None or not recall_config.embedding_model_instance_config:
+            return False
+
+        retriever_config = retrieve_config.knowledge_base_retrieve_config
+        if retriever_config.get('embedding_model_instance_provider') != recall_config.embedding_model_instance_provider:
+            return False
+
+        kb_model_config = retriever_config.get('embedding_model_instance_config') or {}
+        recall_model_config = recall_config.embedding_model_instance_config
+        if not kb_model_config.get('model_name'):
+            return False
+
+        return all(
+            kb_model_config.get(key) == recall_model_config.get(key)
+            for key in ('model_name', 'base_url')
+        )
+
     @classmethod
     async def recall(
         cls,
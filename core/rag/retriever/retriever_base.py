@@ -1,10 +1,64 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Tuple, Dict, Any
+from typing import List, Optional, Tuple, Dict, Any, Literal
 
+from pydantic import BaseModel, Field
+
+from config.config import get_config
 from core.rag.entities.document import Document
 from core.rag.metadata.metada_processor import MetadataMode
+from core.rag.utils.sql_operation import (
+    build_vector_search_settings, 
+    build_full_text_like_patterns, 
+    build_full_text_search_settings, 
+)
 
 TOP_K_MAX = 30
+_DEFAULT_PARENT_OVERFETCH = 2
+
+def get_parent_overfetch_limit(top_k: int) -> int:
+    '''
+        父子分段时，多个子段可能属于同一父段，未开启rerank时按 server.retrieve_parent_overfetch 倍数多取候选，
+        按父段合并后再截取top_k
+    '''
+    overfetch = get_config().get('server', {}).get('retrieve_parent_overfetch', _DEFAULT_PARENT_OVERFETCH)
+    return max(int(top_k * overfetch), top_k)
+
+class VectorSearchConfig(BaseModel):
+    '''
+        向量检索的索引参数，未设置时使用数据库默认值
+    '''
+    hnsw_ef_search: Optional[int] = Field(None, description='HNSW索引检索时的ef_search')
+    ivfflat_probes: Optional[int] = Field(None, description='IVFFlat索引检索时的probes')
+    iterative_scan: Optional[Literal['off', 'relaxed_order', 'strict_order']] = Field(None, description='迭代索引扫描方式，需pgvector >= 0.8.0')
+    vector_precision: Literal['vector', 'halfvec', 'bit'] = Field('vector', description='检索精度，halfvec/bit需先为知识库建立对应的低精度索引')
+    rescore_factor: int = Field(4, ge=1, description='低精度检索时，候选数量相对top_k的倍数')
+
+    def get_search_settings(self, limit: int) -> Dict[str, str]:
+        # 低精度检索时，索引扫描返回的是重排序前的候选
+        if self.vector_precision != 'vector':
+            limit = limit * self.rescore_factor
+        # ef_search 小于 LIMIT 时，HNSW索引最多只返回 ef_search 条结果
+        hnsw_ef_search = max(self.hnsw_ef_search, limit) if self.hnsw_ef_search else None
+        return build_vector_search_settings(
+            hnsw_ef_search=hnsw_ef_search,
+            ivfflat_probes=self.ivfflat_probes,
+            iterative_scan=self.iterative_scan,
+        )
+
+class FullTextSearchConfig(BaseModel):
+    '''
+        全文检索的预过滤参数，预过滤条件可使用 pg_bigm 的GIN索引
+    '''
+    full_text_keyword_prefilter: bool = Field(False, description='是否仅对包含查询关键词的片段计算全文检索得分，开启后不含任一关键词的片段不参与召回')
+    full_text_similarity_limit: Optional[float] = Field(None, description='全文检索相似度阈值，设置后仅对满足阈值的片段计算得分')
+
+    def get_full_text_like_patterns(self, query: str) -> List[str]:
+        if not self.full_text_keyword_prefilter:
+            return []
+        return build_full_text_like_patterns(query)
+
+    def get_full_text_search_settings(self) -> Dict[str, str]:
+        return build_full_text_search_settings(self.full_text_similarity_limit)
 
 class BaseRetriever(ABC):
 
@@ -18,6 +72,7 @@ class BaseRetriever(ABC):
         is_metadata_filter: bool = False,
         metadata_mode: Optional[MetadataMode] = None,
         metadata_info: Optional[Any] = None,
+        need_vector: bool = False,
         **kwargs
     ) -> Tuple[List[Document], Dict]:
         raise NotImplementedError
\ No newline at end of file
@@ -1,18 +1,19 @@
 from typing import List, Optional, Dict, Tuple, Any
 
-from pydantic import BaseModel, Field
+from pydantic import Field
 
 from config.config import get_config
 from core.database.database_factory import DatabaseFactory
 from core.rag.entities.document import Document
-from core.rag.retriever.retriever_base import BaseRetriever, TOP_K_MAX
+from core.rag.retriever.retriever_base import BaseRetriever, FullTextSearchConfig, get_parent_overfetch_limit
 from core.rag.reranker.rerank_processor import RerankProcessor
-from core.rag.utils.rag_utils import add_usage_dict
+from core.rag.reranker.rerank_candidate import RerankCandidate
+from core.rag.utils.rag_utils import add_usage_dict, collapse_documents_by_parent
 from core.rag.utils.sql_operation import full_text_search_by_knowledge_base_id
 from core.rag.metadata.metada_processor import MetadataProcessor
 
 
-class FulltextRetrieverConfig(BaseModel):
+class FulltextRetrieverConfig(FullTextSearchConfig):
     embedding_model_instance_provider: str = Field(..., description='Embedding模型供应商')
     embedding_model_instance_config: Dict = Field(..., description='Embedding模型配置信息')
     is_rerank: bool = Field(..., description='是否开启rerank')
@@ -44,6 +45,7 @@ class FulltextRetriever(BaseRetriever):
         is_metadata_filter: bool = False,
         metadata_mode: Optional[str] = None,
         metadata_info: Optional[Any] = None,
+        need_vector: bool = False,
         **kwargs
     ) -> Tuple[List[Document], Dict]:
         # 获取数据库实例
@@ -70,24 +72,31 @@ class FulltextRetriever(BaseRetriever):
         # 通过query从表中查询top_k条记录
         documents = await full_text_search_by_knowledge_base_id(
             db, 
-            True, 
+            need_vector, 
             knowledge_base_id, 
-            min(top_k**2, TOP_K_MAX) if self.retriever_config.is_rerank else top_k, 
+            RerankCandidate.get_limit(top_k) if self.retriever_config.is_rerank else get_parent_overfetch_limit(top_k), 
             query, 
             None if self.retriever_config.is_rerank else score_threshold,
             metadata_condition,
+            self.retriever_config.get_full_text_like_patterns(query),
+            self.retriever_config.get_full_text_search_settings(),
         )
 
         # 根据是否有rerank，进行rerank
         if documents:
             if self.retriever_config.is_rerank:
+                candidates = RerankCandidate.truncate(documents, top_k)
                 documents, rerank_usage = await RerankProcessor.rerank(
                     reranker=self.reranker,
                     query=query,
-                    documents=documents,
+                    documents=candidates,
                     top_k=top_k,
                     score_threshold=score_threshold
                 )
+                RerankCandidate.record(candidates, documents, top_k)
                 usage = add_usage_dict(usage, rerank_usage)
+            else:
+                # 按父段合并后截取top_k
+                documents = collapse_documents_by_parent(documents)[:top_k]
 
         return documents, usage
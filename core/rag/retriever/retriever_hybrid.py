@@ -1,12 +1,13 @@
 from typing import List, Optional, Dict, Tuple, Any
 
 from nltk.corpus.reader import documents
-from pydantic import BaseModel, Field
+from pydantic import Field
 
 from config.config import get_config
 from core.database.database_factory import DatabaseFactory
 from core.rag.entities.document import Document
-from core.rag.retriever.retriever_base import BaseRetriever
+from core.rag.retriever.retriever_base import BaseRetriever, VectorSearchConfig, FullTextSearchConfig
+from core.rag.retriever.vector_index import VectorIndexManager
 from core.rag.utils.sql_operation import select_vector_by_knowledge_base_id, \
     full_text_search_by_knowledge_base_id
 from core.rag.vectorizer.vectorize_processor import VectorizeProcessor
@@ -14,7 +15,7 @@ from core.rag.reranker.rerank_processor import RerankProcessor
 from core.rag.utils.rag_utils import add_usage_dict, list_to_pgvector_str
 from core.rag.metadata.metada_processor import MetadataProcessor
 
-class HybridRetrieverConfig(BaseModel):
+class HybridRetrieverConfig(VectorSearchConfig, FullTextSearchConfig):
     embedding_model_instance_provider: str = Field(..., description='Embedding模型供应商')
     embedding_model_instance_config: Dict = Field(..., description='Embedding模型配置信息')
     hybrid_rerank_type: str = Field(..., description='重排序策略')
@@ -66,6 +67,7 @@ class HybridRetriever(BaseRetriever):
         is_metadata_filter: bool = False,
         metadata_mode: Optional[str] = None,
         metadata_info: Optional[Any] = None,
+        need_vector: bool = False,
         **kwargs
     ) -> Tuple[List[Document], Dict]:
         # 生成query向量
@@ -73,6 +75,9 @@ class HybridRetriever(BaseRetriever):
         query_vector = vectorize_result[0]['vector']
         usage = vectorize_result[0]['usage']
 
+        # WEIGHT重排序，或外部召回需要复用向量时，查询向量
+        need_vector = self.need_vector or need_vector
+
         # 获取数据库实例
         database_info = get_config()["dependent_info"]["database"]
         db = DatabaseFactory.get_database(database_info["type"])
@@ -89,22 +94,45 @@ class HybridRetriever(BaseRetriever):
 
         # 通过query从表中查询top_k条记录
         documents = await full_text_search_by_knowledge_base_id(
-            db, self.need_vector, knowledge_base_id, top_k, query, score_threshold
-        )
-
-
-
-        # 通过向量从表中查询top_k，并获取score
-        vector_documents = await select_vector_by_knowledge_base_id(
             db, 
-            self.need_vector, 
+            need_vector, 
             knowledge_base_id, 
             top_k, 
-            list_to_pgvector_str(query_vector), 
+            query, 
             score_threshold,
             metadata_condition,
+            self.retriever_config.get_full_text_like_patterns(query),
+            self.retriever_config.get_full_text_search_settings(),
         )
 
+
+
+        # 通过向量从表中查询top_k，并获取score
+        # 无元数据过滤时，优先使用热点知识库的内存向量索引
+        vector_documents = None
+        if not metadata_condition:
+            vector_documents = await VectorIndexManager.search(
+                db, 
+                knowledge_base_id, 
+                query_vector, 
+                top_k, 
+                score_threshold,
+                need_vector,
+            )
+        if vector_documents is None:
+            vector_documents = await select_vector_by_knowledge_base_id(
+                db, 
+                need_vector, 
+                knowledge_base_id, 
+                top_k, 
+                list_to_pgvector_str(query_vector), 
+                score_threshold,
+                metadata_condition,
+                self.retriever_config.get_search_settings(top_k),
+                self.retriever_config.vector_precision,
+                self.retriever_config.rescore_factor,
+            )
+
         # 根据rerank类型进行rerank
         documents.extend(vector_documents)
         if documents:
@@ -1,18 +1,20 @@
 from typing import List, Optional, Dict, Tuple, Any
 
-from pydantic import BaseModel, Field
+from pydantic import Field
 
 from config.config import get_config
 from core.database.database_factory import DatabaseFactory
 from core.rag.entities.document import Document
-from core.rag.retriever.retriever_base import BaseRetriever, TOP_K_MAX
+from core.rag.retriever.retriever_base import BaseRetriever, VectorSearchConfig, get_parent_overfetch_limit
+from core.rag.retriever.vector_index import VectorIndexManager
 from core.rag.utils.sql_operation import select_vector_by_knowledge_base_id
 from core.rag.vectorizer.vectorize_processor import VectorizeProcessor
 from core.rag.reranker.rerank_processor import RerankProcessor
-from core.rag.utils.rag_utils import add_usage_dict, list_to_pgvector_str
+from core.rag.reranker.rerank_candidate import RerankCandidate
+from core.rag.utils.rag_utils import add_usage_dict, collapse_documents_by_parent, list_to_pgvector_str
 from core.rag.metadata.metada_processor import MetadataProcessor
 
-class VectorRetrieverConfig(BaseModel):
+class VectorRetrieverConfig(VectorSearchConfig):
     embedding_model_instance_provider: str = Field(..., description='Embedding模型供应商')
     embedding_model_instance_config: Dict = Field(..., description='Embedding模型配置信息')
     is_rerank: bool = Field(..., description='是否开启rerank')
@@ -51,6 +53,7 @@ class VectorRetriever(BaseRetriever):
         is_metadata_filter: bool = False,
         metadata_mode: Optional[str] = None,
         metadata_info: Optional[Any] = None,
+        need_vector: bool = False,
         **kwargs
     ) -> Tuple[List[Document], Dict]:
         if not isinstance(top_k, int) or top_k <= 0:
@@ -75,26 +78,47 @@ class VectorRetriever(BaseRetriever):
             usage = add_usage_dict(usage, metadata_usage)
 
         # 通过向量从表中查询top_k，并获取score
-        documents = await select_vector_by_knowledge_base_id(
-            db, 
-            False, 
-            knowledge_base_id, 
-            min(top_k**2, TOP_K_MAX) if self.retriever_config.is_rerank else top_k, 
-            list_to_pgvector_str(query_vector), 
-            None if self.retriever_config.is_rerank else score_threshold,
-            metadata_condition,
-        )
+        # 无元数据过滤时，优先使用热点知识库的内存向量索引
+        limit = RerankCandidate.get_limit(top_k) if self.retriever_config.is_rerank else get_parent_overfetch_limit(top_k)
+        documents = None
+        if not metadata_condition:
+            documents = await VectorIndexManager.search(
+                db, 
+                knowledge_base_id, 
+                query_vector, 
+                limit, 
+                None if self.retriever_config.is_rerank else score_threshold,
+                need_vector,
+            )
+        if documents is None:
+            documents = await select_vector_by_knowledge_base_id(
+                db, 
+                need_vector, 
+                knowledge_base_id, 
+                limit, 
+                list_to_pgvector_str(query_vector), 
+                None if self.retriever_config.is_rerank else score_threshold,
+                metadata_condition,
+                self.retriever_config.get_search_settings(limit),
+                self.retriever_config.vector_precision,
+                self.retriever_config.rescore_factor,
+            )
 
         # 根据是否有rerank，进行rerank
         if documents:
             if self.retriever_config.is_rerank:
+                candidates = RerankCandidate.truncate(documents, top_k)
                 documents, rerank_usage = await RerankProcessor.rerank(
                     reranker=self.reranker,
                     query=query,
-                    documents=documents,
+                    documents=candidates,
                     top_k=top_k,
                     score_threshold=score_threshold,
                 )
+                RerankCandidate.record(candidates, documents, top_k)
                 usage = add_usage_dict(usage, rerank_usage)
+            else:
+                # 按父段合并后截取top_k
+                documents = collapse_documents_by_parent(documents)[:top_k]
 
         return documents, usage
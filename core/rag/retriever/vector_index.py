@@ -0,0 +1,418 @@
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from pathlib import Path
+import asyncio
+import json
+import sys
+import time
+import traceback
+
+import numpy as np
+
+from config.config import get_config
+from core.rag.entities.document import Document
+from core.rag.retriever.retrieve_cache import RetrieveCache
+from core.rag.retriever.vector_snapshot import VectorSnapshot
+from core.rag.utils.sql_operation import select_vector_for_index, select_vector_fingerprint
+from logger import get_logger
+
+logger = get_logger('rag')
+
+_DEFAULT_SETTINGS = {
+    'vector_index_enable': False,
+    'vector_index_knowledge_base_ids': [],
+    'vector_index_hot_queries': 20,
+    'vector_index_max_mb': 512,
+    'vector_index_hnsw_threshold': 20000,
+    'vector_index_hnsw_ef': 64,
+    'vector_index_ttl': 600,
+    'vector_index_snapshot_dir': '',
+}
+# 统计热点知识库的时间窗口，单位秒
+_HOT_WINDOW = 60
+
+class KnowledgeBaseVectorIndex:
+    '''
+        单个知识库的内存向量索引
+        片段数小于 hnsw_threshold 时使用NumPy矩阵精确检索，否则使用HNSW近似检索（需安装hnswlib）
+        得分与SQL检索一致，为余弦相似度
+    '''
+    def __init__(
+        self,
+        knowledge_base_id: int,
+        version: int,
+        document_ids: List[int],
+        contents: List[str],
+        contexts: List[str],
+        metadatas: List[str],
+        matrix: np.ndarray,
+        hnsw_threshold: int,
+        ttl: float,
+    ):
+        self.knowledge_base_id = knowledge_base_id
+        self.version = version
+        self.expire_time = time.monotonic() + ttl
+
+        self.document_ids = document_ids
+        self.contents = contents
+        self.contexts = contexts
+        # metadata保留原始json字符串，仅对命中的片段解析
+        self.metadatas = metadatas
+        self.matrix = matrix
+
+        norms = np.linalg.norm(self.matrix, axis=1)
+        # 零向量的余弦相似度无定义，得分置0
+        self.inv_norms = np.divide(1., norms, out=np.zeros_like(norms), where=norms > 0)
+
+        self.hnsw = None
+        count = len(self.contents)
+        if count and count >= hnsw_threshold:
+            try:
+                import hnswlib
+                self.hnsw = hnswlib.Index(space='cosine', dim=self.matrix.shape[1])
+                self.hnsw.init_index(max_elements=count, ef_construction=200, M=16)
+                self.hnsw.add_items(self.matrix, np.arange(count))
+            except ImportError:
+                logger.warning(f'hnswlib is not installed, knowledge base [{knowledge_base_id}] uses exact search.')
+
+        self.size = (
+            self.matrix.nbytes
+            + self.inv_norms.nbytes
+            + (self.matrix.nbytes if self.hnsw is not None else 0)
+            + sum(sys.getsizeof(x) for x in self.contents)
+            + sum(sys.getsizeof(x) for x in self.contexts)
+            + sum(sys.getsizeof(x) for x in self.metadatas)
+        )
+
+    @classmethod
+    def from_rows(
+        cls,
+        knowledge_base_id: int,
+        version: int,
+        rows: List[Any],
+        hnsw_threshold: int,
+        ttl: float,
+    ) -> 'KnowledgeBaseVectorIndex':
+        if rows:
+            matrix = np.stack([
+                np.fromstring(row['vector'].strip('[]'), sep=',', dtype=np.float32) for row in rows
+            ])
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+
+        return cls(
+            knowledge_base_id=knowledge_base_id,
+            version=version,
+            document_ids=[row['document_id'] for row in rows],
+            contents=[row['retrieve_content'] for row in rows],
+            contexts=[row['context_content'] for row in rows],
+            metadatas=[row['metadata'] for row in rows],
+            matrix=matrix,
+            hnsw_threshold=hnsw_threshold,
+            ttl=ttl,
+        )
+
+    @classmethod
+    def from_snapshot(
+        cls,
+        snapshot: VectorSnapshot,
+        version: int,
+        hnsw_threshold: int,
+        ttl: float,
+    ) -> 'KnowledgeBaseVectorIndex':
+        contents, contexts, metadatas = [], [], []
+        for chunk in snapshot.iter_chunks():
+            contents.append(chunk['retrieve_content'])
+            contexts.append(chunk['context_content'])
+            metadatas.append(chunk['metadata'])
+
+        # float32快照直接使用内存映射，float16快照需转换为float32
+        matrix = snapshot.vectors
+        if matrix.dtype != np.float32:
+            matrix = matrix.astype(np.float32)
+
+        return cls(
+            knowledge_base_id=snapshot.knowledge_base_id,
+            version=version,
+            document_ids=snapshot.document_ids.tolist(),
+            contents=contents,
+            contexts=contexts,
+            metadatas=metadatas,
+            matrix=matrix,
+            hnsw_threshold=hnsw_threshold,
+            ttl=ttl,
+        )
+
+    def search(
+        self,
+        query_vector: List[float],
+        limit: int,
+        score_threshold: Optional[float],
+        need_vector: bool,
+        hnsw_ef: int,
+    ) -> Optional[List[Document]]:
+        '''
+            返回None表示无法使用内存索引检索（如向量维度不一致），需回退到SQL检索
+        '''
+        count = len(self.contents)
+        if count == 0:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query.shape[0] != self.matrix.shape[1] or query_norm == 0:
+            return None
+
+        k = min(limit, count)
+        if self.hnsw is not None:
+            self.hnsw.set_ef(max(hnsw_ef, k))
+            labels, distances = self.hnsw.knn_query(query, k=k)
+            indices = labels[0]
+            scores = 1. - distances[0]
+        else:
+            all_scores = (self.matrix @ query) * self.inv_norms / query_norm
+            indices = np.argpartition(-all_scores, k - 1)[:k]
+            indices = indices[np.argsort(-all_scores[indices])]
+            scores = all_scores[indices]
+
+        documents = []
+        for i, score in zip(indices.tolist(), scores.tolist()):
+            if score_threshold and score < score_threshold:
+                continue
+            try:
+                document = Document(
+                    page_content=self.contents[i],
+                    vector=self.matrix[i].tolist() if need_vector else None,
+                    metadata=json.loads(self.metadatas[i]),
+                )
+            except Exception:
+                logger.warning(f'Ignore record: {self.document_ids[i]} for:\n{traceback.format_exc()}')
+                continue
+            document.metadata["score"] = score if score >= 0 else 0.0
+            document.metadata["context_content"] = self.contexts[i]
+            document.metadata["document_id"] = self.document_ids[i]
+            document.metadata["knowledge_base_id"] = self.knowledge_base_id
+            documents.append(document)
+
+        return documents
+
+class VectorIndexManager:
+    '''
+        热点知识库的内存向量索引，向量检索时先于SQL检索使用
+        - 配置的知识库（server.vector_index_knowledge_base_ids）或每分钟检索次数达到 server.vector_index_hot_queries 的知识库，
+          在后台从 knowledge_base_doc_vector 加载索引，加载完成前仍使用SQL检索
+        - 索引记录加载时 RetrieveCache 的知识库版本号，写入路径使版本号变化后索引失效并重新加载；
+          本服务之外的数据变更（如文档启用/禁用）通过 RetrieveCacheInvalidate 接口递增版本号，server.vector_index_ttl 用于兜底
+        - 所有知识库的索引共享内存上限 server.vector_index_max_mb，超出时淘汰最久未使用的索引
+        - 带元数据过滤的检索不使用内存索引
+    '''
+    _indexes: 'OrderedDict[int, KnowledgeBaseVectorIndex]' = OrderedDict()
+    _loading: Dict[int, asyncio.Task] = {}
+    # 超出内存上限无法加载的知识库及其版本号，版本号变化前不再尝试加载
+    _oversized: Dict[int, int] = {}
+    _query_windows: Dict[int, Tuple[float, int]] = {}
+    _size = 0
+
+    _metrics = {
+        'hits': 0,
+        'misses': 0,
+        'loads': 0,
+        'load_failures': 0,
+        'evictions': 0,
+    }
+
+    @classmethod
+    def _get_settings(cls) -> Dict:
+        server_config = get_config().get('server', {})
+        return {key: server_config.get(key, default) for key, default in _DEFAULT_SETTINGS.items()}
+
+    @classmethod
+    async def search(
+        cls,
+        db,
+        knowledge_base_id: int,
+        query_vector: List[float],
+        limit: int,
+        score_threshold: Optional[float] = None,
+        need_vector: bool = False,
+    ) -> Optional[List[Document]]:
+        '''
+            返回None表示该知识库当前没有可用的内存索引，需使用SQL检索
+        '''
+        settings = cls._get_settings()
+        if not settings['vector_index_enable']:
+            return None
+
+        is_hot = cls._record_query(knowledge_base_id, settings)
+
+        index = cls._indexes.get(knowledge_base_id)
+        if index is not None:
+            if index.version == RetrieveCache.get_version(knowledge_base_id) and index.expire_time >= time.monotonic():
+                documents = index.search(
+                    query_vector,
+                    limit,
+                    score_threshold,
+                    need_vector,
+                    settings['vector_index_hnsw_ef'],
+                )
+                if documents is not None:
+                    cls._indexes.move_to_end(knowledge_base_id)
+                    cls._metrics['hits'] += 1
+                    return documents
+            else:
+                cls._remove(knowledge_base_id)
+
+        cls._metrics['misses'] += 1
+        if is_hot:
+            cls._schedule_load(db, knowledge_base_id, settings)
+        return None
+
+    @classmethod
+    def _record_query(cls, knowledge_base_id: int, settings: Dict) -> bool:
+        if knowledge_base_id in settings['vector_index_knowledge_base_ids']:
+            return True
+
+        now = time.monotonic()
+        window_start, count = cls._query_windows.get(knowledge_base_id, (now, 0))
+        if now - window_start > _HOT_WINDOW:
+            window_start, count = now, 0
+        count += 1
+        cls._query_windows[knowledge_base_id] = (window_start, count)
+        return count >= settings['vector_index_hot_queries']
+
+    @classmethod
+    def _schedule_load(cls, db, knowledge_base_id: int, settings: Dict):
+        if knowledge_base_id in cls._loading:
+            return
+        if cls._oversized.get(knowledge_base_id) == RetrieveCache.get_version(knowledge_base_id):
+            return
+
+        task = asyncio.create_task(cls._load(db, knowledge_base_id, settings))
+        cls._loading[knowledge_base_id] = task
+        task.add_done_callback(lambda _: cls._loading.pop(knowledge_base_id, None))
+
+    @classmethod
+    async def _load(cls, db, knowledge_base_id: int, settings: Dict):
+        try:
+            version = RetrieveCache.get_version(knowledge_base_id)
+            # 构建索引为CPU密集操作，不在事件循环中执行
+            loop = asyncio.get_running_loop()
+
+            index = None
+            snapshot_path = None
+            if settings['vector_index_snapshot_dir']:
+                snapshot_path = Path(settings['vector_index_snapshot_dir']) / str(knowledge_base_id)
+                index = await cls._load_from_snapshot(db, knowledge_base_id, version, snapshot_path, settings)
+
+            if index is None:
+                rows = await select_vector_for_index(db, knowledge_base_id)
+                index = await loop.run_in_executor(
+                    None,
+                    KnowledgeBaseVectorIndex.from_rows,
+                    knowledge_base_id,
+                    version,
+                    rows,
+                    settings['vector_index_hnsw_threshold'],
+                    settings['vector_index_ttl'],
+                )
+
+                # 写入快照，下次加载时直接使用
+                if snapshot_path is not None:
+                    try:
+                        await loop.run_in_executor(None, VectorSnapshot.write, snapshot_path, knowledge_base_id, rows)
+                    except Exception:
+                        logger.warning(f'Fail to write vector snapshot of knowledge base [{knowledge_base_id}] for:\n{traceback.format_exc()}')
+        except Exception:
+            cls._metrics['load_failures'] += 1
+            logger.error(f'Fail to load vector index of knowledge base [{knowledge_base_id}] for:\n{traceback.format_exc()}')
+            return
+
+        # 加载期间知识库发生变更，丢弃本次结果，下次检索时重新加载
+        if version != RetrieveCache.get_version(knowledge_base_id):
+            return
+
+        max_bytes = settings['vector_index_max_mb'] * 1024 * 1024
+        if index.size > max_bytes:
+            cls._oversized[knowledge_base_id] = version
+            logger.warning(f'Vector index of knowledge base [{knowledge_base_id}] exceeds memory limit, size: {index.size}.')
+            return
+
+        cls._remove(knowledge_base_id)
+        cls._indexes[knowledge_base_id] = index
+        cls._size += index.size
+        cls._metrics['loads'] += 1
+        logger.info(f'Load vector index of knowledge base [{knowledge_base_id}], chunks: {len(index.contents)}, size: {index.size}.')
+
+        while cls._size > max_bytes and cls._indexes:
+            oldest_knowledge_base_id = next(iter(cls._indexes))
+            cls._remove(oldest_knowledge_base_id)
+            cls._metrics['evictions'] += 1
+
+    @classmethod
+    async def _load_from_snapshot(
+        cls,
+        db,
+        knowledge_base_id: int,
+        version: int,
+        snapshot_path: Path,
+        settings: Dict,
+    ) -> Optional[KnowledgeBaseVectorIndex]:
+        '''
+            快照存在且指纹与数据库一致时，由快照构建索引，否则返回None
+        '''
+        if not (snapshot_path / 'manifest.json').exists():
+            return None
+
+        try:
+            snapshot = VectorSnapshot.read(snapshot_path)
+        except Exception:
+            logger.warning(f'Fail to read vector snapshot of knowledge base [{knowledge_base_id}] for:\n{traceback.format_exc()}')
+            return None
+
+        count, fingerprint = await select_vector_fingerprint(db, knowledge_base_id)
+        if count != snapshot.count or fingerprint != snapshot.fingerprint:
+            logger.info(f'Vector snapshot of knowledge base [{knowledge_base_id}] is outdated.')
+            return None
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None,
+            KnowledgeBaseVectorIndex.from_snapshot,
+            snapshot,
+            version,
+            settings['vector_index_hnsw_threshold'],
+            settings['vector_index_ttl'],
+        )
+
+    @classmethod
+    def warm_up(cls, db):
+        '''
+            服务启动时，在后台加载配置的知识库索引
+        '''
+        settings = cls._get_settings()
+        if not settings['vector_index_enable']:
+            return
+        for knowledge_base_id in settings['vector_index_knowledge_base_ids']:
+            cls._schedule_load(db, knowledge_base_id, settings)
+
+    @classmethod
+    def _remove(cls, knowledge_base_id: int):
+        index = cls._indexes.pop(knowledge_base_id, None)
+        if index is not None:
+            cls._size -= index.size
+
+    @classmethod
+    def get_metrics(cls) -> Dict:
+        metrics = dict(cls._metrics)
+        lookups = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = metrics['hits'] / lookups if lookups else 0.
+        metrics['indexes'] = {
+            knowledge_base_id: {
+                'chunks': len(index.contents),
+                'size_bytes': index.size,
+                'type': 'hnsw' if index.hnsw is not None else 'exact',
+            }
+            for knowledge_base_id, index in cls._indexes.items()
+        }
+        metrics['size_bytes'] = cls._size
+        return metrics
@@ -0,0 +1,294 @@
+'''
+    知识库向量快照
+
+    目录结构：
+        {snapshot_path}/
+            manifest.json       知识库id、片段数、维度、精度、指纹等
+            ids.npy             片段id（knowledge_base_doc_vector.id），int64
+            document_ids.npy    文档id，int64
+            vectors.npy         向量，float32 或 float16
+            chunks.jsonl        每行一个片段：retrieve_content、context_content、metadata
+
+    读取时以 mmap 方式打开 .npy 文件，不复制数据；
+    指纹由片段id、content_hash 及向量、context_content、metadata 的摘要计算，
+    与数据库中的 SQL_EXPRESSION_VECTOR_FINGERPRINT 一致时快照可直接使用；
+    重建向量（更换嵌入模型）或增量解析保留片段但更新了上下文、元数据时，指纹随之变化
+
+    命令行：
+        导出：python -m core.rag.retriever.vector_snapshot export -c ./config/config.json -k 1 -o ./snapshots/1
+        基准：python -m core.rag.retriever.vector_snapshot benchmark -s ./snapshots/1 [-q queries.npy] [-t 10]
+'''
+
+from typing import Any, Dict, Iterator, List, Optional
+from pathlib import Path
+import argparse
+import asyncio
+import hashlib
+import json
+import shutil
+import time
+
+import numpy as np
+
+from core.rag.utils.sql_operation import select_vector_for_index
+
+SNAPSHOT_FORMAT_VERSION = 2
+SNAPSHOT_DTYPES = ('float32', 'float16')
+
+def _row_digest(row: Any) -> str:
+    raw = f'{row["vector"] or ""}:{row["context_content"] or ""}:{row["metadata"] or ""}'
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+def compute_fingerprint(rows: List[Any]) -> str:
+    '''
+        与 SQL_EXPRESSION_VECTOR_FINGERPRINT 的计算方式一致，rows需按片段id升序，
+        vector、metadata 为数据库返回的文本形式
+    '''
+    raw = ','.join(f'{row["id"]}:{row["content_hash"] or ""}:{_row_digest(row)}' for row in rows)
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+class VectorSnapshot:
+    def __init__(
+        self,
+        path: Path,
+        manifest: Dict,
+        ids: np.ndarray,
+        document_ids: np.ndarray,
+        vectors: np.ndarray,
+    ):
+        self.path = path
+        self.manifest = manifest
+        self.ids = ids
+        self.document_ids = document_ids
+        self.vectors = vectors
+
+    @property
+    def knowledge_base_id(self) -> int:
+        return self.manifest['knowledge_base_id']
+
+    @property
+    def count(self) -> int:
+        return self.manifest['count']
+
+    @property
+    def fingerprint(self) -> str:
+        return self.manifest['fingerprint']
+
+    def iter_chunks(self) -> Iterator[Dict]:
+        with open(self.path / 'chunks.jsonl', 'r', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    @classmethod
+    def read(cls, path: Path, mmap: bool = True) -> 'VectorSnapshot':
+        path = Path(path)
+        with open(path / 'manifest.json', 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f'Unsupported snapshot format version: {manifest.get("format_version")}')
+
+        mmap_mode = 'r' if mmap else None
+        return cls(
+            path=path,
+            manifest=manifest,
+            ids=np.load(path / 'ids.npy', mmap_mode=mmap_mode),
+            document_ids=np.load(path / 'document_ids.npy', mmap_mode=mmap_mode),
+            vectors=np.load(path / 'vectors.npy', mmap_mode=mmap_mode),
+        )
+
+    @classmethod
+    def write(
+        cls,
+        path: Path,
+        knowledge_base_id: int,
+        rows: List[Any],
+        dtype: str = 'float32',
+    ) -> 'VectorSnapshot':
+        '''
+            rows: select_vector_for_index 的查询结果，按片段id升序
+            先写入临时目录再重命名，读取方不会看到写了一半的快照
+        '''
+        if dtype not in SNAPSHOT_DTYPES:
+            raise ValueError(f'Unsupported snapshot dtype: {dtype}')
+
+        path = Path(path)
+        tmp_path = path.with_name(f'.{path.name}.tmp')
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tmp_path.mkdir(parents=True)
+
+        ids = np.array([row['id'] for row in rows], dtype=np.int64)
+        document_ids = np.array([row['document_id'] for row in rows], dtype=np.int64)
+        if rows:
+            vectors = np.stack([
+                np.fromstring(row['vector'].strip('[]'), sep=',', dtype=np.float32) for row in rows
+            ]).astype(dtype)
+        else:
+            vectors = np.zeros((0, 0), dtype=dtype)
+
+        np.save(tmp_path / 'ids.npy', ids)
+        np.save(tmp_path / 'document_ids.npy', document_ids)
+        np.save(tmp_path / 'vectors.npy', vectors)
+        with open(tmp_path / 'chunks.jsonl', 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps({
+                    'retrieve_content': row['retrieve_content'],
+                    'context_content': row['context_content'],
+                    'metadata': row['metadata'],
+                }, ensure_ascii=False))
+                f.write('\n')
+
+        manifest = {
+            'format_version': SNAPSHOT_FORMAT_VERSION,
+            'knowledge_base_id': knowledge_base_id,
+            'count': len(rows),
+            'dim': int(vectors.shape[1]) if rows else 0,
+            'dtype': dtype,
+            'fingerprint': compute_fingerprint(rows),
+            'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        with open(tmp_path / 'manifest.json', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4)
+
+        if path.exists():
+            shutil.rmtree(path)
+        tmp_path.rename(path)
+
+        return cls.read(path)
+
+async def export_vector_snapshot(db, knowledge_base_id: int, path: Path, dtype: str = 'float32') -> VectorSnapshot:
+    rows = await select_vector_for_index(db, knowledge_base_id)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, VectorSnapshot.write, path, knowledge_base_id, rows, dtype)
+
+def benchmark_vector_snapshot(
+    snapshot: VectorSnapshot,
+    queries: Optional[np.ndarray] = None,
+    top_k: int = 10,
+    query_count: int = 100,
+    hnsw_ef: int = 64,
+    rescore_factor: int = 4,
+) -> Dict:
+    '''
+        基于快照离线评估检索：
+            - 精确检索耗时
+            - halfvec / bit 低精度召回 top_k * rescore_factor 条候选、再以原始精度重新排序的耗时与召回率
+              （以NumPy模拟，召回率与数据库一致，耗时仅供参考，NumPy的float16运算较慢）
+            - HNSW（需安装hnswlib）的构建耗时、检索耗时与召回率
+        未指定queries时，从快照向量中抽样作为查询
+    '''
+    vectors = np.asarray(snapshot.vectors, dtype=np.float32)
+    if len(vectors) == 0:
+        raise ValueError('Empty snapshot.')
+    if queries is None:
+        rng = np.random.default_rng(0)
+        queries = vectors[rng.choice(len(vectors), size=min(query_count, len(vectors)), replace=False)]
+    queries = np.asarray(queries, dtype=np.float32)
+    k = min(top_k, len(vectors))
+
+    norms = np.linalg.norm(vectors, axis=1)
+    inv_norms = np.divide(1., norms, out=np.zeros_like(norms), where=norms > 0)
+
+    start_time = time.perf_counter()
+    exact_results = []
+    for query in queries:
+        scores = (vectors @ query) * inv_norms
+        indices = np.argpartition(-scores, k - 1)[:k]
+        exact_results.append(set(indices.tolist()))
+    exact_time = time.perf_counter() - start_time
+
+    result = {
+        'count': len(vectors),
+        'dim': vectors.shape[1],
+        'queries': len(queries),
+        'top_k': k,
+        'exact_latency_ms': exact_time / len(queries) * 1000,
+    }
+
+    # 低精度召回候选后，以原始精度重新排序
+    candidate_count = min(k * rescore_factor, len(vectors))
+    half_vectors = vectors.astype(np.float16)
+    half_inv_norms = inv_norms.astype(np.float16)
+    bit_vectors = np.packbits(vectors > 0, axis=1)
+    quantized_scorers = {
+        'halfvec': lambda query: (half_vectors @ query.astype(np.float16)) * half_inv_norms,
+        # 汉明距离越小越相似
+        'bit': lambda query: -np.unpackbits(bit_vectors ^ np.packbits(query > 0), axis=1).sum(axis=1),
+    }
+    for precision, scorer in quantized_scorers.items():
+        start_time = time.perf_counter()
+        hits = 0
+        for query, exact in zip(queries, exact_results):
+            quantized_scores = scorer(query)
+            candidates = np.argpartition(-quantized_scores, candidate_count - 1)[:candidate_count]
+            scores = (vectors[candidates] @ query) * inv_norms[candidates]
+            indices = candidates[np.argpartition(-scores, k - 1)[:k]]
+            hits += len(exact & set(indices.tolist()))
+        result[f'{precision}_latency_ms'] = (time.perf_counter() - start_time) / len(queries) * 1000
+        result[f'{precision}_recall'] = hits / (k * len(queries))
+
+    try:
+        import hnswlib
+    except ImportError:
+        return result
+
+    start_time = time.perf_counter()
+    index = hnswlib.Index(space='cosine', dim=vectors.shape[1])
+    index.init_index(max_elements=len(vectors), ef_construction=200, M=16)
+    index.add_items(vectors, np.arange(len(vectors)))
+    result['hnsw_build_s'] = time.perf_counter() - start_time
+
+    index.set_ef(max(hnsw_ef, k))
+    start_time = time.perf_counter()
+    hits = 0
+    for query, exact in zip(queries, exact_results):
+        labels, _ = index.knn_query(query, k=k)
+        hits += len(exact & set(labels[0].tolist()))
+    result['hnsw_latency_ms'] = (time.perf_counter() - start_time) / len(queries) * 1000
+    result['hnsw_recall'] = hits / (k * len(queries))
+
+    return result
+
+async def _export(config_path: str, knowledge_base_id: int, path: str, dtype: str):
+    from config.config import init_config, get_config
+    from core.database.database_factory import DatabaseFactory
+
+    init_config(config_path)
+    database_info = get_config()['dependent_info']['database']
+    db = DatabaseFactory.get_database(database_info['type'])
+    await db.connect(**database_info)
+    try:
+        snapshot = await export_vector_snapshot(db, knowledge_base_id, Path(path), dtype)
+        print(json.dumps(snapshot.manifest, ensure_ascii=False, indent=4))
+    finally:
+        await db.disconnect()
+
+def main():
+    parser = argparse.ArgumentParser(description='Knowledge base vector snapshot.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Export vectors of a knowledge base from database.')
+    export_parser.add_argument('-c', '--config_path', type=str, default='./config/config.json')
+    export_parser.add_argument('-k', '--knowledge_base_id', type=int, required=True)
+    export_parser.add_argument('-o', '--output', type=str, required=True)
+    export_parser.add_argument('-d', '--dtype', type=str, default='float32', choices=SNAPSHOT_DTYPES)
+
+    benchmark_parser = subparsers.add_parser('benchmark', help='Benchmark retrieval on a snapshot without database.')
+    benchmark_parser.add_argument('-s', '--snapshot', type=str, required=True)
+    benchmark_parser.add_argument('-q', '--queries', type=str, default=None, help='Query vectors in .npy, sampled from snapshot if not set.')
+    benchmark_parser.add_argument('-t', '--top_k', type=int, default=10)
+    benchmark_parser.add_argument('-n', '--query_count', type=int, default=100)
+    benchmark_parser.add_argument('-e', '--hnsw_ef', type=int, default=64)
+    benchmark_parser.add_argument('-r', '--rescore_factor', type=int, default=4)
+
+    args = parser.parse_args()
+    if args.command == 'export':
+        asyncio.run(_export(args.config_path, args.knowledge_base_id, args.output, args.dtype))
+    elif args.command == 'benchmark':
+        snapshot = VectorSnapshot.read(Path(args.snapshot))
+        queries = np.load(args.queries) if args.queries else None
+        result = benchmark_vector_snapshot(snapshot, queries, args.top_k, args.query_count, args.hnsw_ef, args.rescore_factor)
+        print(json.dumps(result, indent=4))
+
+if __name__ == '__main__':
+    main()
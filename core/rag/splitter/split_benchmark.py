@@ -0,0 +1,108 @@
+'''
+    分段基准：在生成的样本文本上测试 split_text_chunks（BaseSplitter._split_chunks）的吞吐与内存分配
+
+    命令行：
+        python -m core.rag.splitter.split_benchmark [-s 10] [-n 3]
+
+    样本为指定大小（MB）的中英文混合文本，含markdown图片与超链接，按1M字符分为多个文档；
+    分别测试普通分段（单层切分）与父子分段（父段切分后逐个切分子段）：
+        seconds / mb_per_second: 多次运行中最快一次的耗时与吞吐
+        peak_mb: 切分过程中的内存峰值（tracemalloc，单独运行一次）
+        gc_gen0_collections: 切分过程中0代垃圾回收次数，反映容器对象的分配量
+'''
+
+from typing import Callable, Dict, List
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from core.rag.entities.document import Document
+from core.rag.splitter.splitter_base import split_text_chunks
+from core.rag.utils.rag_utils import len_without_link
+
+_DOCUMENT_SIZE = 1024 * 1024
+_WORDS = [
+    '知识库', '检索增强生成', '向量', '分段。', '文本切分！', 'retrieval', 'augmented ', 'generation. ',
+    'the quick brown fox ', 'jumps over the lazy dog. ', '，', '；', '\n', '\n\n',
+    '[文档](https://example.com/docs/page_1)', '![图片](https://example.com/images/0123456789abcdef.png)',
+]
+
+def generate_text(size: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        word = rng.choice(_WORDS)
+        parts.append(word)
+        length += len(word.encode('utf-8'))
+    return ''.join(parts)
+
+def _split_normal(texts: List[str]) -> int:
+    documents = [Document(page_content=text, metadata={'source': 'benchmark', 'page': i}) for i, text in enumerate(texts)]
+    return len(split_text_chunks(
+        documents, len_without_link, '\\n\\n', 500, 50,
+    ))
+
+def _split_paragraph(texts: List[str]) -> int:
+    documents = [Document(page_content=text, metadata={'source': 'benchmark', 'page': i}) for i, text in enumerate(texts)]
+    father_documents = split_text_chunks(
+        documents, len_without_link, '\\n\\n', 1000, 0, pic_insert_lf=False,
+    )
+    count = 0
+    for father_document in father_documents:
+        count += len(split_text_chunks(
+            [Document(page_content=father_document.page_content, metadata=father_document.metadata)],
+            len_without_link, '\\n', 200, 20, child=True,
+        ))
+    return count
+
+def _measure(func: Callable[[List[str]], int], texts: List[str], repeat: int) -> Dict:
+    size_mb = sum(len(text.encode('utf-8')) for text in texts) / 1024 / 1024
+
+    elapsed = []
+    collections = []
+    for _ in range(repeat):
+        gc.collect()
+        gen0 = gc.get_stats()[0]['collections']
+        start_time = time.perf_counter()
+        chunks = func(texts)
+        elapsed.append(time.perf_counter() - start_time)
+        collections.append(gc.get_stats()[0]['collections'] - gen0)
+
+    gc.collect()
+    tracemalloc.start()
+    func(texts)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'chunks': chunks,
+        'seconds': min(elapsed),
+        'mb_per_second': size_mb / min(elapsed),
+        'peak_mb': peak / 1024 / 1024,
+        'gc_gen0_collections': min(collections),
+    }
+
+def benchmark_split(size_mb: float, repeat: int = 3) -> Dict:
+    text = generate_text(int(size_mb * 1024 * 1024))
+    texts = [text[i: i + _DOCUMENT_SIZE] for i in range(0, len(text), _DOCUMENT_SIZE)]
+    return {
+        'size_mb': size_mb,
+        'documents': len(texts),
+        'normal': _measure(_split_normal, texts, repeat),
+        'paragraph': _measure(_split_paragraph, texts, repeat),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark split_text_chunks throughput and allocations.')
+    parser.add_argument('-s', '--size_mb', type=float, default=10, help='Size of the generated text in MB.')
+    parser.add_argument('-n', '--repeat', type=int, default=3, help='Runs per case, the fastest is reported.')
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark_split(args.size_mb, args.repeat), ensure_ascii=False, indent=4))
+
+if __name__ == '__main__':
+    main()
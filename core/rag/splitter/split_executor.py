@@ -0,0 +1,138 @@
+from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import threading
+import asyncio
+
+from config.config import get_config
+from core.rag.entities.document import Document
+from core.rag.splitter.splitter_base import split_text_chunks
+from core.rag.utils.rag_utils import get_text_id, get_text_hash, len_without_link, extract_keywords
+from logger import get_logger
+
+logger = get_logger('rag')
+
+_DEFAULT_EXECUTOR_WORKERS = 4
+_DEFAULT_BATCH_CHARS = 200000
+_DEFAULT_OFF_LOOP = False
+
+def split_children(
+    father_documents: List[Document],
+    length_function: Callable[[str], int],
+    sonchunk_setting: Dict,
+) -> List[Document]:
+    '''
+        将父段切分为子段，并计算父段与子段的content_id、content_hash、content_len、keywords
+        父段的page_content更新为子段的拼接，在进程池中执行时参数与结果需可被pickle
+    '''
+    for father_document in father_documents:
+        father_document.children = split_text_chunks(
+            documents=[Document(page_content=father_document.page_content, metadata=father_document.metadata)],
+            length_function=length_function,
+            pic_insert_lf=True,
+            **sonchunk_setting,
+        )
+
+        # 更新 father_document的page_content
+        father_document.page_content = ''.join([child.page_content for child in father_document.children])
+
+        father_document.metadata['content_id'] = get_text_id(father_document.page_content)
+        father_document.metadata['content_hash'] = get_text_hash(father_document.page_content)
+        father_document.metadata['content_len'] = len_without_link(father_document.page_content)
+        for child in father_document.children:
+            child.metadata['content_id'] = get_text_id(child.page_content)
+            child.metadata['content_hash'] = get_text_hash(child.page_content)
+            child.metadata['content_len'] = len_without_link(child.page_content)
+            child.metadata['keywords'] = extract_keywords(child.page_content)
+
+    return father_documents
+
+class SplitExecutor:
+    '''
+        分段中CPU密集部分的执行器
+        - 父子分段时，父段按顺序分批（每批约 split_batch_chars 个字符）提交到进程池切分子段、计算哈希，
+          结果按提交顺序合并，与顺序执行的输出一致；只有一批时不使用进程池
+        - split_off_loop 为true时，不使用进程池的分段计算在线程池中执行，避免阻塞事件循环
+        配置：
+            server.split_executor_workers: 进程池大小，为0或1时不使用进程池，首次使用时创建
+            server.split_batch_chars: 每批父段的字符数
+            server.split_off_loop: 是否在线程池中执行分段计算
+    '''
+    _executor: Optional[ProcessPoolExecutor] = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_workers(cls) -> int:
+        return get_config().get('server', {}).get('split_executor_workers', _DEFAULT_EXECUTOR_WORKERS)
+
+    @classmethod
+    def get_executor(cls) -> ProcessPoolExecutor:
+        if cls._executor is None:
+            with cls._lock:
+                if cls._executor is None:
+                    executor_workers = cls.get_workers()
+                    # 服务进程中已有多个线程，使用spawn避免fork带来的锁状态问题
+                    cls._executor = ProcessPoolExecutor(
+                        max_workers=executor_workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                    )
+                    logger.info(f'Init split executor with size({executor_workers}).')
+        return cls._executor
+
+    @classmethod
+    async def run(cls, func: Callable, *args) -> Any:
+        '''
+            执行同步的分段计算，server.split_off_loop 为true时在线程池中执行
+        '''
+        if get_config().get('server', {}).get('split_off_loop', _DEFAULT_OFF_LOOP):
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+        return func(*args)
+
+    @staticmethod
+    def _make_batches(father_documents: List[Document], batch_chars: int) -> List[List[Document]]:
+        batches = []
+        batch = []
+        chars = 0
+        for father_document in father_documents:
+            batch.append(father_document)
+            chars += len(father_document.page_content)
+            if chars >= batch_chars:
+                batches.append(batch)
+                batch = []
+                chars = 0
+        if batch:
+            batches.append(batch)
+        return batches
+
+    @classmethod
+    async def split_children(
+        cls,
+        father_documents: List[Document],
+        length_function: Callable[[str], int],
+        sonchunk_setting: Dict,
+    ) -> List[Document]:
+        '''
+            切分子段并计算哈希，返回的父段按原顺序排列（使用进程池时为新的Document实例）
+            length_function需可被pickle（如len、len_without_link）
+        '''
+        batch_chars = max(get_config().get('server', {}).get('split_batch_chars', _DEFAULT_BATCH_CHARS), 1)
+        batches = cls._make_batches(father_documents, batch_chars)
+
+        if cls.get_workers() <= 1 or len(batches) <= 1:
+            return await cls.run(split_children, father_documents, length_function, sonchunk_setting)
+
+        loop = asyncio.get_running_loop()
+        executor = cls.get_executor()
+        results = await asyncio.gather(*[
+            loop.run_in_executor(executor, split_children, batch, length_function, sonchunk_setting)
+            for batch in batches
+        ])
+        logger.debug(f'Split {len(father_documents)} father chunks in {len(batches)} batches.')
+        return [father_document for batch in results for father_document in batch]
+
+    @classmethod
+    def shutdown(cls):
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=True)
+                cls._executor = None
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import List, Callable
-import copy
+from typing import List, Callable, Tuple
+from functools import lru_cache
 import re
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -8,12 +8,128 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 from core.rag.entities.document import Document, ChildDocument
 from core.rag.utils.rag_utils import escape_text, remove_leading_symbols
 
+# markdown图片链接、超链接，切分前替换为占位符，避免链接被切断
+_MARKDOWN_IMAGE_PATTERN = re.compile(r'(!\[.*?\]\(https?://[^\s)]+\))')
+_MARKDOWN_HYPERLINK_PATTERN = re.compile(r'\[(.*?)\]\((https?://[^\s)]+)\)')
+_PLACEHOLDER_PATTERN = re.compile(r'Markdown(Image|Hyperlink)(\d+)Url')
+_MULTI_LF_PATTERN = re.compile(r'\n{2,}')
+_SEPARATORS = ["\n\n", "。", ". ", " ", ""]
+
+@lru_cache(maxsize=64)
+def _get_text_splitter(chunk_size: int, chunk_overlap: int, length_function: Callable[[str], int]) -> RecursiveCharacterTextSplitter:
+    '''
+        切分器无状态，相同参数复用同一实例
+    '''
+    return RecursiveCharacterTextSplitter(
+        separators=_SEPARATORS,
+        keep_separator='end',
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=length_function,
+    )
+
+def _replace_links(text: str, image_placeholders: List[str], hyperlink_placeholders: List[str]) -> str:
+    '''
+        将图片链接替换为 MarkdownImage{i}Url，超链接的url替换为 MarkdownHyperlink{i}Url
+    '''
+    if '[' not in text:
+        return text
+
+    def replace_with_image_placeholder(match):
+        image_placeholders.append(match.group(1))
+        return f"MarkdownImage{len(image_placeholders) - 1}Url"
+
+    def replace_with_hyperlink_placeholder(match):
+        hyperlink_placeholders.append(match.group(2))
+        return f"[{match.group(1)}](MarkdownHyperlink{len(hyperlink_placeholders) - 1}Url)"
+
+    text = _MARKDOWN_IMAGE_PATTERN.sub(replace_with_image_placeholder, text)
+    return _MARKDOWN_HYPERLINK_PATTERN.sub(replace_with_hyperlink_placeholder, text)
+
+def _recover_links(text: str, image_placeholders: List[str], hyperlink_placeholders: List[str], pic_insert_lf: bool) -> str:
+    '''
+        回插超链接与图片链接，pic_insert_lf 为True时在图片前后添加换行
+    '''
+    if 'Markdown' not in text:
+        return text
+
+    def recovery(match):
+        index = int(match.group(2))
+        if match.group(1) == 'Image':
+            if 0 <= index < len(image_placeholders):
+                return f'\n{image_placeholders[index]}\n' if pic_insert_lf else image_placeholders[index]
+        elif 0 <= index < len(hyperlink_placeholders):
+            return hyperlink_placeholders[index]
+        return match.group(0)
+
+    return _PLACEHOLDER_PATTERN.sub(recovery, text)
+
+def split_text_chunks(
+    documents: List[Document], 
+    length_function: Callable[[str], int], 
+    chunk_identifier: str, 
+    chunk_size: int, 
+    chunk_overlap: int = 0, 
+    child: bool = False, 
+    pic_insert_lf: bool = True,
+    **kwargs
+) -> List[Document]:
+    '''
+        使用langchain的简单通用切分，BaseSplitter与分段进程池（SplitExecutor）共用
+        - 切分结果的metadata为原document的metadata的浅拷贝，不再深拷贝整个document
+        - 正则预编译，langchain切分器按参数复用
+        - 会修改传入document的page_content（替换为链接占位符后的文本）
+        Args: 
+            child: 是否切分为子片段
+            pic_insert_lf: 是否需要在图片前后插入换行
+    '''
+    image_placeholders: List[str] = []
+    hyperlink_placeholders: List[str] = []
+    # 提取page_content中的markdown图片链接、超链接
+    for document in documents:
+        document.page_content = _replace_links(document.page_content, image_placeholders, hyperlink_placeholders)
+
+    # 未设置分段标识符时无切分结果
+    if not chunk_identifier:
+        return []
+
+    # 自定义切分 + langchain切分
+    chunk_identifier = escape_text(chunk_identifier)
+    splitter = _get_text_splitter(chunk_size, chunk_overlap, length_function)
+    pieces: List[Tuple[str, dict]] = []
+    for document in documents:
+        for page_content in document.page_content.split(chunk_identifier):
+            for text in splitter.split_text(page_content):
+                pieces.append((text, document.metadata))
+
+    document_class = ChildDocument if child else Document
+    final_documents = []
+    for text, metadata in pieces:
+        # 移除片段开头标点
+        if not child:
+            text = remove_leading_symbols(text)
+
+        # 回插超链接、图片链接
+        text = _recover_links(text, image_placeholders, hyperlink_placeholders, pic_insert_lf)
+        # 移除图片前后的换行位于片段首尾的情况
+        text = text.strip('\n')
+        # 将多个\n替换为\n
+        if '\n\n' in text:
+            text = _MULTI_LF_PATTERN.sub('\n', text)
+
+        # 清理page_content为空字符串的document
+        if text:
+            # 字段已确定，跳过pydantic校验
+            final_documents.append(document_class.model_construct(page_content=text, metadata=dict(metadata)))
+
+    return final_documents
+
 class BaseSplitter(ABC):
 
     @abstractmethod
     async def split_chunks(self, documents: List[Document]) -> List[Document]:
         raise NotImplementedError
-    
+
     def _split_chunks(
         self, 
         documents: List[Document], 
@@ -25,110 +141,6 @@ class BaseSplitter(ABC):
         pic_insert_lf: bool = True,
         **kwargs
     ) -> List[Document]:
-        '''
-            使用langchain的简单通用切分
-            Args: 
-                child: 是否切分为子片段
-                pic_insert_lf: 是否需要在图片前后插入换行
-        '''
-        # 提取page_content中的markdown图片链接
-        markdown_image_pattern = r'(!\[.*?\]\(https?://[^\s)]+\))'
-        image_placeholders: list[str] = []
-
-        def replace_with_image_placeholder(match, image_placeholders=image_placeholders):
-            url = match.group(1)
-            placeholder = f"MarkdownImage{len(image_placeholders)}Url"
-            image_placeholders.append(url)
-            return f"{placeholder}"
-        
-        for document in documents:
-            document.page_content = re.sub(markdown_image_pattern, replace_with_image_placeholder, document.page_content)
-
-        # 提取page_content中的超链接
-        markdown_hyperlink_pattern = r'\[(.*?)\]\((https?://[^\s)]+)\)'
-        hyperlink_placeholders: list[str] = []
-
-        def replace_with_hyperlink_placeholder(match, hyperlink_placeholders=hyperlink_placeholders):
-            label = match.group(1)
-            url = match.group(2)
-            placeholder = f"MarkdownHyperlink{len(hyperlink_placeholders)}Url"
-            hyperlink_placeholders.append(url)
-            return f"[{label}]({placeholder})"
-        
-        for document in documents:
-            document.page_content = re.sub(markdown_hyperlink_pattern, replace_with_hyperlink_placeholder, document.page_content)
-
-        # 自定义切分
-        new_documents = []
-        if chunk_identifier:
-            chunk_identifier = escape_text(chunk_identifier)
-            for document in documents:
-                page_content_list = document.page_content.split(chunk_identifier)
-                for page_content in page_content_list:
-                    new_document = copy.deepcopy(document)
-                    new_document.page_content = page_content
-                    new_documents.append(new_document)
-        
-        # langchain切分
-        splitter = RecursiveCharacterTextSplitter(
-            separators=["\n\n", "。", ". ", " ", ""],
-            keep_separator='end',
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=length_function,
+        return split_text_chunks(
+            documents, length_function, chunk_identifier, chunk_size, chunk_overlap, child, pic_insert_lf, **kwargs
         )
-
-        results = splitter.split_documents(new_documents)
-
-        # 移除片段开头标点
-        if not child:
-            for result in results:
-                result.page_content = remove_leading_symbols(result.page_content)
-
-        if not child:
-            # langchain_core.documents.Document -> core.rag.entities.document.Document
-            final_documents = [
-                Document(page_content=document.page_content, metadata=document.metadata) 
-                for document in results
-            ]
-        else:
-            # langchain_core.documents.Document -> core.rag.entities.document.ChildDocument
-            final_documents = [
-                ChildDocument(page_content=document.page_content, metadata=document.metadata) 
-                for document in results
-            ]
-
-        # 回插超链接
-        tag_hyperlink_pattern = r'MarkdownHyperlink(\d+)Url'
-        def recovery_hyperlink(match):
-            index = int(match.group(1))
-            if 0 <= index < len(hyperlink_placeholders):
-                return hyperlink_placeholders[index]
-            return match.group(0)
-
-        for final_document in final_documents:
-            final_document.page_content = re.sub(tag_hyperlink_pattern, recovery_hyperlink, final_document.page_content)
-
-        # 回插图片链接
-        tag_image_pattern = r'MarkdownImage(\d+)Url'
-        def recovery_image(match):
-            index = int(match.group(1))
-            if 0 <= index < len(image_placeholders):
-                # 注意此处在图片的前后添加换行
-                if pic_insert_lf:
-                    return f'\n{image_placeholders[index]}\n'
-                else:
-                    return f'{image_placeholders[index]}'
-            return match.group(0)
-
-        for final_document in final_documents:
-            final_document.page_content = re.sub(tag_image_pattern, recovery_image, final_document.page_content)
-            # 移除图片前后的换行位于片段首尾的情况
-            final_document.page_content = final_document.page_content.strip('\n')
-            # 将多个\n替换为\n
-            final_document.page_content = re.sub(r'\n{2,}', '\n', final_document.page_content)
-
-        # 清理page_content为空字符串的document
-        final_documents = [doc for doc in final_documents if doc.page_content]
-
-        return final_documents
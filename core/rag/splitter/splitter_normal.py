@@ -2,7 +2,8 @@ from typing import List, Callable
 
 from core.rag.entities.document import Document
 from core.rag.splitter.splitter_base import BaseSplitter
-from core.rag.utils.rag_utils import get_text_id, get_text_hash, len_without_link
+from core.rag.splitter.split_executor import SplitExecutor
+from core.rag.utils.rag_utils import get_text_id, get_text_hash, len_without_link, extract_keywords
 
 class NormalSplitter(BaseSplitter):
     def __init__(self, length_function: Callable[[str], int] = len, **kwargs):
@@ -13,6 +14,9 @@ class NormalSplitter(BaseSplitter):
         self.length_function = length_function
 
     async def split_chunks(self, documents: List[Document]) -> List[Document]:
+        return await SplitExecutor.run(self._split_and_hash, documents)
+
+    def _split_and_hash(self, documents: List[Document]) -> List[Document]:
         chunks = self._split_chunks(
             documents=documents,
             length_function=self.length_function,
@@ -24,6 +28,6 @@ class NormalSplitter(BaseSplitter):
             chunk.metadata['content_id'] = get_text_id(chunk.page_content)
             chunk.metadata['content_hash'] = get_text_hash(chunk.page_content)
             chunk.metadata['content_len'] = len_without_link(chunk.page_content)
+            chunk.metadata['keywords'] = extract_keywords(chunk.page_content)
 
         return chunks
-    
\ No newline at end of file
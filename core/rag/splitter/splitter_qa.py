@@ -8,7 +8,7 @@ from threading import Event
 
 from core.rag.entities.document import Document
 from core.rag.splitter.splitter_base import BaseSplitter
-from core.rag.utils.rag_utils import get_text_id, get_text_hash, len_without_link
+from core.rag.utils.rag_utils import get_text_id, get_text_hash, len_without_link, extract_keywords
 from core.generator.qa_generator.qa_generator import agenerate_qa
 from core.model.model_manager import ModelManager, ModelInstanceType
 from logger import get_logger
@@ -85,6 +85,7 @@ class QaSplitter(BaseSplitter):
                                 doc.metadata['content_id'] = get_text_id(doc.page_content)
                                 doc.metadata['content_hash'] = get_text_hash(doc.page_content)
                                 doc.metadata['content_len'] = len_without_link(doc.page_content)
+                                doc.metadata['keywords'] = extract_keywords(doc.page_content)
                                 doc.metadata['answer'] = qa.get('answer')
                                 doc.metadata['answer_len'] = len_without_link(qa.get('answer'))
                                 results[index].append(doc)
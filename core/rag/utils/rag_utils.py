@@ -1,10 +1,15 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple, Any
+from collections import defaultdict, deque
 from uuid import uuid4
 from hashlib import sha256
 import re
 
+import jieba.analyse
+
 from core.rag.entities.document import Document
 from core.rag.splitter.splitter_entities import SplitType
+from core.rag.data.jieba_stopwords import STOPWORDS
+from core.agent.base_utils import estimate_text_tokens
 
 def to_base36(num):
     chars = '0123456789abcdefghijklmnopqrstuvwxyz'
@@ -42,14 +47,18 @@ def escape_text(text: str) -> str:
 
     return output
 
+_MARKDOWN_IMAGE_PATTERN = re.compile(r'!\[.*?\]\(https?://[^\s)]+\)')
+_HYPERLINK_PATTERN = re.compile(r'\[(.*?)\]\((https?://[^\s)]+)\)')
+_LEADING_SYMBOLS_PATTERN = re.compile(r"^[\u2000-\u206F\u2E00-\u2E7F\u3000-\u303F!\"#$%&'()*+,./:;<=>?@^_`~]+")
+
 def len_without_link(obj: str) -> int:
-    markdown_image_pattern = r'!\[.*?\]\(https?://[^\s)]+\)'
-    hyperlink_image_pattern = r'\[(.*?)\]\((https?://[^\s)]+)\)'
-    return len(re.sub(hyperlink_image_pattern, r'\1', re.sub(markdown_image_pattern, '', obj)))
+    # 分段时作为长度函数被频繁调用，不含链接时直接返回长度
+    if '[' not in obj:
+        return len(obj)
+    return len(_HYPERLINK_PATTERN.sub(r'\1', _MARKDOWN_IMAGE_PATTERN.sub('', obj)))
 
 def remove_leading_symbols(text: str) -> str:
-    pattern = r"^[\u2000-\u206F\u2E00-\u2E7F\u3000-\u303F!\"#$%&'()*+,./:;<=>?@^_`~]+"
-    return re.sub(pattern, "", text)
+    return _LEADING_SYMBOLS_PATTERN.sub("", text)
 
 def generate_chunks_from_documents(split_type: str, documents: List[Document])-> List[Dict]:
     return [document.to_dict() for document in documents]
@@ -163,7 +172,8 @@ def generate_preview_chunks_from_documents(split_type: str, documents: List[Docu
         return preview_chunks
 
 def list_to_pgvector_str(vec: List[float]) -> str:
-    return '[' + ','.join(f'{v}' for v in vec) + ']'
+    # pgvector以float4存储，9位有效数字即可无损表示，缩短传输的文本长度
+    return '[' + ','.join(f'{v:.9g}' for v in vec) + ']'
 
 def get_text_id(text: str) -> str:
     return str(uuid4())
@@ -172,6 +182,68 @@ def get_text_hash(text: str) -> str:
     hash_text = str(text) + "Voicecomm"
     return sha256(hash_text.encode()).hexdigest()
 
+def diff_chunks_by_content_hash(existing_rows: List[Dict], content_hashes: List[str]) -> Tuple[Dict[int, int], List[int]]:
+    '''
+        重新解析文档时，按content_hash与位置比对新旧片段
+        Args:
+            existing_rows: 已有片段（按位置排序），包含 id、content_hash、reusable（向量是否可复用）
+            content_hashes: 新片段的content_hash（按位置排序）
+        Returns:
+            {新片段序号: 复用的已有片段id}，相同内容按位置先后一一对应
+            未复用的已有片段id（按位置排序），可原位更新为内容变化的片段或删除
+    '''
+    candidates: Dict[str, deque] = defaultdict(deque)
+    for row in existing_rows:
+        if row['reusable'] and row['content_hash']:
+            candidates[row['content_hash']].append(row['id'])
+
+    reused = {}
+    for i, content_hash in enumerate(content_hashes):
+        ids = candidates.get(content_hash)
+        if ids:
+            reused[i] = ids.popleft()
+
+    reused_ids = set(reused.values())
+    stale_ids = [row['id'] for row in existing_rows if row['id'] not in reused_ids]
+    return reused, stale_ids
+
+def extract_keywords(text: str) -> List[str]:
+    '''
+        提取文本关键词，供WEIGHT重排序计算关键词得分
+        分段时预先计算并存入片段metadata的keywords字段，检索时无需再对片段分词
+    '''
+    keywords = set(jieba.analyse.extract_tags(sentence=text, topK=None, withWeight=False))
+
+    results = set()
+    for keyword in keywords:
+        results.add(keyword)
+        # 拆分英文、数字等子串
+        sub_keywords = re.findall(r'\w+', keyword)
+        if len(sub_keywords) > 1:
+            results.update({sub_keyword for sub_keyword in sub_keywords if sub_keyword not in STOPWORDS})
+
+    return sorted(results)
+
+def truncate_text_by_tokens(text: str, max_tokens: int) -> str:
+    '''
+        按估算的tokens数截断文本（与 estimate_text_tokens 一致），未超出时返回原文本
+    '''
+    if not text or max_tokens <= 0:
+        return ''
+    # 每个字符至多估算为1.5个token，字符数足够少时无需逐字计算
+    if len(text) * 1.5 <= max_tokens or estimate_text_tokens(text) <= max_tokens:
+        return text
+
+    # 估算值随前缀长度单调不减，二分查找不超出预算的最长前缀
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_text_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
+
 def add_usage_dict(l: Dict, r: Dict) -> Dict:
     return {
         'prompt_tokens': l.get('prompt_tokens', 0) + r.get('prompt_tokens', 0),
@@ -179,5 +251,33 @@ def add_usage_dict(l: Dict, r: Dict) -> Dict:
         'total_tokens': l.get('total_tokens', 0) + r.get('total_tokens', 0)
     }
 
+def get_parent_key(document: Document) -> Tuple[Any, ...]:
+    '''
+        检索结果所属父段的标识
+        父子分段的子段以 (知识库id, 文档id, 父段序号f_idx) 标识，同一父段的子段共享相同的context_content；
+        其他分段以片段自身的content_id标识
+    '''
+    metadata = document.metadata or {}
+    if metadata.get('f_idx') is not None and metadata.get('document_id') is not None:
+        return ('parent', metadata.get('knowledge_base_id'), metadata['document_id'], metadata['f_idx'])
+    if metadata.get('content_id') is not None:
+        return ('content', metadata['content_id'])
+    return ('object', id(document))
+
+def collapse_documents_by_parent(documents: List[Document]) -> List[Document]:
+    '''
+        按父段合并检索结果，每个父段仅保留得分最高的子段，保持原有顺序
+        documents: 按得分降序排列
+    '''
+    parent_keys = set()
+    collapsed_documents = []
+    for document in documents:
+        parent_key = get_parent_key(document)
+        if parent_key in parent_keys:
+            continue
+        parent_keys.add(parent_key)
+        collapsed_documents.append(document)
+    return collapsed_documents
+
 def document_to_context(documents: List[Document]) -> List[str]:
     return [document.metadata.get('context_content', '') for document in documents]
\ No newline at end of file
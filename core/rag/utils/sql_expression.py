@@ -68,11 +68,65 @@ WHERE
     content_id = $4;
 '''
 
-# 从向量表中删除指定document_id下的所有记录
+# 从向量表中删除指定document_id下的所有记录，返回涉及的知识库id
 SQL_EXPRESSION_VECTOR_DELETE_BY_DOCUMENT_ID = '''
-DELETE FROM knowledge_base_doc_vector
-WHERE
-    document_id = $1;
+WITH deleted AS (
+    DELETE FROM knowledge_base_doc_vector
+    WHERE
+        document_id = $1
+    RETURNING knowledge_base_id
+)
+SELECT DISTINCT knowledge_base_id FROM deleted;
+'''
+
+# 重新解析文档时，按位置查询文档下已有的片段，用于按content_hash增量比对
+SQL_EXPRESSION_VECTOR_SELECT_BY_DOCUMENT_ID = '''
+SELECT 
+    id, 
+    content_hash, 
+    process_status, 
+    vector IS NOT NULL AS has_vector, 
+    metadata->>'embedding_key' AS embedding_key
+FROM knowledge_base_doc_vector
+WHERE document_id = $1
+ORDER BY 
+    coalesce((metadata->>'f_idx')::int, 0), 
+    (metadata->>'idx')::int NULLS LAST, 
+    id;
+'''
+
+# 增量重新解析时，内容未变化的片段保留向量，更新其余字段
+SQL_EXPRESSION_VECTOR_UPDATE_KEEP_VECTOR = '''
+UPDATE knowledge_base_doc_vector
+SET content_id = $2,
+    knowledge_base_id = $3,
+    document_id = $4,
+    retrieve_content = $5,
+    context_content = $6,
+    metadata = $7::jsonb,
+    process_status = $8,
+    content_hash = $9,
+    chunking_strategy = $10,
+    status = 'ENABLE'
+WHERE id = $1;
+'''
+
+# 增量重新解析时，内容变化的片段原位更新
+SQL_EXPRESSION_VECTOR_UPDATE_BY_ID = '''
+UPDATE knowledge_base_doc_vector
+SET content_id = $2,
+    knowledge_base_id = $3,
+    document_id = $4,
+    retrieve_content = $5,
+    context_content = $6,
+    metadata = $7::jsonb,
+    vector = $8::vector,
+    usage = $9::jsonb,
+    process_status = $10,
+    content_hash = $11,
+    chunking_strategy = $12,
+    status = 'ENABLE'
+WHERE id = $1;
 '''
 
 # 增删改片段时，从 knowledge_base_document 中获取记录
@@ -121,4 +175,87 @@ SET
     {}
 WHERE
     id = ANY($1::int[]);
-'''
\ No newline at end of file
+'''
+
+# 检索前，在当前事务内设置向量索引的检索参数（如 hnsw.ef_search、ivfflat.probes）
+SQL_EXPRESSION_SET_CONFIG_LOCAL = '''
+SELECT set_config($1, $2, true);
+'''
+
+# 构建内存向量索引时，查询知识库下所有可检索的片段
+SQL_EXPRESSION_VECTOR_SELECT_FOR_INDEX = '''
+SELECT id, document_id, retrieve_content, context_content, metadata, vector, content_hash
+FROM knowledge_base_doc_vector
+WHERE knowledge_base_id = $1
+      AND process_status = 'SUCCESS'
+      AND status = 'ENABLE'
+      AND vector IS NOT NULL
+      AND document_id IN (
+          SELECT id
+          FROM knowledge_base_document
+          WHERE knowledge_base_id = $1
+                AND status = 'ENABLE'
+                AND is_archived = FALSE
+      )
+ORDER BY id;
+'''
+
+# 校验向量快照时，计算知识库下可检索片段的指纹（片段id、content_hash，以及向量、context_content、metadata的摘要），
+# 与 SQL_EXPRESSION_VECTOR_SELECT_FOR_INDEX 条件一致，计算方式与 vector_snapshot.compute_fingerprint 一致
+SQL_EXPRESSION_VECTOR_FINGERPRINT = '''
+SELECT 
+    count(*) AS count,
+    md5(coalesce(string_agg(
+        id::text || ':' || coalesce(content_hash, '') || ':'
+        || md5(coalesce(vector::text, '') || ':' || coalesce(context_content, '') || ':' || coalesce(metadata::text, '')),
+        ',' ORDER BY id
+    ), '')) AS fingerprint
+FROM knowledge_base_doc_vector
+WHERE knowledge_base_id = $1
+      AND process_status = 'SUCCESS'
+      AND status = 'ENABLE'
+      AND vector IS NOT NULL
+      AND document_id IN (
+          SELECT id
+          FROM knowledge_base_document
+          WHERE knowledge_base_id = $1
+                AND status = 'ENABLE'
+                AND is_archived = FALSE
+      );
+'''
+
+# 查询知识库的向量维度
+SQL_EXPRESSION_VECTOR_SELECT_DIMENSION = '''
+SELECT vector_dims(vector) AS dimension
+FROM knowledge_base_doc_vector
+WHERE knowledge_base_id = $1
+      AND vector IS NOT NULL
+LIMIT 1;
+'''
+
+# 知识库的低精度向量索引（按知识库建立部分索引，维度固定），{0}: 索引名，{1}: 知识库id，{2}: 维度
+SQL_EXPRESSION_VECTOR_INDEX_CREATE_HALFVEC = '''
+CREATE INDEX CONCURRENTLY IF NOT EXISTS {0}
+ON knowledge_base_doc_vector
+USING hnsw ((vector::halfvec({2})) halfvec_cosine_ops)
+WHERE knowledge_base_id = {1};
+'''
+
+SQL_EXPRESSION_VECTOR_INDEX_CREATE_BIT = '''
+CREATE INDEX CONCURRENTLY IF NOT EXISTS {0}
+ON knowledge_base_doc_vector
+USING hnsw ((binary_quantize(vector)::bit({2})) bit_hamming_ops)
+WHERE knowledge_base_id = {1};
+'''
+
+SQL_EXPRESSION_VECTOR_INDEX_DROP = '''
+DROP INDEX CONCURRENTLY IF EXISTS {0};
+'''
+
+# 查询低精度向量索引是否存在及是否有效（CONCURRENTLY 建立失败时会留下 indisvalid = false 的索引）
+SQL_EXPRESSION_VECTOR_INDEX_SELECT_VALID = '''
+SELECT c.relname AS name, i.indisvalid AS is_valid
+FROM pg_class AS c
+JOIN pg_index AS i ON i.indexrelid = c.oid
+WHERE c.relname = ANY($1::text[]);
+'''
@@ -1,9 +1,12 @@
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Set, Tuple, Optional
 import json
+import time
 import traceback
 
 from core.database.database_factory import DatabaseFactory
 from core.rag.entities.document import Document
+from core.rag.metadata.entities import MetadataCondition
+from core.rag.utils.rag_utils import extract_keywords
 from core.rag.utils.sql_expression import (
     SQL_EXPRESSION_DOCUMENT_UPDATE_STATUS_BY_ID, 
     SQL_EXPRESSION_DOCUMENT_UPDATE_STATUS_BY_KNOWLEDGE_BASE_ID, 
@@ -12,11 +15,36 @@ from core.rag.utils.sql_expression import (
     SQL_EXPRESSION_VECTOR_SELECT,
     SQL_EXPRESSION_VECTOR_UPDATE,
     SQL_EXPRESSION_VECTOR_DELETE_BY_DOCUMENT_ID, 
+    SQL_EXPRESSION_VECTOR_SELECT_BY_DOCUMENT_ID,
+    SQL_EXPRESSION_VECTOR_UPDATE_KEEP_VECTOR,
+    SQL_EXPRESSION_VECTOR_UPDATE_BY_ID,
+    SQL_EXPRESSION_VECTOR_DELETE_CURD,
+    SQL_EXPRESSION_SET_CONFIG_LOCAL,
+    SQL_EXPRESSION_VECTOR_SELECT_FOR_INDEX,
+    SQL_EXPRESSION_VECTOR_FINGERPRINT,
+    SQL_EXPRESSION_VECTOR_SELECT_DIMENSION,
+    SQL_EXPRESSION_VECTOR_INDEX_CREATE_HALFVEC,
+    SQL_EXPRESSION_VECTOR_INDEX_CREATE_BIT,
+    SQL_EXPRESSION_VECTOR_INDEX_DROP,
+    SQL_EXPRESSION_VECTOR_INDEX_SELECT_VALID,
 )
 from logger import get_logger
 
 logger = get_logger('sql')
 
+# 全文检索预过滤时，LIKE 模式的最大数量
+FULL_TEXT_LIKE_PATTERN_MAX = 32
+
+# 向量检索精度：vector 为原始精度；halfvec、bit 先通过低精度索引召回候选，再以原始精度重新计算得分
+VECTOR_PRECISIONS = ('vector', 'halfvec', 'bit')
+_VECTOR_INDEX_CREATE_SQL = {
+    'halfvec': SQL_EXPRESSION_VECTOR_INDEX_CREATE_HALFVEC,
+    'bit': SQL_EXPRESSION_VECTOR_INDEX_CREATE_BIT,
+}
+# 知识库已建立的有效低精度索引：knowledge_base_id -> (查询时间, 精度集合)，缓存 _QUANTIZED_INDEX_CACHE_TTL 秒
+_quantized_vector_indexes: Dict[int, Tuple[float, Set[str]]] = {}
+_QUANTIZED_INDEX_CACHE_TTL = 60
+
 async def modify_document_status_by_id(
     db, 
     key_id: int,
@@ -93,6 +121,21 @@ async def select_vector_from_db(db, knowledge_base_id: int):
     return await db.fetch(SQL_EXPRESSION_VECTOR_SELECT, knowledge_base_id)
 
 
+async def select_vector_for_index(db, knowledge_base_id: int):
+    '''
+        构建内存向量索引前，查询知识库下所有可检索的片段，检索条件与 build_vector_select_sql 一致（不含元数据过滤）
+    '''
+    return await db.fetch(SQL_EXPRESSION_VECTOR_SELECT_FOR_INDEX, knowledge_base_id)
+
+
+async def select_vector_fingerprint(db, knowledge_base_id: int) -> Tuple[int, str]:
+    '''
+        查询知识库下可检索片段的数量与指纹，用于校验向量快照是否与数据库一致
+    '''
+    row = await db.fetchrow(SQL_EXPRESSION_VECTOR_FINGERPRINT, knowledge_base_id)
+    return row['count'], row['fingerprint']
+
+
 async def update_vector_into_db(db, records: List[Tuple]):
     '''
         重建向量后，修改select_vector_from_db返回记录的处理状态、向量、tokens用量
@@ -107,19 +150,40 @@ async def select_vector_by_knowledge_base_id(
     top_k: int, 
     query_vector: str, 
     score_threshold: Optional[float] = None, 
-    metadata_condition: Optional[str] = None,
+    metadata_condition: Optional[MetadataCondition] = None,
+    search_settings: Optional[Dict[str, str]] = None,
+    precision: str = 'vector',
+    rescore_factor: int = 4,
 ) -> List[Document]:
     '''
         向量检索
+        search_settings: 当前查询生效的向量索引参数，见 build_vector_search_settings
+        precision: 检索精度，见 build_vector_select_sql
+        rescore_factor: 低精度检索时，候选数量为 top_k * rescore_factor
     '''
-    sql = build_vector_select_sql(need_vector, metadata_condition)
+    # 知识库未建立对应精度的有效索引时，低精度召回只会全表扫描，使用原始精度检索
+    if precision != 'vector' and precision not in await select_quantized_vector_precisions(db, knowledge_base_id):
+        logger.debug(f'No valid {precision} index of knowledge base [{knowledge_base_id}], use vector precision.')
+        precision = 'vector'
+
+    sql = build_vector_select_sql(
+        need_vector, 
+        metadata_condition, 
+        precision, 
+        query_vector.count(',') + 1, 
+        knowledge_base_id, 
+        rescore_factor,
+    )
     logger.debug(f"SQL:\n{sql}")
 
-    rows = await db.fetch(
+    rows = await fetch_with_local_settings(
+        db,
+        search_settings,
         sql,
         knowledge_base_id, 
         top_k, 
-        query_vector
+        query_vector,
+        *(metadata_condition.params if metadata_condition else [])
     )
 
     documents = []
@@ -143,10 +207,33 @@ async def select_vector_by_knowledge_base_id(
             logger.warning(f'Ignore record: {row} for:\n{traceback.format_exc()}')
             continue
 
+    # 迭代索引扫描使用 relaxed_order 时，返回结果可能不严格有序
+    documents.sort(key=lambda x: x.metadata["score"], reverse=True)
+
     return documents
 
 
-def build_vector_select_sql(need_vector: bool, metadata_condition: Optional[str] = None,) -> str:
+def build_vector_select_sql(
+    need_vector: bool, 
+    metadata_condition: Optional[MetadataCondition] = None,
+    precision: str = 'vector',
+    dimension: Optional[int] = None,
+    knowledge_base_id: Optional[int] = None,
+    rescore_factor: int = 4,
+) -> str:
+    '''
+        按原始距离运算符 `vector <=> $3::vector` 升序排序，使 pgvector 的 HNSW/IVFFlat 索引可用于排序；
+        按计算后的别名 score 排序时，规划器无法使用索引，会退化为全表扫描后排序
+        元数据过滤条件的参数从 $4 开始
+
+        precision 为 halfvec / bit 时，先按低精度距离召回 top_k * rescore_factor 条候选，再以原始精度重新计算得分并排序；
+        低精度距离表达式与 set_quantized_vector_indexes 建立的部分索引一致，
+        知识库id以常量写入条件，规划器才能匹配到该知识库的部分索引；
+        调用方需确认知识库已建立该精度的有效索引（见 select_quantized_vector_precisions）
+    '''
+    if precision not in VECTOR_PRECISIONS:
+        raise ValueError(f'Unsupported vector precision: {precision}')
+
     base_fields = [
         "document_id",
         "retrieve_content",
@@ -158,14 +245,15 @@ def build_vector_select_sql(need_vector: bool, metadata_condition: Optional[str]
     if need_vector:
         base_fields.append("vector")
     
-    metadata_condition = metadata_condition or '1=1'
+    metadata_sql = build_metadata_condition_sql(metadata_condition)
 
-    # 向量相似度字段
-    base_fields.append("1 - (vector <=> $3::vector) AS score")
+    if precision == 'vector':
+        # 向量相似度字段
+        base_fields.append("1 - (vector <=> $3::vector) AS score")
 
-    fields_clause = ", ".join(base_fields)
+        fields_clause = ", ".join(base_fields)
 
-    return f"""
+        return f"""
     SELECT {fields_clause}
     FROM knowledge_base_doc_vector
     WHERE knowledge_base_id = $1
@@ -177,12 +265,90 @@ def build_vector_select_sql(need_vector: bool, metadata_condition: Optional[str]
               WHERE knowledge_base_id = $1
                     AND status = 'ENABLE'
                     AND is_archived = FALSE
-                    AND {metadata_condition}
+                    AND {metadata_sql}
           )
-    ORDER BY score DESC
+    ORDER BY vector <=> $3::vector
     LIMIT $2 
     """
 
+    if precision == 'halfvec':
+        quantized_distance = f"vector::halfvec({int(dimension)}) <=> $3::halfvec({int(dimension)})"
+    else:
+        quantized_distance = f"binary_quantize(vector)::bit({int(dimension)}) <~> binary_quantize($3::vector)"
+
+    candidate_fields = ["document_id", "retrieve_content", "context_content", "metadata", "vector"]
+    base_fields.append("1 - (vector <=> $3::vector) AS score")
+
+    # 候选子查询中知识库id以常量写入以匹配部分索引，每个知识库对应一条预编译语句，不能复用 statement_cache；
+    # select_vector_by_knowledge_base_id 仅对已建立有效低精度索引的知识库生成该语句，其余知识库使用原始精度的参数化语句
+    return f"""
+    SELECT {", ".join(base_fields)}
+    FROM (
+        SELECT {", ".join(candidate_fields)}
+        FROM knowledge_base_doc_vector
+        WHERE knowledge_base_id = {int(knowledge_base_id)}
+              AND process_status = 'SUCCESS'
+              AND status = 'ENABLE'
+              AND document_id IN (
+                  SELECT id
+                  FROM knowledge_base_document as d
+                  WHERE knowledge_base_id = $1
+                        AND status = 'ENABLE'
+                        AND is_archived = FALSE
+                        AND {metadata_sql}
+              )
+        ORDER BY {quantized_distance}
+        LIMIT $2 * {int(rescore_factor)}
+    ) AS candidates
+    ORDER BY vector <=> $3::vector
+    LIMIT $2 
+    """
+
+def build_metadata_condition_sql(metadata_condition: Optional[MetadataCondition] = None) -> str:
+    '''
+        检索SQL的前3个参数固定为 knowledge_base_id、top_k、query，元数据过滤条件的参数紧随其后
+    '''
+    if not metadata_condition:
+        return '1=1'
+    return metadata_condition.to_sql(param_offset=3)
+
+def build_vector_search_settings(
+    hnsw_ef_search: Optional[int] = None,
+    ivfflat_probes: Optional[int] = None,
+    iterative_scan: Optional[str] = None,
+) -> Dict[str, str]:
+    '''
+        生成向量检索时，当前事务内生效的 pgvector 参数
+        Args:
+            hnsw_ef_search: HNSW索引检索时的候选列表大小，需不小于 LIMIT
+            ivfflat_probes: IVFFlat索引检索时探测的列表数
+            iterative_scan: 迭代索引扫描（pgvector >= 0.8.0），off / relaxed_order / strict_order
+                带过滤条件时，索引扫描返回的候选不足 LIMIT 会继续扫描，而不是返回过少的结果
+    '''
+    settings = {}
+    if hnsw_ef_search:
+        settings['hnsw.ef_search'] = str(hnsw_ef_search)
+    if ivfflat_probes:
+        settings['ivfflat.probes'] = str(ivfflat_probes)
+    if iterative_scan:
+        settings['hnsw.iterative_scan'] = iterative_scan
+        # IVFFlat 仅支持 relaxed_order
+        settings['ivfflat.iterative_scan'] = 'off' if iterative_scan == 'off' else 'relaxed_order'
+    return settings
+
+async def fetch_with_local_settings(db, settings: Optional[Dict[str, str]], sql: str, *args):
+    '''
+        在同一连接、同一事务内设置参数后执行查询，参数仅对当前事务生效
+    '''
+    if not settings:
+        return await db.fetch(sql, *args)
+
+    async with db.conn() as conn:
+        async with conn.transaction():
+            for name, value in settings.items():
+                await conn.execute(SQL_EXPRESSION_SET_CONFIG_LOCAL, name, value)
+            return await conn.fetch(sql, *args)
+
 async def full_text_search_by_knowledge_base_id(
     db, 
     need_vector: bool, 
@@ -190,16 +356,33 @@ async def full_text_search_by_knowledge_base_id(
     top_k: int, 
     query_text: str, 
     score_threshold: Optional[float] = None, 
-    metadata_condition: Optional[str] = None,
+    metadata_condition: Optional[MetadataCondition] = None,
+    like_patterns: Optional[List[str]] = None,
+    search_settings: Optional[Dict[str, str]] = None,
 ) -> List[Document]:
     '''
         全文检索
+        like_patterns: 预过滤使用的 LIKE 模式，见 build_full_text_like_patterns
+        search_settings: 当前查询生效的 pg_bigm 参数，见 build_full_text_search_settings
     '''
-    sql = build_full_text_select_sql(need_vector, metadata_condition)
+    like_patterns = like_patterns or []
+    sql = build_full_text_select_sql(
+        need_vector, 
+        metadata_condition, 
+        len(like_patterns), 
+        'pg_bigm.similarity_limit' in (search_settings or {}),
+    )
     logger.debug(f"SQL:\n{sql}")
 
-    rows = await db.fetch(
-        sql, knowledge_base_id, top_k, query_text
+    rows = await fetch_with_local_settings(
+        db, 
+        search_settings, 
+        sql, 
+        knowledge_base_id, 
+        top_k, 
+        query_text, 
+        *(metadata_condition.params if metadata_condition else []),
+        *like_patterns
     )
 
     documents = []
@@ -224,7 +407,18 @@ async def full_text_search_by_knowledge_base_id(
 
     return documents
 
-def build_full_text_select_sql(need_vector: bool, metadata_condition: Optional[str] = None,) -> str:
+def build_full_text_select_sql(
+    need_vector: bool, 
+    metadata_condition: Optional[MetadataCondition] = None,
+    like_pattern_count: int = 0,
+    similarity_prefilter: bool = False,
+) -> str:
+    '''
+        bigm_similarity 无法使用索引，仅对预过滤后的候选片段计算得分：
+            - like_pattern_count > 0 时，片段需包含任一查询关键词，LIKE 模式的参数位于元数据过滤条件的参数之后
+            - similarity_prefilter 为 True 时，片段需满足 `=%`，阈值为 pg_bigm.similarity_limit
+        两者均可使用 retrieve_content 上的 gin_bigm_ops 索引，查询代价随命中数而非知识库大小增长
+    '''
     base_fields = [
         "document_id",
         "retrieve_content",
@@ -236,7 +430,17 @@ def build_full_text_select_sql(need_vector: bool, metadata_condition: Optional[s
     if need_vector:
         base_fields.append("vector")
 
-    metadata_condition = metadata_condition or '1=1'
+    metadata_sql = build_metadata_condition_sql(metadata_condition)
+    param_offset = 3 + (len(metadata_condition.params) if metadata_condition else 0)
+
+    prefilter_conditions = []
+    if like_pattern_count > 0:
+        # 使用 OR 而非 LIKE ANY(array)，GIN 索引不支持数组形式的条件
+        like_conditions = [f"retrieve_content LIKE ${param_offset + i + 1}" for i in range(like_pattern_count)]
+        prefilter_conditions.append(f"({' OR '.join(like_conditions)})")
+    if similarity_prefilter:
+        prefilter_conditions.append("retrieve_content =% unistr($3)")
+    prefilter_condition = ' AND '.join(prefilter_conditions) or '1=1'
 
     return f"""
     SELECT {', '.join(base_fields)}
@@ -244,20 +448,154 @@ def build_full_text_select_sql(need_vector: bool, metadata_condition: Optional[s
     WHERE knowledge_base_id = $1
           AND process_status = 'SUCCESS'
           AND status = 'ENABLE'
+          AND {prefilter_condition}
           AND document_id IN (
               SELECT id
               FROM knowledge_base_document as d
               WHERE knowledge_base_id = $1
                     AND status = 'ENABLE'
                     AND is_archived = FALSE
-                    AND {metadata_condition}
+                    AND {metadata_sql}
           )
     ORDER BY score DESC
     LIMIT $2
     """
 
-async def delete_vector_by_document_id(db, document_id):
-    await db.execute(
+def build_full_text_like_patterns(query_text: str, max_patterns: int = FULL_TEXT_LIKE_PATTERN_MAX) -> List[str]:
+    '''
+        由查询关键词生成全文检索预过滤的 LIKE 模式
+        未提取到关键词时返回空列表，此时不做预过滤
+    '''
+    keywords = extract_keywords(query_text)
+    # 关键词过多时优先保留较长的关键词，SQL 中 OR 条件数量有上限
+    keywords = sorted(keywords, key=len, reverse=True)[:max_patterns]
+
+    patterns = []
+    for keyword in keywords:
+        # 转义 LIKE 的特殊字符，默认转义符为反斜杠
+        keyword = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        patterns.append(f'%{keyword}%')
+    return patterns
+
+def build_full_text_search_settings(similarity_limit: Optional[float] = None) -> Dict[str, str]:
+    '''
+        生成全文检索时，当前事务内生效的 pg_bigm 参数
+        Args:
+            similarity_limit: `=%` 运算符的相似度阈值
+    '''
+    settings = {}
+    if similarity_limit is not None:
+        settings['pg_bigm.similarity_limit'] = str(similarity_limit)
+    return settings
+
+def get_quantized_vector_index_name(knowledge_base_id: int, precision: str) -> str:
+    return f'knowledge_base_doc_vector_{int(knowledge_base_id)}_{precision}_idx'
+
+async def select_quantized_vector_index_validity(db, knowledge_base_id: int) -> Dict[str, bool]:
+    '''
+        查询知识库已存在的低精度索引，返回 精度 -> 是否有效
+    '''
+    names = {
+        get_quantized_vector_index_name(knowledge_base_id, precision): precision
+        for precision in _VECTOR_INDEX_CREATE_SQL.keys()
+    }
+    rows = await db.fetch(SQL_EXPRESSION_VECTOR_INDEX_SELECT_VALID, list(names.keys()))
+    return {names[row['name']]: row['is_valid'] for row in rows}
+
+async def select_quantized_vector_precisions(db, knowledge_base_id: int) -> Set[str]:
+    '''
+        知识库已建立的有效低精度索引的精度，结果缓存 _QUANTIZED_INDEX_CACHE_TTL 秒
+    '''
+    item = _quantized_vector_indexes.get(knowledge_base_id)
+    if item is not None and item[0] + _QUANTIZED_INDEX_CACHE_TTL >= time.monotonic():
+        return item[1]
+
+    validity = await select_quantized_vector_index_validity(db, knowledge_base_id)
+    precisions = {precision for precision, is_valid in validity.items() if is_valid}
+    _quantized_vector_indexes[knowledge_base_id] = (time.monotonic(), precisions)
+    return precisions
+
+async def set_quantized_vector_indexes(db, knowledge_base_id: int, precisions: List[str]):
+    '''
+        为知识库建立指定精度（halfvec / bit）的低精度向量索引，并删除其余精度的索引
+        索引表达式中的维度取自知识库现有向量，无向量时仅删除索引
+        使用 CONCURRENTLY，不阻塞写入，不能在事务中执行；知识库较大时耗时较长，需在后台任务中调用
+        此前建立失败遗留的无效索引（indisvalid = false）先删除再重新建立
+    '''
+    for precision in precisions:
+        if precision not in _VECTOR_INDEX_CREATE_SQL:
+            raise ValueError(f'Unsupported vector index precision: {precision}')
+
+    try:
+        for precision in _VECTOR_INDEX_CREATE_SQL.keys():
+            if precision not in precisions:
+                await db.execute(SQL_EXPRESSION_VECTOR_INDEX_DROP.format(
+                    get_quantized_vector_index_name(knowledge_base_id, precision)
+                ))
+
+        if not precisions:
+            return
+
+        row = await db.fetchrow(SQL_EXPRESSION_VECTOR_SELECT_DIMENSION, knowledge_base_id)
+        if not row:
+            return
+
+        validity = await select_quantized_vector_index_validity(db, knowledge_base_id)
+        for precision in precisions:
+            index_name = get_quantized_vector_index_name(knowledge_base_id, precision)
+            if validity.get(precision) is False:
+                logger.warning(f'Drop invalid vector index: {index_name}.')
+                await db.execute(SQL_EXPRESSION_VECTOR_INDEX_DROP.format(index_name))
+            await db.execute(_VECTOR_INDEX_CREATE_SQL[precision].format(
+                index_name,
+                int(knowledge_base_id),
+                int(row['dimension']),
+            ))
+    finally:
+        # 索引变更后重新查询有效索引
+        _quantized_vector_indexes.pop(knowledge_base_id, None)
+
+async def delete_vector_by_document_id(db, document_id) -> List[int]:
+    '''
+        删除文档下的所有片段，返回被删除片段所属的知识库id
+    '''
+    rows = await db.fetch(
         SQL_EXPRESSION_VECTOR_DELETE_BY_DOCUMENT_ID, 
         document_id
-    )
\ No newline at end of file
+    )
+    return [row['knowledge_base_id'] for row in rows]
+
+async def select_vector_by_document_id(db, document_id) -> List[Dict]:
+    '''
+        重新解析文档时，按位置查询文档下已有的片段
+    '''
+    rows = await db.fetch(SQL_EXPRESSION_VECTOR_SELECT_BY_DOCUMENT_ID, document_id)
+    return [dict(row) for row in rows]
+
+async def write_vector_diff_into_db(
+    db,
+    keep_records: List[Tuple],
+    update_records: List[Tuple],
+    insert_records: List[Tuple],
+    delete_ids: List[int],
+) -> List[int]:
+    '''
+        增量重新解析时，在同一事务中写入片段的变更，返回插入片段的id
+        keep_records: (id, 同SQL_EXPRESSION_VECTOR_INSERT中除vector、usage外的字段)，保留向量
+        update_records: (id, 同SQL_EXPRESSION_VECTOR_INSERT的字段)，原位更新
+        insert_records: 同SQL_EXPRESSION_VECTOR_INSERT的字段
+        delete_ids: 删除的片段id
+    '''
+    ids = []
+    async with db.conn() as conn:
+        async with conn.transaction():
+            if delete_ids:
+                await conn.execute(SQL_EXPRESSION_VECTOR_DELETE_CURD, delete_ids)
+            if keep_records:
+                await conn.executemany(SQL_EXPRESSION_VECTOR_UPDATE_KEEP_VECTOR, keep_records)
+            if update_records:
+                await conn.executemany(SQL_EXPRESSION_VECTOR_UPDATE_BY_ID, update_records)
+            for record in insert_records:
+                row = await conn.fetchrow(SQL_EXPRESSION_VECTOR_INSERT, *record)
+                ids.append(row['id'])
+    return ids
@@ -0,0 +1,100 @@
+from typing import Dict, List, Optional, Set, Tuple, Union
+import asyncio
+import traceback
+
+from core.rag.vectorizer.vectorizer_base import BaseVectorizer
+from core.rag.vectorizer.vectorize_processor import VectorizeProcessor
+from logger import get_logger
+
+logger = get_logger('rag')
+
+_DEFAULT_LINGER = 0.05
+
+class EmbeddingBatcher:
+    '''
+        多个文档共享的向量化批次（如批量解析）
+        各文档提交待向量化的片段，凑满 batch_size 条或等待 linger 秒后，以一次向量化请求发送，
+        结果按提交顺序分发回各文档；同时发送的请求数不超过 concurrency
+        整批请求失败时逐条重试，单个片段的失败不影响同批其他文档的片段
+    '''
+    def __init__(
+        self,
+        vectorizer: BaseVectorizer,
+        batch_size: int,
+        concurrency: int = 1,
+        linger: float = _DEFAULT_LINGER,
+    ):
+        self.vectorizer = vectorizer
+        self.batch_size = max(batch_size, 1)
+        self.linger = linger
+        self._semaphore = asyncio.Semaphore(max(concurrency, 1))
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def vectorize(self, contents: List[str]) -> List[Union[List[Dict], BaseException]]:
+        '''
+            返回与contents一一对应的结果，成功时与 VectorizeProcessor.vectorize 的返回值一致，失败时为异常
+        '''
+        loop = asyncio.get_running_loop()
+        futures = []
+        for content in contents:
+            future = loop.create_future()
+            self._pending.append((content, future))
+            futures.append(future)
+            if len(self._pending) >= self.batch_size:
+                self._send(self._pending[:self.batch_size])
+                self._pending = self._pending[self.batch_size:]
+
+        # 未凑满的批次等待其他文档的片段
+        if self._pending and self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.linger, self._flush)
+
+        return await asyncio.gather(*futures, return_exceptions=True)
+
+    def _flush(self):
+        self._flush_handle = None
+        while self._pending:
+            self._send(self._pending[:self.batch_size])
+            self._pending = self._pending[self.batch_size:]
+
+    def _send(self, batch: List[Tuple[str, asyncio.Future]]):
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        async with self._semaphore:
+            # 提交方已取消（如文档被终止）的片段不再发送
+            batch = [(content, future) for content, future in batch if not future.done()]
+            if not batch:
+                return
+
+            try:
+                outputs = await VectorizeProcessor.vectorize_batch(self.vectorizer, [content for content, _ in batch])
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                if len(batch) == 1:
+                    if not batch[0][1].done():
+                        batch[0][1].set_exception(e)
+                    return
+                logger.warning(f'Fail to vectorize a batch of {len(batch)} chunks, retry one by one for:\n{traceback.format_exc()}')
+                await asyncio.gather(*[self._run_one(content, future) for content, future in batch])
+                return
+
+            for (_, future), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result([output])
+
+    async def _run_one(self, content: str, future: asyncio.Future):
+        try:
+            output = await VectorizeProcessor.vectorize(self.vectorizer, [content])
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(output)
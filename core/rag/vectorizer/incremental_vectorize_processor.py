@@ -0,0 +1,164 @@
+from typing import Dict, List, Optional, Tuple, Union
+import asyncio
+import json
+
+from config.config import get_config
+from core.rag.entities.document import Document, ChildDocument
+from core.rag.vectorizer.vectorizer_base import BaseVectorizer
+from core.rag.vectorizer.vectorize_processor import VectorizeProcessor
+from core.rag.vectorizer.embedding_batcher import EmbeddingBatcher
+from core.rag.utils.rag_utils import list_to_pgvector_str, diff_chunks_by_content_hash
+from core.rag.utils.sql_operation import select_vector_by_document_id, write_vector_diff_into_db
+from logger import get_logger
+
+logger = get_logger('rag')
+
+_DEFAULT_PARSE_INCREMENTAL = True
+_DEFAULT_EMBEDDING_BATCH_SIZE = 8
+# 与 api.api_rag.entities.ChunkStatus 一致
+_CHUNK_STATUS_SUCCESS = 'SUCCESS'
+_CHUNK_STATUS_FAILED = 'FAILED'
+
+class IncrementalVectorizeProcessor:
+    '''
+        解析文档时片段的向量化与入库，按content_hash与位置比对文档下已有的片段：
+        - 内容未变化且向量由同一模型生成的片段，保留行与向量，仅更新序号、上下文等字段
+        - 内容变化的片段重新向量化，按位置原位更新未复用的已有片段，多出的插入、剩余的删除
+        全部变更在同一事务中写入，修改少量内容的大文档只需向量化变化的片段
+        配置：
+            server.parse_incremental: 是否复用未变化片段的向量，为false时所有片段重新向量化（仍在同一事务中写入）
+    '''
+
+    @staticmethod
+    def _make_record(
+        knowledge_base_id: int,
+        document_id: int,
+        split_type: str,
+        chunk: Union[Document, ChildDocument],
+        context_content: str,
+        vector: Optional[str],
+        usage: Optional[str],
+        process_status: str,
+    ) -> Tuple:
+        '''
+            与 SQL_EXPRESSION_VECTOR_INSERT 的字段一致
+        '''
+        return (
+            chunk.metadata.get('content_id'),
+            knowledge_base_id,
+            document_id,
+            chunk.page_content,
+            context_content,
+            json.dumps(chunk.metadata),
+            vector,
+            usage,
+            process_status,
+            chunk.metadata.get('content_hash'),
+            split_type,
+        )
+
+    @classmethod
+    async def vectorize(
+        cls,
+        db,
+        vectorizer: BaseVectorizer,
+        task_id: str,
+        knowledge_base_id: int,
+        document_id: int,
+        split_type: str,
+        title: str,
+        chunks: List[Tuple[Union[Document, ChildDocument], str]],
+        batcher: Optional[EmbeddingBatcher] = None,
+    ) -> int:
+        '''
+            chunks: (片段, 上下文内容)，按位置排序
+            batcher: 多个文档共享的向量化批次（如批量解析），各文档的片段凑满批次后以一次请求向量化；
+                为空时按 server.embedding_batch_size 分批并发、逐条向量化
+            写入后，片段metadata中添加primary_key，返回向量化失败的片段数
+        '''
+        existing_rows = await select_vector_by_document_id(db, document_id)
+
+        server_config = get_config().get('server', {})
+        is_incremental = server_config.get('parse_incremental', _DEFAULT_PARSE_INCREMENTAL)
+        for row in existing_rows:
+            row['reusable'] = bool(
+                is_incremental
+                and vectorizer.model_key
+                and row['embedding_key'] == vectorizer.model_key
+                and row['has_vector']
+                and row['process_status'] == _CHUNK_STATUS_SUCCESS
+            )
+        reused, stale_ids = diff_chunks_by_content_hash(
+            existing_rows,
+            [chunk.metadata.get('content_hash') for chunk, _ in chunks],
+        )
+        logger.debug(f'{task_id} {len(reused)}/{len(chunks)} chunks unchanged, {len(existing_rows)} existing chunks.')
+
+        # 未变化的片段
+        keep_records = []
+        for idx, row_id in reused.items():
+            chunk, context_content = chunks[idx]
+            chunk.metadata['title'] = title
+            chunk.metadata['embedding_key'] = vectorizer.model_key
+            record = cls._make_record(
+                knowledge_base_id, document_id, split_type, chunk, context_content, None, None, _CHUNK_STATUS_SUCCESS
+            )
+            keep_records.append((row_id, *record[:6], *record[8:]))
+
+        # 变化的片段，向量化
+        pending = [idx for idx in range(len(chunks)) if idx not in reused]
+        if batcher is None:
+            embedding_batch_size = server_config.get('embedding_batch_size', _DEFAULT_EMBEDDING_BATCH_SIZE)
+        else:
+            # 全部提交给共享的batcher，由其与其他文档的片段一起组成批次
+            embedding_batch_size = max(len(pending), 1)
+        records = []
+        failed_count = 0
+        for i in range(0, len(pending), embedding_batch_size):
+            batch_pending = pending[i: i + embedding_batch_size]
+            if batcher is None:
+                outputs = await asyncio.gather(*[
+                    VectorizeProcessor.vectorize(vectorizer, [chunks[idx][0].page_content])
+                    for idx in batch_pending
+                ], return_exceptions=True)
+            else:
+                outputs = await batcher.vectorize([chunks[idx][0].page_content for idx in batch_pending])
+
+            for idx, output in zip(batch_pending, outputs):
+                chunk, context_content = chunks[idx]
+                # 在metadata中添加title字段
+                chunk.metadata['title'] = title
+
+                if isinstance(output, asyncio.CancelledError):
+                    raise output
+                if isinstance(output, Exception):
+                    failed_count += 1
+                    chunk.metadata['failed_reason'] = f"{type(output).__name__}:{str(output)[:100]}"
+                    records.append(cls._make_record(
+                        knowledge_base_id, document_id, split_type, chunk, context_content, None, None, _CHUNK_STATUS_FAILED
+                    ))
+                    logger.warning(f'{task_id} [{idx}] Vectorize failed for:\n{repr(output)}')
+                else:
+                    chunk.metadata['embedding_key'] = vectorizer.model_key
+                    records.append(cls._make_record(
+                        knowledge_base_id, document_id, split_type, chunk, context_content,
+                        list_to_pgvector_str(output[0]['vector']), json.dumps(output[0]['usage']), _CHUNK_STATUS_SUCCESS
+                    ))
+            logger.debug(f'{task_id} Vectorized {min(i + embedding_batch_size, len(pending))}/{len(pending)} chunks.')
+
+        # 变化的片段按位置原位更新未复用的已有片段，多出的插入、剩余的删除
+        update_records = [(row_id, *record) for row_id, record in zip(stale_ids, records)]
+        insert_records = records[len(stale_ids):]
+        delete_ids = stale_ids[len(records):]
+        inserted_ids = await write_vector_diff_into_db(db, keep_records, update_records, insert_records, delete_ids)
+        logger.debug(
+            f'{task_id} Kept {len(keep_records)}, updated {len(update_records)}, '
+            f'inserted {len(insert_records)}, deleted {len(delete_ids)} chunks.'
+        )
+
+        for idx, row_id in reused.items():
+            chunks[idx][0].metadata['primary_key'] = row_id
+        for idx, row_id in zip(pending, stale_ids[:len(records)] + inserted_ids):
+            chunks[idx][0].metadata['primary_key'] = row_id
+
+        return failed_count
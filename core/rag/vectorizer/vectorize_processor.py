@@ -27,6 +27,15 @@ class VectorizeProcessor:
         outputs = await vectorizer.embedding(inputs)
         return outputs
     
+    @classmethod
+    async def vectorize_batch(cls, vectorizer: BaseVectorizer, contents: List[str]) -> List[Dict]:
+        '''
+            多条文本以一次请求生成向量，用于凑满批次的批量向量化（见 EmbeddingBatcher）
+        '''
+        inputs = [{'type': 'text', 'content': content} for content in contents]
+        outputs = await vectorizer.embedding(inputs, batch=True)
+        return outputs
+
     @staticmethod
     def _remove_image_tag(content: str) -> str:
         tmp = re.sub(r'!\[.*?\]\([^)]+\)', '', content)
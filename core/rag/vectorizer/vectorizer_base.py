@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 from typing import Dict, List
 
 class BaseVectorizer(ABC):
+    # 向量模型标识，相同标识生成的向量可复用（如增量重新解析），为空时不复用
+    model_key: str = ''
 
     @classmethod
     def merge_embedding(cls, inputs: List[Dict]) -> Dict:
@@ -1,4 +1,5 @@
 from typing import Dict, List
+import hashlib
 import traceback
 from collections import defaultdict
 
@@ -22,6 +23,12 @@ class NormalVectorizer(BaseVectorizer):
         if not isinstance(self.model_instance_config, Dict):
             raise ValueError('NormalVectorizer: the required parameter "model_instance_config" type is incorrect.')
 
+        self.model_key = hashlib.md5('\x00'.join((
+            self.model_instance_provider,
+            str(self.model_instance_config.get('model_name', '')),
+            str(self.model_instance_config.get('base_url', '')),
+        )).encode('utf-8')).hexdigest()
+
         self.model_instance = ModelManager.get_model_instance(
             provider=self.model_instance_provider, 
             model_type=ModelInstanceType.Embedding,
@@ -37,6 +44,12 @@ class NormalVectorizer(BaseVectorizer):
 
 
     async def embedding(self, inputs: List[Dict], **kwargs) -> List[Dict]:
+        '''
+            batch为True时，文本以一次请求生成向量，tokens用量按条数均分；否则逐条请求
+        '''
+        if kwargs.get('batch'):
+            return await self._embedding_batch(inputs)
+
         outputs = []
         for item in inputs:
             item_type = item.get('type')
@@ -74,4 +87,26 @@ class NormalVectorizer(BaseVectorizer):
         # elif 'video' in inputs_type_map and len(inputs_type_map['video']) > 0:
         #     pass
 
-        return outputs
\ No newline at end of file
+        return outputs
+
+    async def _embedding_batch(self, inputs: List[Dict]) -> List[Dict]:
+        outputs = [{} for _ in inputs]
+        text_indexes = self._classify_inputs(inputs).get('text', [])
+        if not text_indexes:
+            return outputs
+
+        results = await self.model_instance.ainvoke_text_embedding(
+            texts=[inputs[idx]['content'] for idx in text_indexes],
+            model_parameters={},
+        )
+        if len(results.embeddings) != len(text_indexes):
+            raise RuntimeError(f'NormalVectorizer: got {len(results.embeddings)} embeddings for {len(text_indexes)} texts.')
+
+        usage = (results.usage // len(text_indexes)).to_dict()
+        for idx, vector in zip(text_indexes, results.embeddings):
+            outputs[idx] = {
+                'type': 'text',
+                'vector': vector,
+                'usage': usage,
+            }
+        return outputs